@@ -0,0 +1,32 @@
+"""Run queue: runs.claimed_at and partial index on pending runs
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "002"
+down_revision: Union[str, Sequence[str], None] = "001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("runs", sa.Column("claimed_at", sa.DateTime(timezone=True), nullable=True))
+    op.create_index(
+        "ix_runs_pending_started_at",
+        "runs",
+        ["started_at"],
+        unique=False,
+        postgresql_where=sa.text("status = 'pending'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_runs_pending_started_at", table_name="runs")
+    op.drop_column("runs", "claimed_at")
@@ -0,0 +1,32 @@
+"""Step result cache: workflows.cache_step_outputs, step_outputs.cached
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "003"
+down_revision: Union[str, Sequence[str], None] = "002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "workflows",
+        sa.Column("cache_step_outputs", sa.Boolean(), server_default=sa.true(), nullable=False),
+    )
+    op.add_column(
+        "step_outputs",
+        sa.Column("cached", sa.Boolean(), server_default=sa.false(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("step_outputs", "cached")
+    op.drop_column("workflows", "cache_step_outputs")
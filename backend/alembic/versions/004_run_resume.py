@@ -0,0 +1,40 @@
+"""Run resume: runs.resumed_from_run_id / rerun_from_step_id, step_outputs reuse metadata
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "004"
+down_revision: Union[str, Sequence[str], None] = "003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("runs", sa.Column("resumed_from_run_id", postgresql.UUID(as_uuid=True), nullable=True))
+    op.add_column("runs", sa.Column("rerun_from_step_id", postgresql.UUID(as_uuid=True), nullable=True))
+    op.create_foreign_key(
+        "fk_runs_resumed_from_run_id", "runs", "runs", ["resumed_from_run_id"], ["id"], ondelete="SET NULL"
+    )
+    op.add_column(
+        "step_outputs",
+        sa.Column("reused", sa.Boolean(), server_default=sa.false(), nullable=False),
+    )
+    op.add_column("step_outputs", sa.Column("error_message", sa.Text(), nullable=True))
+    op.add_column("step_outputs", sa.Column("fingerprint", sa.String(64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("step_outputs", "fingerprint")
+    op.drop_column("step_outputs", "error_message")
+    op.drop_column("step_outputs", "reused")
+    op.drop_constraint("fk_runs_resumed_from_run_id", "runs", type_="foreignkey")
+    op.drop_column("runs", "rerun_from_step_id")
+    op.drop_column("runs", "resumed_from_run_id")
@@ -0,0 +1,43 @@
+"""Batch runs: batches table, runs.batch_id
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "005"
+down_revision: Union[str, Sequence[str], None] = "004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "batches",
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("workflow_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("browser_id", sa.String(36), nullable=False),
+        sa.Column("total", sa.Integer(), nullable=False),
+        sa.Column("concurrency", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(["workflow_id"], ["workflows.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_batches_browser_id"), "batches", ["browser_id"], unique=False)
+    op.add_column("runs", sa.Column("batch_id", postgresql.UUID(as_uuid=True), nullable=True))
+    op.create_foreign_key("fk_runs_batch_id", "runs", "batches", ["batch_id"], ["id"], ondelete="CASCADE")
+    op.create_index(op.f("ix_runs_batch_id"), "runs", ["batch_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_runs_batch_id"), table_name="runs")
+    op.drop_constraint("fk_runs_batch_id", "runs", type_="foreignkey")
+    op.drop_column("runs", "batch_id")
+    op.drop_index(op.f("ix_batches_browser_id"), table_name="batches")
+    op.drop_table("batches")
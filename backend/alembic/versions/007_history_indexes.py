@@ -0,0 +1,49 @@
+"""Keyset pagination indexes for run and workflow history
+
+Replaces the single-column browser_id / workflow_id indexes with composite (owner, timestamp DESC, id DESC)
+indexes, which serve the same equality lookups and return newest-first pages without a sort.
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "007"
+down_revision: Union[str, Sequence[str], None] = "006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_runs_browser_id_started_at_id",
+        "runs",
+        ["browser_id", sa.text("started_at DESC"), sa.text("id DESC")],
+    )
+    op.create_index(
+        "ix_runs_workflow_id_started_at_id",
+        "runs",
+        ["workflow_id", sa.text("started_at DESC"), sa.text("id DESC")],
+    )
+    op.create_index(
+        "ix_workflows_browser_id_created_at_id",
+        "workflows",
+        ["browser_id", sa.text("created_at DESC"), sa.text("id DESC")],
+    )
+    op.drop_index("ix_runs_browser_id", table_name="runs")
+    op.drop_index("ix_runs_workflow_id", table_name="runs")
+    op.drop_index("ix_workflows_browser_id", table_name="workflows")
+
+
+def downgrade() -> None:
+    op.create_index("ix_workflows_browser_id", "workflows", ["browser_id"], unique=False)
+    op.create_index("ix_runs_workflow_id", "runs", ["workflow_id"], unique=False)
+    op.create_index("ix_runs_browser_id", "runs", ["browser_id"], unique=False)
+    op.drop_index("ix_workflows_browser_id_created_at_id", table_name="workflows")
+    op.drop_index("ix_runs_workflow_id_started_at_id", table_name="runs")
+    op.drop_index("ix_runs_browser_id_started_at_id", table_name="runs")
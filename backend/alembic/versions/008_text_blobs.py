@@ -0,0 +1,93 @@
+"""Content-addressed text storage: text_blobs, runs.input_hash, step_outputs.input_hash/output_hash
+
+Existing texts are moved into text_blobs uncompressed (codec raw; Postgres cannot zlib) and deduplicated;
+texts written from now on are compressed by the application when that makes them smaller.
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-17
+
+"""
+import zlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "008"
+down_revision: Union[str, Sequence[str], None] = "007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_HASH = "encode(sha256(convert_to({col}, 'UTF8')), 'hex')"
+
+
+def upgrade() -> None:
+    op.create_table(
+        "text_blobs",
+        sa.Column("hash", sa.String(64), nullable=False),
+        sa.Column("codec", sa.String(8), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("hash"),
+    )
+    op.add_column("runs", sa.Column("input_hash", sa.String(64), nullable=True))
+    op.add_column("step_outputs", sa.Column("input_hash", sa.String(64), nullable=True))
+    op.add_column("step_outputs", sa.Column("output_hash", sa.String(64), nullable=True))
+
+    op.execute(
+        f"""
+        INSERT INTO text_blobs (hash, codec, data, size)
+        SELECT {_HASH.format(col="t")}, 'raw', convert_to(t, 'UTF8'), octet_length(convert_to(t, 'UTF8'))
+        FROM (
+            SELECT input_text AS t FROM runs
+            UNION SELECT input_text FROM step_outputs
+            UNION SELECT output_text FROM step_outputs
+        ) texts
+        ON CONFLICT (hash) DO NOTHING
+        """
+    )
+    op.execute(f"UPDATE runs SET input_hash = {_HASH.format(col='input_text')}")
+    op.execute(
+        f"UPDATE step_outputs SET input_hash = {_HASH.format(col='input_text')}, "
+        f"output_hash = {_HASH.format(col='output_text')}"
+    )
+
+    op.alter_column("runs", "input_hash", nullable=False)
+    op.alter_column("step_outputs", "input_hash", nullable=False)
+    op.alter_column("step_outputs", "output_hash", nullable=False)
+    op.create_foreign_key("fk_runs_input_hash", "runs", "text_blobs", ["input_hash"], ["hash"])
+    op.create_foreign_key("fk_step_outputs_input_hash", "step_outputs", "text_blobs", ["input_hash"], ["hash"])
+    op.create_foreign_key("fk_step_outputs_output_hash", "step_outputs", "text_blobs", ["output_hash"], ["hash"])
+    op.drop_column("runs", "input_text")
+    op.drop_column("step_outputs", "input_text")
+    op.drop_column("step_outputs", "output_text")
+
+
+def downgrade() -> None:
+    op.add_column("runs", sa.Column("input_text", sa.Text(), nullable=True))
+    op.add_column("step_outputs", sa.Column("input_text", sa.Text(), nullable=True))
+    op.add_column("step_outputs", sa.Column("output_text", sa.Text(), nullable=True))
+
+    # Decompress in Python; blobs written by the application may be zlib-compressed
+    bind = op.get_bind()
+    blobs = sa.table(
+        "text_blobs", sa.column("hash", sa.String), sa.column("codec", sa.String), sa.column("data", sa.LargeBinary)
+    )
+    for digest, codec, data in bind.execute(sa.select(blobs.c.hash, blobs.c.codec, blobs.c.data)):
+        text = (zlib.decompress(data) if codec == "zlib" else bytes(data)).decode("utf-8")
+        params = {"text": text, "hash": digest}
+        bind.execute(sa.text("UPDATE runs SET input_text = :text WHERE input_hash = :hash"), params)
+        bind.execute(sa.text("UPDATE step_outputs SET input_text = :text WHERE input_hash = :hash"), params)
+        bind.execute(sa.text("UPDATE step_outputs SET output_text = :text WHERE output_hash = :hash"), params)
+
+    op.alter_column("runs", "input_text", nullable=False)
+    op.alter_column("step_outputs", "input_text", nullable=False)
+    op.alter_column("step_outputs", "output_text", nullable=False)
+    op.drop_constraint("fk_step_outputs_output_hash", "step_outputs", type_="foreignkey")
+    op.drop_constraint("fk_step_outputs_input_hash", "step_outputs", type_="foreignkey")
+    op.drop_constraint("fk_runs_input_hash", "runs", type_="foreignkey")
+    op.drop_column("step_outputs", "output_hash")
+    op.drop_column("step_outputs", "input_hash")
+    op.drop_column("runs", "input_hash")
+    op.drop_table("text_blobs")
@@ -0,0 +1,32 @@
+"""LLM retry and throttle accounting: step_outputs.retries, step_outputs.throttle_wait_ms
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "009"
+down_revision: Union[str, Sequence[str], None] = "008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "step_outputs",
+        sa.Column("retries", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.add_column(
+        "step_outputs",
+        sa.Column("throttle_wait_ms", sa.Float(), server_default="0", nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("step_outputs", "throttle_wait_ms")
+    op.drop_column("step_outputs", "retries")
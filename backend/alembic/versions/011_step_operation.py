@@ -0,0 +1,27 @@
+"""Local (non-LLM) step operations: steps.operation, steps.operation_config
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "011"
+down_revision: Union[str, Sequence[str], None] = "010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("steps", sa.Column("operation", sa.String(length=32), nullable=True))
+    op.add_column("steps", sa.Column("operation_config", postgresql.JSONB(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("steps", "operation_config")
+    op.drop_column("steps", "operation")
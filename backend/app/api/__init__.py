@@ -1,10 +1,11 @@
-"""API routes under /api: workflows (CRUD, steps, edges, validate), runs (create, list, get), health."""
+"""API routes under /api: workflows (CRUD, steps, edges, validate), runs (create, list, get), health, metrics."""
 from fastapi import APIRouter
 
-from app.api.routes import health, runs, workflows
+from app.api.routes import health, metrics, runs, workflows
 from app.core.config import settings
 
 api_router = APIRouter(prefix=settings.api_prefix)
 api_router.include_router(workflows.router)
 api_router.include_router(runs.router)
 api_router.include_router(health.router)
+api_router.include_router(metrics.router)
@@ -1,42 +1,45 @@
 import time
 from typing import Any, Dict
 
-from fastapi import APIRouter, Depends
-from sqlalchemy import text
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
 
-from app.db.session import get_db
-from app.services.cache import redis_status
-from app.services.llm import is_available as llm_available
+from app.services import health as health_service
+from app.services.cache import workflow_cache_stats
+from app.services.execution_plan import execution_plan_cache_stats
+from app.services.llm_throttle import llm_throttle_stats
+from app.services.single_flight import single_flight_stats
+from app.services.step_cache import step_cache_stats
 
 router = APIRouter(prefix="/health", tags=["health"])
 
 
 @router.get("")
-async def health(
-    db: AsyncSession = Depends(get_db),
-) -> Dict[str, Any]:
+async def health() -> Dict[str, Any]:
+    """Dependency status from the last background check, plus cache and LLM throttling counters."""
     start = time.perf_counter()
-    db_ok = False
-    try:
-        await db.execute(text("SELECT 1"))
-        db_ok = True
-    except Exception:
-        pass
-    try:
-        redis_status_val = await redis_status()
-    except Exception:
-        redis_status_val = "error"
-    try:
-        llm_val = "gemini_configured" if llm_available() else "gemini_not_configured"
-    except Exception:
-        llm_val = "error"
+    status = await health_service.legacy_status()
     elapsed_ms = (time.perf_counter() - start) * 1000
 
     return {
-        "status": "ok" if db_ok else "degraded",
+        **status,
         "backend_response_time_ms": round(elapsed_ms, 2),
-        "database": "connected" if db_ok else "disconnected",
-        "redis": redis_status_val,
-        "llm": llm_val,
+        "workflow_cache": workflow_cache_stats(),
+        "step_cache": step_cache_stats(),
+        "execution_plan_cache": execution_plan_cache_stats(),
+        "llm_throttle": llm_throttle_stats(),
+        "llm_coalescing": single_flight_stats(),
     }
+
+
+@router.get("/live")
+async def live() -> Dict[str, str]:
+    """Liveness: the process is serving requests. Touches no dependency."""
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def ready() -> JSONResponse:
+    """Readiness from the cached dependency snapshot; 503 when the database check failed or the snapshot is stale."""
+    snapshot = await health_service.snapshot()
+    return JSONResponse(snapshot, status_code=200 if snapshot["ready"] else 503)
@@ -0,0 +1,73 @@
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import metrics
+from app.core.config import settings
+from app.db.session import get_db, pool_stats
+from app.models import Run
+from app.services.cache import workflow_cache_stats
+from app.services.execution_plan import execution_plan_cache_stats
+from app.services.step_cache import step_cache_stats
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+def _cache_requests() -> dict[tuple[str, ...], float]:
+    """Lookups per cache, tier and result, read from the caches' own counters."""
+    plan = execution_plan_cache_stats()  # local tier counters at the top level
+    stats = {
+        "workflow": workflow_cache_stats(),
+        "step": step_cache_stats(),
+        "execution_plan": {"local": plan, "redis": plan["redis"]},
+    }
+    values = {}
+    for cache, tiers in stats.items():
+        for tier in ("local", "redis"):
+            values[(cache, tier, "hit")] = tiers[tier]["hits"]
+            values[(cache, tier, "miss")] = tiers[tier]["misses"]
+    return values
+
+
+def _pool_stat(name: str):
+    """Collector for a pool_stats() counter (size, checked_out, overflow); empty for pools without it."""
+
+    def collect() -> dict[tuple[str, ...], float]:
+        stats = pool_stats()
+        return {(): stats[name]} if name in stats else {}
+
+    return collect
+
+
+metrics.Counter(
+    "cache_requests_total",
+    "Cache lookups by cache (workflow, step, execution_plan), tier (local, redis) and result (hit, miss).",
+    ("cache", "tier", "result"),
+    collect=_cache_requests,
+)
+metrics.Gauge("db_pool_size", "Configured DB pool size (persistent connections).", collect=_pool_stat("size"))
+metrics.Gauge("db_pool_checked_out", "DB connections currently checked out.", collect=_pool_stat("checked_out"))
+metrics.Gauge(
+    "db_pool_overflow",
+    "DB connections beyond the pool size (negative: pool connections not opened yet).",
+    collect=_pool_stat("overflow"),
+)
+
+
+@router.get("", response_class=PlainTextResponse)
+async def get_metrics(db: AsyncSession = Depends(get_db)) -> PlainTextResponse:
+    """Prometheus scrape endpoint (text exposition format)."""
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    try:
+        # Index-only count on ix_runs_pending_started_at
+        queued = await db.scalar(select(func.count()).select_from(Run).where(Run.status == "pending"))
+        metrics.runs_queued.set(queued or 0)
+    except Exception as e:
+        logger.warning("Could not count queued runs for metrics: %s", e)
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
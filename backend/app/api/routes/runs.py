@@ -1,21 +1,64 @@
-"""Run workflow and list run history. POST .../run validates the graph then executes steps with Gemini."""
+"""
+Run workflow and list run history. POST .../run checks the workflow's execution plan (validated once per
+workflow version, services/execution_plan.py), then either executes steps with Gemini
+inline or (RUN_EXECUTION_MODE=queue) leaves the run pending for a queue worker and returns immediately.
+"""
+import asyncio
+import json
+import uuid
+from typing import Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, insert, literal, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.core.dependencies import get_browser_id
-from app.db.session import get_db
-from app.models import Run, Workflow
-from app.schemas import RunCreate, RunCreated, RunRead, RunListItem
-from app.services.validation import validate_workflow_graph
+from app.core import tracing
+from app.core.config import settings
+from app.core.dependencies import get_browser_id, get_browser_id_for_stream
+from app.core.pagination import paginate, set_next_cursor
+from app.db.session import async_session_factory, get_db
+from app.models import Batch, Run, StepOutput, Workflow
+from app.schemas import BatchCreate, BatchCreated, BatchRead, RunCreate, RunCreated, RunRead, RunListItem, RunResume
+from app.services import run_events
+from app.services.batch_executor import start_batch
+from app.services.execution_plan import ExecutionPlan, get_current_plan
+from app.services.text_store import store_text, store_texts
 from app.services.workflow_executor import execute_workflow
 
 router = APIRouter(prefix="/runs", tags=["runs"])
 
 
+async def _get_valid_plan(workflow_id: UUID, browser_id: str, db: AsyncSession) -> ExecutionPlan:
+    """Execution plan of the browser's workflow; 404 if missing, 400 with errors if the graph is invalid."""
+    plan = await get_current_plan(workflow_id, browser_id, db)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    if plan.errors:
+        raise HTTPException(status_code=400, detail=list(plan.errors))
+    return plan
+
+
+async def _start_run(run: Run, db: AsyncSession) -> RunCreated:
+    """Persist a new pending run, then execute it inline or leave it for a queue worker."""
+    db.add(run)
+    await db.commit()
+    await db.refresh(run)
+    # Ties this request's trace (plan lookup, input storage, inline execution) to the run's timeline
+    tracing.current_span().set_attribute("run_id", str(run.id))
+
+    if settings.run_execution_mode == "queue":
+        # A worker claims the pending run (app.tasks.workflow_executor); client polls GET /runs/{id}
+        return RunCreated(run_id=run.id, workflow_id=run.workflow_id, status=run.status)
+
+    await execute_workflow(run.id, db)
+    await db.refresh(run)
+
+    return RunCreated(run_id=run.id, workflow_id=run.workflow_id, status=run.status)
+
+
 @router.post("/workflows/{workflow_id}/run", response_model=RunCreated, status_code=200)
 async def create_run(
     workflow_id: UUID,
@@ -23,54 +66,202 @@ async def create_run(
     db: AsyncSession = Depends(get_db),
     browser_id: str = Depends(get_browser_id),
 ):
-    result = await db.execute(
-        select(Workflow)
-        .where(Workflow.id == workflow_id, Workflow.browser_id == browser_id)
-        .options(selectinload(Workflow.steps), selectinload(Workflow.edges))
+    await _get_valid_plan(workflow_id, browser_id, db)
+    run = Run(
+        workflow_id=workflow_id,
+        browser_id=browser_id,
+        input_hash=await store_text(body.input_text, db),
+        status="pending",
     )
-    workflow = result.scalar_one_or_none()
-    if not workflow:
-        raise HTTPException(status_code=404, detail="Workflow not found")
+    return await _start_run(run, db)
 
-    step_ids = [s.id for s in workflow.steps]
-    step_types = {s.id: s.step_type for s in workflow.steps}
-    edge_list = [(e.source_step_id, e.target_step_id) for e in workflow.edges]
-    errors = validate_workflow_graph(step_ids, step_types, edge_list)
-    if errors:
-        raise HTTPException(status_code=400, detail=errors)
+
+@router.post("/{run_id}/resume", response_model=RunCreated, status_code=200)
+async def resume_run(
+    run_id: UUID,
+    body: Optional[RunResume] = None,
+    db: AsyncSession = Depends(get_db),
+    browser_id: str = Depends(get_browser_id),
+):
+    """
+    Start a new run with the same input as run_id, reusing its outputs for the unchanged prefix of steps
+    (same step definition, same input, succeeded) and calling the LLM from the first changed or failed step.
+    With from_step_id, that step and everything after it are re-executed even if unchanged.
+    """
+    result = await db.execute(select(Run).where(Run.id == run_id, Run.browser_id == browser_id))
+    previous = result.scalar_one_or_none()
+    if not previous:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if previous.status in ("pending", "running"):
+        raise HTTPException(status_code=409, detail="Run is still in progress")
+
+    plan = await _get_valid_plan(previous.workflow_id, browser_id, db)
+    from_step_id = body.from_step_id if body else None
+    if from_step_id is not None and from_step_id not in plan.step_ids():
+        raise HTTPException(status_code=400, detail="from_step_id must be a step ID in this workflow")
 
     run = Run(
-        workflow_id=workflow_id,
+        workflow_id=previous.workflow_id,
         browser_id=browser_id,
-        input_text=body.input_text,
+        input_hash=previous.input_hash,
         status="pending",
+        resumed_from_run_id=previous.id,
+        rerun_from_step_id=from_step_id,
+    )
+    return await _start_run(run, db)
+
+
+async def _create_batch(
+    workflow_id: UUID,
+    inputs: list[str],
+    concurrency: Optional[int],
+    browser_id: str,
+    db: AsyncSession,
+) -> BatchCreated:
+    """Insert the inputs' text blobs, a batch and one pending run per input (one executemany each), then start
+    or enqueue them."""
+    await _get_valid_plan(workflow_id, browser_id, db)
+    if len(inputs) > settings.batch_max_inputs:
+        raise HTTPException(status_code=400, detail=f"A batch may contain at most {settings.batch_max_inputs} inputs")
+    if any(not text for text in inputs):
+        raise HTTPException(status_code=400, detail="Batch inputs must be non-empty strings")
+    if any(len(text) > settings.run_input_max_chars for text in inputs):
+        raise HTTPException(
+            status_code=400, detail=f"Batch inputs may be at most {settings.run_input_max_chars} characters long"
+        )
+    concurrency = min(concurrency or settings.batch_default_concurrency, settings.batch_max_concurrency)
+
+    batch = Batch(
+        id=uuid.uuid4(),
+        workflow_id=workflow_id,
+        browser_id=browser_id,
+        total=len(inputs),
+        concurrency=concurrency,
+    )
+    db.add(batch)
+    await db.flush()
+    input_hashes = await store_texts(inputs, db)
+    run_ids = [uuid.uuid4() for _ in inputs]
+    await db.execute(
+        insert(Run),
+        [
+            {
+                "id": run_id,
+                "workflow_id": workflow_id,
+                "browser_id": browser_id,
+                "input_hash": input_hash,
+                "status": "pending",
+                "batch_id": batch.id,
+            }
+            for run_id, input_hash in zip(run_ids, input_hashes)
+        ],
     )
-    db.add(run)
     await db.commit()
-    await db.refresh(run)
 
-    await execute_workflow(run.id, body.input_text, db)
-    await db.refresh(run)
+    if settings.run_execution_mode != "queue":
+        start_batch(batch.id, run_ids, concurrency)
+    return BatchCreated(batch_id=batch.id, workflow_id=workflow_id, total=batch.total, status="pending")
 
-    return RunCreated(run_id=run.id, workflow_id=workflow_id, status=run.status)
 
+def _parse_ndjson_inputs(raw: bytes) -> list[str]:
+    """One input per non-blank line: a JSON string or an object with input_text."""
+    try:
+        text = raw.decode("utf-8")
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Upload is not valid UTF-8 (byte {e.start})")
+    inputs: list[str] = []
+    for line_no, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Line {line_no}: invalid JSON")
+        if isinstance(item, dict):
+            item = item.get("input_text")
+        if not isinstance(item, str):
+            raise HTTPException(
+                status_code=400, detail=f"Line {line_no}: expected a string or an object with input_text"
+            )
+        inputs.append(item)
+    if not inputs:
+        raise HTTPException(status_code=400, detail="Upload contains no inputs")
+    return inputs
 
-@router.get("", response_model=list[RunListItem])
-async def list_runs(
+
+@router.post("/workflows/{workflow_id}/batch", response_model=BatchCreated, status_code=202)
+async def create_batch(
+    workflow_id: UUID,
+    body: BatchCreate,
     db: AsyncSession = Depends(get_db),
     browser_id: str = Depends(get_browser_id),
-    limit: int = 5,
 ):
-    if limit > 50:
-        limit = 50
-    result = await db.execute(
-        select(Run, Workflow.name)
-        .join(Workflow, Run.workflow_id == Workflow.id)
-        .where(Run.browser_id == browser_id)
-        .order_by(Run.started_at.desc())
-        .limit(limit)
+    """Run the workflow once per input. Returns at once; follow progress with GET /runs/batches/{batch_id}."""
+    return await _create_batch(workflow_id, body.inputs, body.concurrency, browser_id, db)
+
+
+@router.post("/workflows/{workflow_id}/batch/upload", response_model=BatchCreated, status_code=202)
+async def create_batch_from_upload(
+    workflow_id: UUID,
+    file: UploadFile = File(...),
+    concurrency: Optional[int] = Form(None, ge=1),
+    db: AsyncSession = Depends(get_db),
+    browser_id: str = Depends(get_browser_id),
+):
+    """
+    Like POST .../batch, with inputs from an NDJSON file (multipart field "file", optional field
+    "concurrency"). Files over BATCH_UPLOAD_MAX_BYTES get 413.
+    """
+    limit = settings.batch_upload_max_bytes
+    raw = await file.read(limit + 1)
+    if len(raw) > limit:
+        raise HTTPException(status_code=413, detail=f"Upload is larger than {limit} bytes")
+    inputs = _parse_ndjson_inputs(raw)
+    return await _create_batch(workflow_id, inputs, concurrency, browser_id, db)
+
+
+@router.get("/batches/{batch_id}", response_model=BatchRead)
+async def get_batch(
+    batch_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    browser_id: str = Depends(get_browser_id),
+):
+    """Batch with run counts per status and overall progress (one GROUP BY over the batch's runs)."""
+    result = await db.execute(select(Batch).where(Batch.id == batch_id, Batch.browser_id == browser_id))
+    batch = result.scalar_one_or_none()
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    rows = await db.execute(
+        select(Run.status, func.count()).where(Run.batch_id == batch_id).group_by(Run.status)
+    )
+    counts = {status: n for status, n in rows.all()}
+    finished = counts.get("completed", 0) + counts.get("failed", 0)
+    if finished >= batch.total:
+        status = "completed"
+    elif counts.get("pending", 0) == batch.total:
+        status = "pending"
+    else:
+        status = "running"
+    return BatchRead(
+        id=batch.id,
+        workflow_id=batch.workflow_id,
+        total=batch.total,
+        concurrency=batch.concurrency,
+        created_at=batch.created_at,
+        status=status,
+        counts=counts,
+        progress=round(finished / batch.total, 4) if batch.total else 1.0,
     )
-    rows = result.all()
+
+
+RUN_LIST_MAX_LIMIT = 50
+
+
+async def _list_runs_page(query, cursor: Optional[str], limit: int, response: Response, db: AsyncSession):
+    """One newest-first page of (Run, workflow name) rows as RunListItems; sets X-Next-Cursor if more remain."""
+    limit = max(1, min(limit, RUN_LIST_MAX_LIMIT))
+    result = await db.execute(paginate(query, Run.started_at, Run.id, cursor, limit))
+    rows = set_next_cursor(response, result.all(), limit, key=lambda row: (row[0].started_at, row[0].id))
     return [
         RunListItem(
             id=r.id,
@@ -84,6 +275,48 @@ async def list_runs(
     ]
 
 
+@router.get("", response_model=list[RunListItem])
+async def list_runs(
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    browser_id: str = Depends(get_browser_id),
+    limit: int = 5,
+    cursor: Optional[str] = None,
+    batch_id: Optional[UUID] = None,
+):
+    """Runs of this browser, newest first. Page with the X-Next-Cursor response header (?cursor=)."""
+    query = (
+        select(Run, Workflow.name)
+        .join(Workflow, Run.workflow_id == Workflow.id)
+        .where(Run.browser_id == browser_id)
+    )
+    if batch_id is not None:
+        query = query.where(Run.batch_id == batch_id)
+    return await _list_runs_page(query, cursor, limit, response, db)
+
+
+@router.get("/workflows/{workflow_id}/runs", response_model=list[RunListItem])
+async def list_workflow_runs(
+    workflow_id: UUID,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    browser_id: str = Depends(get_browser_id),
+    limit: int = 20,
+    cursor: Optional[str] = None,
+):
+    """Run history of one workflow, newest first. Page with the X-Next-Cursor response header (?cursor=)."""
+    result = await db.execute(
+        select(Workflow.name).where(Workflow.id == workflow_id, Workflow.browser_id == browser_id)
+    )
+    workflow_name = result.scalar_one_or_none()
+    if workflow_name is None:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    query = select(Run, literal(workflow_name)).where(
+        Run.workflow_id == workflow_id, Run.browser_id == browser_id
+    )
+    return await _list_runs_page(query, cursor, limit, response, db)
+
+
 @router.get("/{run_id}", response_model=RunRead)
 async def get_run(
     run_id: UUID,
@@ -101,6 +334,81 @@ async def get_run(
     return run
 
 
-# SSE stream for run progress - stub for now (implement with Redis when Celery is added)
-# @router.get("/{run_id}/stream")
-# async def stream_run_progress(run_id: UUID, ...): ...
+@router.get("/{run_id}/trace")
+async def get_run_trace(
+    run_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    browser_id: str = Depends(get_browser_id),
+):
+    """
+    Spans this process recorded for the run (TRACING_ENABLED): the request that created it and its execution
+    (steps, LLM calls and attempts, cache and DB calls), ordered by start with offset_ms from the first.
+    Only the last TRACING_MAX_TRACES traces are kept, so older runs return no spans.
+    """
+    if not settings.tracing_enabled:
+        raise HTTPException(status_code=404, detail="Tracing is disabled (TRACING_ENABLED)")
+    owned = await db.execute(select(Run.id).where(Run.id == run_id, Run.browser_id == browser_id))
+    if owned.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return {"run_id": str(run_id), "spans": tracing.run_timeline(str(run_id))}
+
+
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+async def _run_snapshot(run_id: UUID) -> dict:
+    """Current status plus finished step IDs, read after subscribing so no event falls in between."""
+    async with async_session_factory() as db:
+        run = (await db.execute(select(Run.status, Run.error_message).where(Run.id == run_id))).one()
+        step_ids = (await db.execute(select(StepOutput.step_id).where(StepOutput.run_id == run_id))).scalars().all()
+    return {
+        "run_id": str(run_id),
+        "type": "snapshot",
+        "status": run.status,
+        "error_message": run.error_message,
+        "completed_step_ids": [str(sid) for sid in step_ids],
+    }
+
+
+@router.get("/{run_id}/stream")
+async def stream_run_progress(
+    run_id: UUID,
+    browser_id: str = Depends(get_browser_id_for_stream),
+):
+    """
+    Server-Sent Events for one run: a snapshot, then step_started / step_completed events and a final
+    run_finished, after which the stream closes. Accepts ?browser_id= since EventSource cannot set headers.
+    Uses short-lived sessions instead of get_db, whose session would stay checked out until the stream ends.
+    """
+    async with async_session_factory() as db:
+        owned = await db.execute(select(Run.id).where(Run.id == run_id, Run.browser_id == browser_id))
+        owned_id = owned.scalar_one_or_none()
+    if owned_id is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+
+    async def events():
+        async with run_events.subscribe(run_id) as queue:
+            snapshot = await _run_snapshot(run_id)
+            yield "retry: 3000\n\n" + _sse(snapshot)
+            if snapshot["status"] in ("completed", "failed"):
+                yield _sse({**snapshot, "type": run_events.TERMINAL_EVENT})
+                return
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse(event)
+                if event["type"] == run_events.TERMINAL_EVENT:
+                    return
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
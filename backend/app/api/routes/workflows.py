@@ -1,14 +1,19 @@
+import uuid
+from typing import Annotated, List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.core.dependencies import get_browser_id
+from app.core.dependencies import BROWSER_ID_HEADER, get_browser_id
+from app.core.pagination import paginate, set_next_cursor
 from app.db.session import get_db
 from app.models import Edge, Step, Workflow
 from app.schemas import (
+    EdgeCreateByIndex,
     StepAddInWorkflow,
     StepCreate,
     StepRead,
@@ -20,59 +25,133 @@ from app.schemas import (
     WorkflowValidateResponse,
 )
 from app.services.cache import get_workflow_cached, invalidate_workflow, set_workflow_cached
-from app.services.validation import validate_workflow_graph
+from app.services.execution_plan import get_current_plan
+from app.services.local_steps import validate_config as validate_operation_config
 
 router = APIRouter(prefix="/workflows", tags=["workflows"])
 
+WORKFLOW_LIST_MAX_LIMIT = 100
+_MODIFIED_DETAIL = "Workflow was modified by another request; reload it and retry"
+
+
+async def _bump_version(workflow_id: UUID, db: AsyncSession, expected_version: Optional[int] = None) -> bool:
+    """
+    Increment Workflow.version in the current transaction; every route that changes a workflow calls this.
+    With expected_version, only bumps if the stored version still equals it (optimistic concurrency) and
+    returns False otherwise.
+    """
+    stmt = update(Workflow).where(Workflow.id == workflow_id)
+    if expected_version is not None:
+        stmt = stmt.where(Workflow.version == expected_version)
+    result = await db.execute(
+        stmt.values(version=Workflow.version + 1).execution_options(synchronize_session=False)
+    )
+    return result.rowcount > 0
+
+
+def _etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def _etag_matches(header: Optional[str], version: int) -> bool:
+    """True if an If-None-Match / If-Match header value lists this version's ETag (weak or strong) or is *."""
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or any(t.removeprefix("W/") == _etag(version) for t in tags)
+
+
+def _etag_headers(version: int) -> dict[str, str]:
+    # no-cache: browsers may store the workflow but must revalidate it (If-None-Match) before each use
+    return {"ETag": _etag(version), "Cache-Control": "private, no-cache", "Vary": BROWSER_ID_HEADER}
+
+
+async def _insert_graph(
+    workflow_id: UUID,
+    steps: List[StepCreate],
+    edges: List[EdgeCreateByIndex],
+    db: AsyncSession,
+    keep_ids: frozenset[UUID] = frozenset(),
+) -> None:
+    """
+    Insert a workflow's steps and edges with one executemany each. Step IDs are generated here rather than
+    flushed one by one, so edges can reference them without a round trip per step.
+    A step whose id is in keep_ids (existing steps of the workflow) is updated in place instead, so its
+    StepOutputs stay available to resumed runs. Edges whose indices are out of range are skipped.
+    """
+    step_ids: list[UUID] = []
+    for s in steps:
+        step_ids.append(s.id if s.id in keep_ids and s.id not in step_ids else uuid.uuid4())
+    rows = [
+        {
+            "id": step_id,
+            "workflow_id": workflow_id,
+            "name": s.name,
+            "description": s.description,
+            "step_type": s.step_type,
+            "llm_provider": s.llm_provider,
+            "operation": s.operation,
+            "operation_config": s.operation_config,
+            "position": s.position or {},
+        }
+        for step_id, s in zip(step_ids, steps)
+    ]
+    kept = [row for row in rows if row["id"] in keep_ids]
+    new = [row for row in rows if row["id"] not in keep_ids]
+    if kept:
+        await db.execute(update(Step), kept)  # bulk UPDATE by primary key
+    if new:
+        await db.execute(insert(Step), new)
+    n = len(step_ids)
+    edge_rows = [
+        {
+            "id": uuid.uuid4(),
+            "workflow_id": workflow_id,
+            "source_step_id": step_ids[e.source_index],
+            "target_step_id": step_ids[e.target_index],
+        }
+        for e in edges
+        if 0 <= e.source_index < n and 0 <= e.target_index < n
+    ]
+    if edge_rows:
+        await db.execute(insert(Edge), edge_rows)
+
 
 @router.get("", response_model=list[WorkflowListItem])
 async def list_workflows(
+    response: Response,
     db: AsyncSession = Depends(get_db),
     browser_id: str = Depends(get_browser_id),
+    limit: int = 100,
+    cursor: Optional[str] = None,
 ):
-    result = await db.execute(
-        select(Workflow).where(Workflow.browser_id == browser_id).order_by(Workflow.created_at.desc())
-    )
-    workflows = result.scalars().all()
+    """Workflows of this browser, newest first. Page with the X-Next-Cursor response header (?cursor=)."""
+    limit = max(1, min(limit, WORKFLOW_LIST_MAX_LIMIT))
+    query = select(Workflow).where(Workflow.browser_id == browser_id)
+    result = await db.execute(paginate(query, Workflow.created_at, Workflow.id, cursor, limit))
+    workflows = set_next_cursor(response, result.scalars().all(), limit, key=lambda w: (w.created_at, w.id))
     return list(workflows)
 
 
 @router.post("", response_model=WorkflowRead, status_code=201)
 async def create_workflow(
     body: WorkflowCreate,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     browser_id: str = Depends(get_browser_id),
 ):
-    n = len(body.steps)
-    workflow = Workflow(name=body.name, description=body.description, browser_id=browser_id)
+    workflow = Workflow(
+        id=uuid.uuid4(),
+        name=body.name,
+        description=body.description,
+        browser_id=browser_id,
+        cache_step_outputs=body.cache_step_outputs,
+    )
     db.add(workflow)
     await db.flush()
-
-    step_id_by_index: dict[int, UUID] = {}
-    for i, s in enumerate(body.steps):
-        step = Step(
-            workflow_id=workflow.id,
-            name=s.name,
-            description=s.description,
-            step_type=s.step_type,
-            position=s.position or {},
-        )
-        db.add(step)
-        await db.flush()
-        step_id_by_index[i] = step.id
-
-    for e in body.edges:
-        si, ti = e.source_index, e.target_index
-        if si in step_id_by_index and ti in step_id_by_index:
-            edge = Edge(
-                workflow_id=workflow.id,
-                source_step_id=step_id_by_index[si],
-                target_step_id=step_id_by_index[ti],
-            )
-            db.add(edge)
-
+    await _insert_graph(workflow.id, body.steps, body.edges, db)
     await db.commit()
-    await db.refresh(workflow)
+
     result = await db.execute(
         select(Workflow).where(Workflow.id == workflow.id).options(
             selectinload(Workflow.steps),
@@ -80,18 +159,37 @@ async def create_workflow(
         )
     )
     workflow = result.scalar_one()
+    response.headers.update(_etag_headers(workflow.version))
     return workflow
 
 
 @router.get("/{workflow_id}", response_model=WorkflowRead)
 async def get_workflow(
     workflow_id: UUID,
+    response: Response,
+    if_none_match: Annotated[Optional[str], Header()] = None,
     db: AsyncSession = Depends(get_db),
     browser_id: str = Depends(get_browser_id),
 ):
+    """
+    Workflow with steps and edges. The ETag is the workflow version: with a matching If-None-Match the answer
+    is 304 without a body, served from the cache (no Postgres query) when the workflow is cached.
+    """
     cached = await get_workflow_cached(workflow_id, browser_id)
-    if cached is not None:
-        return WorkflowRead.model_validate(cached)
+    if cached is not None and "version" in cached:
+        headers = _etag_headers(cached["version"])
+        if _etag_matches(if_none_match, cached["version"]):
+            return Response(status_code=304, headers=headers)
+        return JSONResponse(cached, headers=headers)
+
+    if if_none_match:
+        result = await db.execute(
+            select(Workflow.version).where(Workflow.id == workflow_id, Workflow.browser_id == browser_id)
+        )
+        version = result.scalar_one_or_none()
+        if version is not None and _etag_matches(if_none_match, version):
+            return Response(status_code=304, headers=_etag_headers(version))
+
     result = await db.execute(
         select(Workflow)
         .where(Workflow.id == workflow_id, Workflow.browser_id == browser_id)
@@ -104,6 +202,7 @@ async def get_workflow(
     await set_workflow_cached(
         workflow_id, browser_id, workflow_read.model_dump(mode="json")
     )
+    response.headers.update(_etag_headers(workflow.version))
     return workflow_read
 
 
@@ -114,85 +213,73 @@ async def validate_workflow(
     browser_id: str = Depends(get_browser_id),
 ):
     """Return validation result for the workflow graph. Frontend can call this to show errors without duplicating rules."""
-    result = await db.execute(
-        select(Workflow)
-        .where(Workflow.id == workflow_id, Workflow.browser_id == browser_id)
-        .options(selectinload(Workflow.steps), selectinload(Workflow.edges))
-    )
-    workflow = result.scalar_one_or_none()
-    if not workflow:
+    plan = await get_current_plan(workflow_id, browser_id, db)
+    if plan is None:
         raise HTTPException(status_code=404, detail="Workflow not found")
-    step_ids = [s.id for s in workflow.steps]
-    step_types = {s.id: s.step_type for s in workflow.steps}
-    edge_list = [(e.source_step_id, e.target_step_id) for e in workflow.edges]
-    errors = validate_workflow_graph(step_ids, step_types, edge_list)
-    return WorkflowValidateResponse(valid=len(errors) == 0, errors=errors)
+    return WorkflowValidateResponse(valid=plan.valid, errors=list(plan.errors))
 
 
 @router.patch("/{workflow_id}", response_model=WorkflowRead)
 async def update_workflow(
     workflow_id: UUID,
     body: WorkflowUpdate,
+    response: Response,
+    if_match: Annotated[Optional[str], Header()] = None,
     db: AsyncSession = Depends(get_db),
     browser_id: str = Depends(get_browser_id),
 ):
+    """Update fields and/or replace the graph. With If-Match, 412 unless it matches the current version's ETag."""
     result = await db.execute(
-        select(Workflow)
-        .where(Workflow.id == workflow_id, Workflow.browser_id == browser_id)
-        .options(selectinload(Workflow.steps), selectinload(Workflow.edges))
+        select(Workflow).where(Workflow.id == workflow_id, Workflow.browser_id == browser_id)
     )
     workflow = result.scalar_one_or_none()
     if not workflow:
         raise HTTPException(status_code=404, detail="Workflow not found")
+    expected_version = workflow.version if if_match else None
+    if if_match and not _etag_matches(if_match, workflow.version):
+        raise HTTPException(status_code=412, detail=_MODIFIED_DETAIL)
 
     if body.name is not None:
         workflow.name = body.name
     if body.description is not None:
         workflow.description = body.description
+    if body.cache_step_outputs is not None:
+        workflow.cache_step_outputs = body.cache_step_outputs
 
     if body.steps is not None and body.edges is not None:
-        # Replace steps and edges (no graph validation; frontend validates, backend validates at run)
-        for s in workflow.steps:
-            await db.delete(s)
-        for e in workflow.edges:
-            await db.delete(e)
-        await db.flush()
-
-        n = len(body.steps)
-        step_id_by_index = {}
-        for i, s in enumerate(body.steps):
-            step = Step(
-                workflow_id=workflow.id,
-                name=s.name,
-                description=s.description,
-                step_type=s.step_type,
-                position=s.position or {},
-            )
-            db.add(step)
-            await db.flush()
-            step_id_by_index[i] = step.id
-        for e in body.edges:
-            si, ti = e.source_index, e.target_index
-            if si in step_id_by_index and ti in step_id_by_index:
-                edge = Edge(
-                    workflow_id=workflow.id,
-                    source_step_id=step_id_by_index[si],
-                    target_step_id=step_id_by_index[ti],
-                )
-                db.add(edge)
+        # Replace steps and edges (no graph validation; frontend validates, backend validates at run).
+        # Steps sent with their id are updated in place; step outputs of the dropped steps go with them
+        # through ON DELETE CASCADE.
+        result = await db.execute(select(Step.id).where(Step.workflow_id == workflow.id))
+        keep_ids = frozenset(result.scalars().all()) & {s.id for s in body.steps}
+        await db.execute(
+            delete(Edge).where(Edge.workflow_id == workflow.id).execution_options(synchronize_session=False)
+        )
+        await db.execute(
+            delete(Step)
+            .where(Step.workflow_id == workflow.id, Step.id.not_in(keep_ids))
+            .execution_options(synchronize_session=False)
+        )
+        await _insert_graph(workflow.id, body.steps, body.edges, db, keep_ids)
     elif body.steps is not None or body.edges is not None:
         raise HTTPException(status_code=400, detail="Provide both steps and edges when updating graph")
 
+    if not await _bump_version(workflow_id, db, expected_version):
+        # Another request changed the workflow after we read it
+        await db.rollback()
+        raise HTTPException(status_code=412, detail=_MODIFIED_DETAIL)
     await db.commit()
     await invalidate_workflow(workflow_id)
-    await db.refresh(workflow)
+    # populate_existing: the session keeps loaded objects across commits and version was bumped in SQL
     result = await db.execute(
-        select(Workflow).where(Workflow.id == workflow.id).options(
-            selectinload(Workflow.steps),
-            selectinload(Workflow.edges),
-        )
+        select(Workflow)
+        .where(Workflow.id == workflow_id)
+        .options(selectinload(Workflow.steps), selectinload(Workflow.edges))
+        .execution_options(populate_existing=True)
     )
-    return result.scalar_one()
+    workflow = result.scalar_one()
+    response.headers.update(_etag_headers(workflow.version))
+    return workflow
 
 
 @router.delete("/{workflow_id}", status_code=204)
@@ -243,6 +330,9 @@ async def add_step(
         name=body.name,
         description=body.description,
         step_type=body.step_type,
+        llm_provider=body.llm_provider,
+        operation=body.operation,
+        operation_config=body.operation_config,
         position=body.position or {},
     )
     db.add(step)
@@ -265,6 +355,7 @@ async def add_step(
             )
         )
 
+    await _bump_version(workflow.id, db)
     await db.commit()
     await invalidate_workflow(workflow_id)
     await db.refresh(step)
@@ -296,7 +387,20 @@ async def update_step(
         step.position = body.position
     if body.step_type is not None:
         step.step_type = body.step_type
-
+    if "llm_provider" in body.model_fields_set:
+        step.llm_provider = body.llm_provider
+    if "operation" in body.model_fields_set:
+        step.operation = body.operation
+        step.operation_config = body.operation_config
+    elif "operation_config" in body.model_fields_set:
+        if step.operation is None:
+            raise HTTPException(status_code=422, detail="operation_config requires operation")
+        try:
+            step.operation_config = validate_operation_config(step.operation, body.operation_config)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+    await _bump_version(workflow_id, db)
     await db.commit()
     await invalidate_workflow(workflow_id)
     await db.refresh(step)
@@ -323,6 +427,7 @@ async def delete_step(
         raise HTTPException(status_code=404, detail="Step not found")
 
     await db.delete(step)
+    await _bump_version(workflow.id, db)
     await db.commit()
     await invalidate_workflow(workflow_id)
     return None
@@ -350,6 +455,7 @@ async def delete_edge(
     if not edge or edge.workflow.browser_id != browser_id:
         raise HTTPException(status_code=404, detail="Edge not found")
     await db.delete(edge)
+    await _bump_version(workflow_id, db)
     await db.commit()
     await invalidate_workflow(workflow_id)
     return None
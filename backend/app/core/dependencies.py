@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from typing import Annotated, Optional
 
-from fastapi import Header, HTTPException
+from fastapi import Header, HTTPException, Query
 
 BROWSER_ID_HEADER = "X-Browser-ID"
 
@@ -17,3 +17,11 @@ async def get_browser_id(
             detail="Missing or empty X-Browser-ID header. Generate a UUID and send it with every request.",
         )
     return x_browser_id.strip()
+
+
+async def get_browser_id_for_stream(
+    x_browser_id: Annotated[Optional[str], Header(alias=BROWSER_ID_HEADER)] = None,
+    browser_id: Annotated[Optional[str], Query()] = None,
+) -> str:
+    """Like get_browser_id, but also accepts ?browser_id= because EventSource cannot send custom headers."""
+    return await get_browser_id(x_browser_id or browser_id)
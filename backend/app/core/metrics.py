@@ -0,0 +1,273 @@
+"""
+In-process metrics served at GET /api/metrics in the Prometheus text exposition format (version 0.0.4).
+Counter, Gauge and Histogram keep one child per label-value tuple; updating one is a dict lookup and a few
+float additions, done on the event loop without locks (like services/local_cache.py). Values derived from
+state that is already tracked elsewhere (cache hit counters, DB pool size) are read by a `collect` callback
+at scrape time instead of being updated on the hot path. Metrics are per process; Prometheus adds them up.
+"""
+from __future__ import annotations
+
+import math
+import time
+from bisect import bisect_left
+from typing import Callable, Iterator, Optional, Sequence
+
+from app.core.config import settings
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; HTTP requests and DB pool waits are mostly far below a second, LLM calls mostly above
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+LLM_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+BYTES_BUCKETS = tuple(256 * 4**i for i in range(9))  # 256 B .. 16 MiB
+
+LabelValues = tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        collect: Optional[Callable[[], dict[LabelValues, float]]] = None,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._collect = collect
+        self._children: dict[LabelValues, object] = {}
+        if not self.labelnames and collect is None:
+            self.labels()  # exported as 0 before the first update
+        REGISTRY.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """The child for these label values (in labelnames order), created on first use."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values!r}")
+            child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _samples(self) -> Iterator[str]:
+        if self._collect is not None:
+            for values, value in self._collect().items():
+                yield f"{self.name}{_label_str(self.labelnames, values)} {_format_value(value)}"
+            return
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_label_str(self.labelnames, values)} {_format_value(child.value)}"
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    """Monotonic count. Unlabelled counters are updated directly (counter.inc()), others via .labels(...)."""
+
+    kind = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    """Value that goes up and down (or is read by `collect` at scrape time)."""
+
+    kind = "gauge"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # per bucket, not cumulative; the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    """Distribution over fixed upper bounds (le); rendered as cumulative _bucket, _sum and _count series."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _samples(self) -> Iterator[str]:
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), child.counts):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_label_str(self.labelnames, values, le)} {cumulative}"
+            labels = _label_str(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+            yield f"{self.name}_count{labels} {child.count}"
+
+
+REGISTRY: list[_Metric] = []
+
+
+def render() -> str:
+    """All registered metrics in the text exposition format."""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+def route_template(scope) -> Optional[str]:
+    """
+    Path template of the route that handled an ASGI request (/api/runs/{run_id}), None if none matched.
+    Routes of included routers carry their path without API_PREFIX, which is put back here.
+    """
+    route = getattr(scope.get("route"), "path", None)
+    if route is not None and scope["path"].startswith(settings.api_prefix + "/"):
+        if not route.startswith(settings.api_prefix):
+            route = settings.api_prefix + route
+    return route
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware observing http_request_duration_seconds. Labels use the matched route's path template
+    (/api/runs/{run_id}, not the id), so the number of series stays bounded; unmatched paths share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = route_template(scope) or "unmatched"
+            http_request_duration.labels(scope["method"], route, str(status)).observe(time.perf_counter() - start)
+
+
+# HTTP
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Time to complete an HTTP request, by route template (streamed responses until the stream ends).",
+    ("method", "route", "status"),
+)
+
+# LLM calls: one observation per provider attempt (retries are separate attempts)
+llm_call_duration = Histogram(
+    "llm_call_duration_seconds",
+    "LLM provider call latency per attempt.",
+    ("step_type", "model", "outcome"),
+    buckets=LLM_LATENCY_BUCKETS,
+)
+llm_call_errors = Counter(
+    "llm_call_errors_total",
+    "Failed LLM provider attempts (reason: timeout, throttled, error, empty).",
+    ("step_type", "model", "reason"),
+)
+llm_prompt_bytes = Histogram(
+    "llm_prompt_bytes",
+    "UTF-8 size of prompts sent to the LLM (once per logical call).",
+    ("step_type", "model"),
+    buckets=BYTES_BUCKETS,
+)
+llm_response_bytes = Histogram(
+    "llm_response_bytes",
+    "UTF-8 size of successful LLM responses.",
+    ("step_type", "model"),
+    buckets=BYTES_BUCKETS,
+)
+llm_fused_steps = Counter(
+    "llm_fused_steps_total",
+    "Steps executed through a fused prompt (outcome: fused, or fallback when they ran one by one).",
+    ("outcome",),
+)
+
+# Runs
+runs_in_flight = Gauge("runs_in_flight", "Runs being executed by this process.")
+runs_queued = Gauge("runs_queued", "Pending runs in the run queue (all processes; refreshed on scrape).")
+
+# DB connection pool
+db_pool_checkout_wait = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time to get a connection from the pool, including opening a new one.",
+)
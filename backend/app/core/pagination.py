@@ -0,0 +1,61 @@
+"""
+Keyset (cursor) pagination for newest-first lists ordered by (timestamp, id).
+List endpoints keep returning a plain JSON array; when there is a further page its opaque cursor is sent in
+the X-Next-Cursor header and passed back as ?cursor=. Each page is an index range scan on
+(owner, timestamp DESC, id DESC), however deep the client pages.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Callable, Optional, Sequence, TypeVar
+from uuid import UUID
+
+from fastapi import HTTPException, Response
+from sqlalchemy import Select, tuple_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+T = TypeVar("T")
+
+
+def encode_cursor(ts: datetime, row_id: UUID) -> str:
+    raw = json.dumps([ts.isoformat(), str(row_id)]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    """Inverse of encode_cursor; 400 for anything that is not a cursor we issued."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        ts, row_id = json.loads(raw)
+        return datetime.fromisoformat(ts), UUID(row_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate(query: Select, ts_col: Any, id_col: Any, cursor: Optional[str], limit: int) -> Select:
+    """
+    Newest first by (ts_col, id_col), starting after cursor. Fetches limit + 1 rows so set_next_cursor can
+    tell whether another page exists without a COUNT.
+    """
+    if cursor:
+        ts, row_id = decode_cursor(cursor)
+        query = query.where(tuple_(ts_col, id_col) < (ts, row_id))
+    return query.order_by(ts_col.desc(), id_col.desc()).limit(limit + 1)
+
+
+def set_next_cursor(
+    response: Response,
+    rows: Sequence[T],
+    limit: int,
+    key: Callable[[T], tuple[datetime, UUID]],
+) -> Sequence[T]:
+    """Drop the extra row fetched by paginate and, if there was one, set X-Next-Cursor from the last kept row."""
+    if len(rows) <= limit:
+        return rows
+    rows = rows[:limit]
+    response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*key(rows[-1]))
+    return rows
@@ -0,0 +1,370 @@
+"""
+Lightweight tracing: nested spans propagated through contextvars (so they follow asyncio tasks and SQLAlchemy's
+greenlets), exported to a pluggable exporter and indexed per run for GET /api/runs/{run_id}/trace.
+
+  with tracing.span("llm.call", model=model) as s:
+      ...
+      s.set_attribute("retries", 2)
+
+A span inherits run_id and step_id from its parent, so everything under a run's span carries them. With
+TRACING_ENABLED=false (the default) span() yields a shared no-op span and nothing is recorded.
+Exporters (TRACING_EXPORTER): "console" (one log line per span), "file" (OTLP/JSON lines that an
+OpenTelemetry collector's file receiver or otel-cli can read, TRACING_FILE_PATH), "memory" (kept in
+process, for tests) or "none" (per-run timelines only). Timelines hold the spans this process recorded; with
+queue workers in other processes use the file exporter to see a run's execution.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import random
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+
+from app.core.config import settings
+from app.core.metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+INHERITED_ATTRIBUTES = ("run_id", "step_id")
+SERVICE_NAME = "workflow-builder-lite"
+
+# OTLP span kinds
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, parent: Optional["Span"], kind: int, attributes: dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent else None
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        inherited = {k: parent.attributes[k] for k in INHERITED_ATTRIBUTES if parent and k in parent.attributes}
+        self.attributes = {**inherited, **{k: v for k, v in attributes.items() if v is not None}}
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def record_error(self, error: str) -> None:
+        self.error = error
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            _finish(self)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Returned when tracing is disabled; accepts and drops everything."""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def record_error(self, error: str) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def enabled() -> bool:
+    return settings.tracing_enabled
+
+
+def current_span():
+    """The innermost active span (NOOP_SPAN when there is none or tracing is off)."""
+    return _current.get() or NOOP_SPAN
+
+
+def start_span(name: str, kind: int = KIND_INTERNAL, **attributes: Any):
+    """A child of the current span that does not become current; the caller must end() it."""
+    if not settings.tracing_enabled:
+        return NOOP_SPAN
+    return Span(name, _current.get(), kind, attributes)
+
+
+@contextmanager
+def span(name: str, kind: int = KIND_INTERNAL, new_trace: bool = False, **attributes: Any) -> Iterator[Any]:
+    """
+    Run the block in a child span of the current one (new_trace: the root of a new trace, e.g. for background
+    work started by a request that does not wait for it); an exception marks the span as failed.
+    """
+    if not settings.tracing_enabled:
+        yield NOOP_SPAN
+        return
+    s = Span(name, None if new_trace else _current.get(), kind, attributes)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.record_error(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _current.reset(token)
+        s.end()
+
+
+# Exporters
+
+
+class Exporter:
+    """Receives every finished span. export() runs on the event loop, so it must not block for long."""
+
+    def export(self, span: Span) -> None:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        pass
+
+
+class ConsoleExporter(Exporter):
+    def export(self, span: Span) -> None:
+        logger.info(
+            "span %s %.2fms trace=%s span=%s parent=%s%s %s",
+            span.name,
+            span.duration_ms,
+            span.trace_id,
+            span.span_id,
+            span.parent_id or "-",
+            f" error={span.error!r}" if span.error else "",
+            json.dumps(span.attributes, default=str),
+        )
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otlp_span(span: Span) -> dict:
+    """The span in OTLP/JSON (trace.proto field names, hex ids, nanosecond timestamps as strings)."""
+    out = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+    }
+    if span.parent_id:
+        out["parentSpanId"] = span.parent_id
+    return out
+
+
+class OTLPFileExporter(Exporter):
+    """
+    Appends ExportTraceServiceRequest JSON objects, one per line, to path. Spans are buffered and written
+    when BATCH_SIZE have accumulated, FLUSH_INTERVAL seconds after the last write, or on shutdown.
+    """
+
+    BATCH_SIZE = 256
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self, path: str):
+        self.path = path
+        self._buffer: list[dict] = []
+        self._last_flush = time.monotonic()
+
+    def export(self, span: Span) -> None:
+        self._buffer.append(otlp_span(span))
+        if len(self._buffer) >= self.BATCH_SIZE or time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        spans, self._buffer = self._buffer, []
+        request = {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+                    "scopeSpans": [{"scope": {"name": "app"}, "spans": spans}],
+                }
+            ]
+        }
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(request, default=str) + "\n")
+        except OSError as e:
+            logger.warning("Could not write %d spans to %s: %s", len(spans), self.path, e)
+
+    def shutdown(self) -> None:
+        self.flush()
+
+
+class InMemoryExporter(Exporter):
+    """Keeps finished spans in a list (at most max_spans, oldest dropped); for tests and debugging."""
+
+    def __init__(self, max_spans: int = 100_000):
+        self.max_spans = max_spans
+        self.spans: list[Span] = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+        if len(self.spans) > self.max_spans:
+            del self.spans[: len(self.spans) - self.max_spans]
+
+    def clear(self) -> None:
+        self.spans.clear()
+
+
+def _create_exporter() -> Optional[Exporter]:
+    kind = settings.tracing_exporter
+    if kind == "console":
+        return ConsoleExporter()
+    if kind == "file":
+        return OTLPFileExporter(settings.tracing_file_path)
+    if kind == "memory":
+        return InMemoryExporter()
+    return None
+
+
+_exporter: Optional[Exporter] = _create_exporter()
+
+
+def get_exporter() -> Optional[Exporter]:
+    return _exporter
+
+
+def set_exporter(exporter: Optional[Exporter]) -> None:
+    """Replace the exporter (e.g. with an InMemoryExporter in tests); the previous one is shut down."""
+    global _exporter
+    if _exporter is not None:
+        _exporter.shutdown()
+    _exporter = exporter
+
+
+def shutdown() -> None:
+    """Flush the exporter; call on process exit."""
+    if _exporter is not None:
+        _exporter.shutdown()
+
+
+# Per-run timelines
+
+
+class _TimelineStore:
+    """Finished spans by trace (LRU of TRACING_MAX_TRACES traces) and the traces each run_id appeared in."""
+
+    def __init__(self, max_traces: int, max_spans_per_trace: int):
+        self.max_traces = max(1, max_traces)
+        self.max_spans_per_trace = max(1, max_spans_per_trace)
+        self._traces: OrderedDict[str, list[Span]] = OrderedDict()
+        self._runs: OrderedDict[str, list[str]] = OrderedDict()
+        self.dropped_spans = 0
+
+    def add(self, span: Span) -> None:
+        spans = self._traces.get(span.trace_id)
+        if spans is None:
+            spans = self._traces[span.trace_id] = []
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+        self._traces.move_to_end(span.trace_id)
+        if len(spans) >= self.max_spans_per_trace:
+            self.dropped_spans += 1
+        else:
+            spans.append(span)
+        run_id = span.attributes.get("run_id")
+        if run_id is not None:
+            traces = self._runs.setdefault(str(run_id), [])
+            if span.trace_id not in traces:
+                traces.append(span.trace_id)
+            self._runs.move_to_end(str(run_id))
+            while len(self._runs) > self.max_traces:
+                self._runs.popitem(last=False)
+
+    def run_spans(self, run_id: str) -> list[Span]:
+        spans = [s for trace_id in self._runs.get(run_id, ()) for s in self._traces.get(trace_id, ())]
+        return sorted(spans, key=lambda s: s.start_ns)
+
+
+_timelines = _TimelineStore(settings.tracing_max_traces, settings.tracing_max_spans_per_trace)
+
+
+def _finish(span: Span) -> None:
+    _timelines.add(span)
+    if _exporter is not None:
+        try:
+            _exporter.export(span)
+        except Exception as e:
+            logger.warning("Span export failed: %s", e)
+
+
+def run_timeline(run_id: str) -> list[dict]:
+    """Finished spans of every trace that touched run_id, ordered by start, with offsets from the first."""
+    spans = _timelines.run_spans(run_id)
+    if not spans:
+        return []
+    origin = spans[0].start_ns
+    return [{**s.to_dict(), "offset_ms": round((s.start_ns - origin) / 1e6, 3)} for s in spans]
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening a server span per HTTP request, renamed "<METHOD> <route template>" once
+    routing has run.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.tracing_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                s.set_attribute("http.status_code", message["status"])
+            await send(message)
+
+        attributes = {"http.method": scope["method"], "http.target": scope["path"]}
+        with span(f"{scope['method']} unmatched", KIND_SERVER, **attributes) as s:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = route_template(scope)
+                if route is not None:
+                    s.name = f"{scope['method']} {route}"
+                    s.set_attribute("http.route", route)
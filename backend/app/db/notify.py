@@ -0,0 +1,101 @@
+"""
+Postgres LISTEN/NOTIFY fan-out between processes (API workers, queue workers).
+notify() sends through the regular engine; one dedicated asyncpg connection per process LISTENs on every
+channel registered with add_listener() and dispatches payloads to the callbacks on the event loop.
+The listener reconnects with backoff if the connection drops; notifications sent meanwhile are lost.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Callable, Optional
+
+from sqlalchemy import text
+
+from app.db.session import connect_raw, engine
+
+logger = logging.getLogger(__name__)
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+MAX_PAYLOAD_BYTES = 7900
+
+_callbacks: dict[str, list[Callable[[str], None]]] = {}
+_connect_hooks: list[Callable[[], None]] = []
+_task: Optional[asyncio.Task] = None
+
+
+def add_listener(channel: str, callback: Callable[[str], None]) -> None:
+    """Register callback(payload) for channel. Takes effect on the next (re)connect of the listener."""
+    _callbacks.setdefault(channel, []).append(callback)
+
+
+def add_connect_hook(hook: Callable[[], None]) -> None:
+    """Register hook() to run each time the listener (re)connects, e.g. to drop state that may have missed
+    notifications while disconnected."""
+    _connect_hooks.append(hook)
+
+
+async def notify(channel: str, payload: str) -> None:
+    """Send NOTIFY on channel; ValueError if the payload is not under MAX_PAYLOAD_BYTES once encoded."""
+    size = len(payload.encode("utf-8"))
+    if size >= MAX_PAYLOAD_BYTES:
+        raise ValueError(f"NOTIFY payload of {size} bytes on {channel} exceeds {MAX_PAYLOAD_BYTES} bytes")
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": channel, "payload": payload})
+        await conn.commit()
+
+
+def _dispatch(channel: str, payload: str) -> None:
+    for cb in _callbacks.get(channel, []):
+        try:
+            cb(payload)
+        except Exception:
+            logger.exception("LISTEN callback for %s failed", channel)
+
+
+async def _listen_forever() -> None:
+    backoff = 1.0
+    while True:
+        conn = None
+        try:
+            conn = await connect_raw()
+            for channel in _callbacks:
+                await conn.add_listener(channel, lambda _c, _pid, ch, payload: _dispatch(ch, payload))
+            for hook in _connect_hooks:
+                try:
+                    hook()
+                except Exception:
+                    logger.exception("LISTEN connect hook failed")
+            backoff = 1.0
+            while not conn.is_closed():
+                await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Postgres LISTEN connection failed: %s", e)
+        finally:
+            if conn is not None and not conn.is_closed():
+                try:
+                    await conn.close()
+                except Exception:
+                    pass
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, 30.0)
+
+
+def start_listener() -> None:
+    """Start the per-process LISTEN task (idempotent). Call from app lifespan after registering listeners."""
+    global _task
+    if _task is None and _callbacks:
+        _task = asyncio.create_task(_listen_forever())
+
+
+async def stop_listener() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
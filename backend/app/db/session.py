@@ -1,9 +1,13 @@
 import ssl
+import time
 
+from sqlalchemy import event
 from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+from app.core import metrics, tracing
 from app.core.config import settings
 
 
@@ -50,6 +54,22 @@ def _parse_url_and_build_connect_args(database_url: str, ssl_no_verify: bool):
     return str(url_for_engine), connect_args
 
 
+class _TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    The default async engine pool, observing how long each checkout waits (db_pool_checkout_wait_seconds)
+    and tracing it as a db.pool.checkout span.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        span = tracing.start_span("db.pool.checkout")
+        try:
+            return super()._do_get()
+        finally:
+            span.end()
+            metrics.db_pool_checkout_wait.observe(time.perf_counter() - start)
+
+
 _db_url, _connect_args = _parse_url_and_build_connect_args(
     settings.database_url,
     ssl_no_verify=settings.database_ssl_no_verify,
@@ -60,8 +80,43 @@ engine = create_async_engine(
     echo=False,
     future=True,
     connect_args=_connect_args,
+    **({"poolclass": _TimedQueuePool} if settings.metrics_enabled or settings.tracing_enabled else {}),
 )
 
+DB_STATEMENT_MAX_CHARS = 500
+
+
+def _trace_queries(sync_engine) -> None:
+    """A db.query client span around every statement (SQL text only, never parameters)."""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            attributes = {
+                "db.operation": statement.split(None, 1)[0].upper() if statement else "",
+                "db.statement": statement[:DB_STATEMENT_MAX_CHARS],
+            }
+            context._trace_span = tracing.start_span("db.query", tracing.KIND_CLIENT, **attributes)
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _end(conn, cursor, statement, parameters, context, executemany):
+        span = getattr(context, "_trace_span", None)
+        if span is not None:
+            span.set_attribute("db.rows", cursor.rowcount if cursor.rowcount >= 0 else None)
+            span.end()
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        span = getattr(exception_context.execution_context, "_trace_span", None)
+        if span is not None:
+            error = exception_context.original_exception
+            span.record_error(f"{type(error).__name__}: {error}")
+            span.end()
+
+
+if settings.tracing_enabled:
+    _trace_queries(engine.sync_engine)
+
 async_session_factory = async_sessionmaker(
     engine,
     class_=AsyncSession,
@@ -77,6 +132,25 @@ class Base(DeclarativeBase):
     pass
 
 
+def pool_stats() -> dict:
+    """Connection pool counters (QueuePool): configured size, checked in / out, overflow in use."""
+    pool = engine.pool
+    stats = {}
+    names = {"size": "size", "checked_in": "checkedin", "checked_out": "checkedout", "overflow": "overflow"}
+    for key, name in names.items():
+        stat = getattr(pool, name, None)
+        if stat is not None:
+            stats[key] = stat()
+    return stats
+
+
+async def connect_raw():
+    """Open a dedicated asyncpg connection (outside the pool), e.g. for LISTEN. Caller must close it."""
+    import asyncpg
+
+    return await asyncpg.connect(**_connect_args)
+
+
 async def get_db() -> AsyncSession:
     """Dependency that yields an async DB session. Call session.commit() in the route."""
     async with async_session_factory() as session:
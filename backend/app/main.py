@@ -1,9 +1,14 @@
 """
 Workflow Builder Lite API.
-- Serves /api/* (workflows, runs, health). All workflow/run routes require X-Browser-ID.
+- Serves /api/* (workflows, runs, health, metrics). All workflow/run routes require X-Browser-ID.
 - If STATIC_DIR is set (e.g. in Docker), also serves the frontend SPA at / and /assets.
+- In queue mode with RUN_QUEUE_EMBEDDED_WORKERS > 0, runs queue worker loops alongside the API.
+- With RUN_EVENTS_BACKEND=postgres, LISTENs for run progress events published by other processes.
+- LISTENs for workflow cache invalidations so the in-process workflow cache tier stays coherent.
 """
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
@@ -13,13 +18,49 @@ from fastapi.staticfiles import StaticFiles
 
 from app.api import api_router
 from app.core.config import settings
+from app.core import tracing
+from app.core.metrics import MetricsMiddleware
 
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from app.db import notify
+    from app.services import cache, health, run_events
+
+    run_events.register_listener()
+    cache.register_listener()
+    notify.start_listener()
+    health.start_refresher()
+    stop = asyncio.Event()
+    workers: list[asyncio.Task] = []
+    if settings.run_execution_mode == "queue" and settings.run_queue_embedded_workers > 0:
+        from app.tasks.workflow_executor import run_worker
+
+        workers = [
+            asyncio.create_task(run_worker(settings.run_queue_concurrency, stop))
+            for _ in range(settings.run_queue_embedded_workers)
+        ]
+    elif settings.run_execution_mode != "queue":
+        # Inline runs are executed by API processes; fail those a stopped process left behind
+        from app.tasks.workflow_executor import sweep_stale_runs
+
+        workers = [asyncio.create_task(sweep_stale_runs(stop))]
+    yield
+    stop.set()
+    if workers:
+        await asyncio.gather(*workers, return_exceptions=True)
+    await notify.stop_listener()
+    await health.stop_refresher()
+    tracing.shutdown()
+
+
 app = FastAPI(
     title="Workflow Builder Lite API",
     version="0.1.0",
     description="Workflow Builder Lite – all workflow/run endpoints require **X-Browser-ID** header.",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -28,8 +69,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Readable by the frontend: list pagination cursor, workflow version
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+if settings.tracing_enabled:
+    app.add_middleware(tracing.TracingMiddleware)
+
 app.include_router(api_router)
 
 # Optional: serve frontend static files (used in Docker / single-service deployment)
@@ -4,5 +4,7 @@ from app.models.step import Step
 from app.models.edge import Edge
 from app.models.run import Run
 from app.models.step_output import StepOutput
+from app.models.batch import Batch
+from app.models.text_blob import TextBlob
 
-__all__ = ["Base", "Workflow", "Step", "Edge", "Run", "StepOutput"]
+__all__ = ["Base", "Workflow", "Step", "Edge", "Run", "StepOutput", "Batch", "TextBlob"]
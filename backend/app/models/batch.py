@@ -0,0 +1,23 @@
+import uuid
+
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, func
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+
+from app.db.session import Base
+
+
+class Batch(Base):
+    """A group of runs of one workflow over many inputs; status and progress are aggregated from its runs."""
+
+    __tablename__ = "batches"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    workflow_id = Column(UUID(as_uuid=True), ForeignKey("workflows.id", ondelete="CASCADE"), nullable=False)
+    browser_id = Column(String(36), nullable=False, index=True)
+    total = Column(Integer, nullable=False)
+    concurrency = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    workflow = relationship("Workflow")
+    runs = relationship("Run", back_populates="batch")
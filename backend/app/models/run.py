@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import Column, DateTime, ForeignKey, String, Text, func
+from sqlalchemy import Column, DateTime, ForeignKey, Index, String, Text, func, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -12,12 +12,34 @@ class Run(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     workflow_id = Column(UUID(as_uuid=True), ForeignKey("workflows.id", ondelete="CASCADE"), nullable=False)
-    browser_id = Column(String(36), nullable=False, index=True)
-    input_text = Column(Text, nullable=False)
+    browser_id = Column(String(36), nullable=False)
+    input_hash = Column(String(64), ForeignKey("text_blobs.hash"), nullable=False)  # TextBlob of the input text
     status = Column(String(20), nullable=False, default="pending")  # pending | running | completed | failed
     started_at = Column(DateTime(timezone=True), server_default=func.now())
+    claimed_at = Column(DateTime(timezone=True), nullable=True)  # set when a queue worker picks the run up
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)  # refreshed by that worker while the run executes
     completed_at = Column(DateTime(timezone=True), nullable=True)
     error_message = Column(Text, nullable=True)
+    # Resume / rerun: reuse unchanged StepOutputs of this earlier run; always re-execute rerun_from_step_id onward
+    resumed_from_run_id = Column(UUID(as_uuid=True), ForeignKey("runs.id", ondelete="SET NULL"), nullable=True)
+    rerun_from_step_id = Column(UUID(as_uuid=True), nullable=True)
+    batch_id = Column(UUID(as_uuid=True), ForeignKey("batches.id", ondelete="CASCADE"), nullable=True, index=True)
 
     workflow = relationship("Workflow", back_populates="runs")
     step_outputs = relationship("StepOutput", back_populates="run", cascade="all, delete-orphan")
+    batch = relationship("Batch", back_populates="runs")
+    input_blob = relationship("TextBlob", lazy="joined", innerjoin=True)
+
+    __table_args__ = (
+        # Queue workers scan only pending runs, oldest first
+        Index("ix_runs_pending_started_at", "started_at", postgresql_where=text("status = 'pending'")),
+        # Stale run sweep (tasks/workflow_executor.py fail_stale_runs) looks only at pending / running runs
+        Index("ix_runs_active_status", "status", postgresql_where=text("status IN ('pending', 'running')")),
+        # Keyset pagination of run history (newest first) per browser and per workflow
+        Index("ix_runs_browser_id_started_at_id", browser_id, started_at.desc(), id.desc()),
+        Index("ix_runs_workflow_id_started_at_id", workflow_id, started_at.desc(), id.desc()),
+    )
+
+    @property
+    def input_text(self) -> str:
+        return self.input_blob.text
@@ -15,6 +15,9 @@ class Step(Base):
     name = Column(String(255), nullable=False)
     description = Column(Text, default="")
     step_type = Column(String(20), nullable=False)  # START | NORMAL | END
+    llm_provider = Column(String(32), nullable=True)  # llm_providers.PROVIDER_NAMES; None = LLM_PROVIDER
+    operation = Column(String(32), nullable=True)  # local_steps.OPERATIONS; None = LLM step
+    operation_config = Column(JSONB, nullable=True)  # validated by local_steps.validate_config
     position = Column(JSONB, default=dict)  # e.g. {"x": 0, "y": 0} for ReactFlow
 
     workflow = relationship("Workflow", back_populates="steps")
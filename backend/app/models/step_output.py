@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import Column, Float, ForeignKey, Text
+from sqlalchemy import Boolean, Column, Float, ForeignKey, Integer, String, Text, false
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -13,9 +13,26 @@ class StepOutput(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     run_id = Column(UUID(as_uuid=True), ForeignKey("runs.id", ondelete="CASCADE"), nullable=False)
     step_id = Column(UUID(as_uuid=True), ForeignKey("steps.id", ondelete="CASCADE"), nullable=False)
-    input_text = Column(Text, nullable=False)
-    output_text = Column(Text, nullable=False)
+    # TextBlobs of the step's input and output; a step's input is usually its parent's output (same blob)
+    input_hash = Column(String(64), ForeignKey("text_blobs.hash"), nullable=False)
+    output_hash = Column(String(64), ForeignKey("text_blobs.hash"), nullable=False)
     duration_ms = Column(Float, nullable=True)
+    cached = Column(Boolean, nullable=False, default=False, server_default=false())  # served from step cache
+    reused = Column(Boolean, nullable=False, default=False, server_default=false())  # copied from the resumed run
+    error_message = Column(Text, nullable=True)  # set when this step failed the run
+    retries = Column(Integer, nullable=False, default=0, server_default="0")  # LLM calls retried after throttling/5xx
+    throttle_wait_ms = Column(Float, nullable=False, default=0.0, server_default="0")  # rate limit waits + backoff
+    fingerprint = Column(String(64), nullable=True)  # step_cache.step_fingerprint at execution time
 
     run = relationship("Run", back_populates="step_outputs")
     step = relationship("Step", back_populates="step_outputs")
+    input_blob = relationship("TextBlob", foreign_keys=[input_hash], lazy="joined", innerjoin=True)
+    output_blob = relationship("TextBlob", foreign_keys=[output_hash], lazy="joined", innerjoin=True)
+
+    @property
+    def input_text(self) -> str:
+        return self.input_blob.text
+
+    @property
+    def output_text(self) -> str:
+        return self.output_blob.text
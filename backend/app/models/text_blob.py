@@ -0,0 +1,24 @@
+import zlib
+
+from sqlalchemy import Column, Integer, LargeBinary, String
+
+from app.db.session import Base
+
+CODEC_RAW = "raw"
+CODEC_ZLIB = "zlib"
+
+
+class TextBlob(Base):
+    """A text stored once by content hash (services/text_store.py); referenced by runs and step outputs."""
+
+    __tablename__ = "text_blobs"
+
+    hash = Column(String(64), primary_key=True)  # sha256 hex digest of the UTF-8 text
+    codec = Column(String(8), nullable=False)  # raw | zlib
+    data = Column(LargeBinary, nullable=False)
+    size = Column(Integer, nullable=False)  # uncompressed size in bytes
+
+    @property
+    def text(self) -> str:
+        raw = zlib.decompress(self.data) if self.codec == CODEC_ZLIB else self.data
+        return bytes(raw).decode("utf-8")
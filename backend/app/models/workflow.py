@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import Column, DateTime, String, Text, func
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, String, Text, func, true
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -13,9 +13,18 @@ class Workflow(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String(255), nullable=False)
     description = Column(Text, default="")
-    browser_id = Column(String(36), nullable=False, index=True)
+    browser_id = Column(String(36), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # False for workflows with non-deterministic steps: always call the LLM, never reuse cached results
+    cache_step_outputs = Column(Boolean, nullable=False, default=True, server_default=true())
+    # Incremented by every route that changes the workflow or its graph; keys the execution plan cache
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     steps = relationship("Step", back_populates="workflow", cascade="all, delete-orphan")
     edges = relationship("Edge", back_populates="workflow", cascade="all, delete-orphan")
     runs = relationship("Run", back_populates="workflow", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # Keyset pagination of a browser's workflows (newest first)
+        Index("ix_workflows_browser_id_created_at_id", browser_id, created_at.desc(), id.desc()),
+    )
@@ -1,8 +1,9 @@
 from app.schemas.workflow import WorkflowCreate, WorkflowListItem, WorkflowRead, WorkflowUpdate, WorkflowValidateResponse
 from app.schemas.step import StepAddInWorkflow, StepCreate, StepRead, StepUpdate
 from app.schemas.edge import EdgeCreate, EdgeCreateByIndex, EdgeRead
-from app.schemas.run import RunCreate, RunCreated, RunListItem, RunRead
+from app.schemas.run import RunCreate, RunCreated, RunListItem, RunRead, RunResume
 from app.schemas.step_output import StepOutputRead
+from app.schemas.batch import BatchCreate, BatchCreated, BatchRead
 
 __all__ = [
     "WorkflowCreate",
@@ -20,5 +21,9 @@ __all__ = [
     "RunCreated",
     "RunRead",
     "RunListItem",
+    "RunResume",
     "StepOutputRead",
+    "BatchCreate",
+    "BatchCreated",
+    "BatchRead",
 ]
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+
+class BatchCreate(BaseModel):
+    inputs: List[str] = Field(..., min_length=1)
+    concurrency: Optional[int] = Field(None, ge=1)  # runs executed at once (inline mode); default from settings
+
+
+class BatchCreated(BaseModel):
+    batch_id: UUID
+    workflow_id: UUID
+    total: int
+    status: str = "pending"
+
+
+class BatchRead(BaseModel):
+    id: UUID
+    workflow_id: UUID
+    total: int
+    concurrency: int
+    created_at: datetime
+    status: str  # pending | running | completed (every run finished; see counts for failures)
+    counts: Dict[str, int] = {}  # run status -> number of runs
+    progress: float = 0.0  # finished runs / total; list the runs with GET /runs?batch_id=
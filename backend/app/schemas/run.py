@@ -6,11 +6,17 @@ from uuid import UUID
 
 from pydantic import BaseModel, Field
 
+from app.core.config import settings
 from app.schemas.step_output import StepOutputRead
 
 
 class RunCreate(BaseModel):
-    input_text: str = Field(..., min_length=1)
+    input_text: str = Field(..., min_length=1, max_length=settings.run_input_max_chars)
+
+
+class RunResume(BaseModel):
+    """Start a new run from an earlier one. from_step_id forces re-execution from that step onward."""
+    from_step_id: Optional[UUID] = None
 
 
 class RunRead(BaseModel):
@@ -22,6 +28,7 @@ class RunRead(BaseModel):
     started_at: datetime
     completed_at: Optional[datetime] = None
     error_message: Optional[str] = None
+    resumed_from_run_id: Optional[UUID] = None
     step_outputs: List[StepOutputRead] = []
 
     class Config:
@@ -1,9 +1,36 @@
 from __future__ import annotations
 
-from typing import Optional
+from typing import ClassVar, Optional
 from uuid import UUID
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
+
+from app.services.local_steps import validate_config
+
+# LLM provider a step runs on (services/llm_providers.py); omitted/null = the LLM_PROVIDER default
+LLM_PROVIDER_PATTERN = "^(gemini|local)$"
+# Local operation a step runs instead of the LLM (services/local_steps.py); omitted/null = LLM step
+OPERATION_PATTERN = "^(regex_replace|strip_pii|normalize_whitespace|change_case|truncate|split_join|template_fill)$"
+
+
+class _OperationChecked(BaseModel):
+    """Validates operation_config against operation and stores it with defaults filled in."""
+
+    _config_without_operation: ClassVar[bool] = False  # partial updates: checked against the stored operation
+
+    @model_validator(mode="after")
+    def _check_operation(self):
+        fields = self.model_fields_set
+        if "operation" not in fields and "operation_config" not in fields:
+            return self
+        if self.operation is None:
+            if self.operation_config is not None and not (
+                self._config_without_operation and "operation" not in fields
+            ):
+                raise ValueError("operation_config requires operation")
+            return self
+        self.operation_config = validate_config(self.operation, self.operation_config)
+        return self
 
 
 class StepBase(BaseModel):
@@ -11,27 +38,43 @@ class StepBase(BaseModel):
     description: str = ""
     step_type: str = Field(..., pattern="^(START|NORMAL|END)$")
     position: Optional[dict] = None  # {"x": float, "y": float}
+    llm_provider: Optional[str] = Field(None, pattern=LLM_PROVIDER_PATTERN)
+    operation: Optional[str] = Field(None, pattern=OPERATION_PATTERN)
+    operation_config: Optional[dict] = None
 
 
-class StepCreate(StepBase):
-    pass
+class StepCreate(StepBase, _OperationChecked):
+    # PATCH /workflows/{id}: an existing step of the workflow is updated in place (keeping its StepOutputs,
+    # which resumed runs reuse) instead of replaced; ignored when creating a workflow
+    id: Optional[UUID] = None
 
 
-class StepAddInWorkflow(BaseModel):
+class StepAddInWorkflow(_OperationChecked):
     """Add a step to an existing workflow. Connect it via insert_after/insert_before (step IDs)."""
     name: str = Field(..., min_length=1, max_length=255)
     description: str = ""
     step_type: str = Field(..., pattern="^(START|NORMAL|END)$")
     position: Optional[dict] = None  # {"x": float, "y": float}
+    llm_provider: Optional[str] = Field(None, pattern=LLM_PROVIDER_PATTERN)
+    operation: Optional[str] = Field(None, pattern=OPERATION_PATTERN)
+    operation_config: Optional[dict] = None
     insert_after_step_id: Optional[UUID] = None  # edge: this step -> new step (who feeds into new step)
     insert_before_step_id: Optional[UUID] = None  # edge: new step -> this step (who new step feeds into)
 
 
-class StepUpdate(BaseModel):
+class StepUpdate(_OperationChecked):
+    """operation and operation_config replace each other's pair: sending operation without a config resets the
+    config to the operation's defaults; sending only operation_config validates it against the step's operation."""
+
+    _config_without_operation: ClassVar[bool] = True
+
     name: Optional[str] = Field(None, min_length=1, max_length=255)
     description: Optional[str] = None
     step_type: Optional[str] = Field(None, pattern="^(START|NORMAL|END)$")
     position: Optional[dict] = None
+    llm_provider: Optional[str] = Field(None, pattern=LLM_PROVIDER_PATTERN)  # explicit null resets to the default
+    operation: Optional[str] = Field(None, pattern=OPERATION_PATTERN)  # explicit null makes it an LLM step again
+    operation_config: Optional[dict] = None
 
 
 class StepRead(StepBase):
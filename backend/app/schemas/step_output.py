@@ -13,6 +13,11 @@ class StepOutputRead(BaseModel):
     input_text: str
     output_text: str
     duration_ms: Optional[float] = None
+    cached: bool = False
+    reused: bool = False
+    retries: int = 0
+    throttle_wait_ms: float = 0.0
+    error_message: Optional[str] = None
 
     class Config:
         from_attributes = True
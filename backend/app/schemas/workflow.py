@@ -13,6 +13,7 @@ from app.schemas.step import StepCreate, StepRead
 class WorkflowBase(BaseModel):
     name: str = Field(..., min_length=1, max_length=255)
     description: str = ""
+    cache_step_outputs: bool = True  # False: never serve step results from the step cache
 
 
 class WorkflowCreate(WorkflowBase):
@@ -23,6 +24,7 @@ class WorkflowCreate(WorkflowBase):
 class WorkflowUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=255)
     description: Optional[str] = None
+    cache_step_outputs: Optional[bool] = None
     steps: Optional[List[StepCreate]] = None
     edges: Optional[List[EdgeCreateByIndex]] = None  # indices into steps (0-based)
 
@@ -31,6 +33,7 @@ class WorkflowRead(WorkflowBase):
     id: UUID
     browser_id: str
     created_at: datetime
+    version: int  # bumped by every change; also sent as the ETag of GET/PATCH /workflows/{id}
     steps: List[StepRead] = []
     edges: List[EdgeRead] = []
 
@@ -0,0 +1,50 @@
+"""
+Inline execution of batch runs: a background task per batch drains its runs with `concurrency` workers,
+each run in its own DB session, and keeps the heartbeat of the batch's pending runs fresh so the stale run
+sweep only fails them once this process is gone. In queue mode batches are not executed here; queue workers
+claim the pending runs like any other.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Iterable
+from uuid import UUID
+
+from app.core import tracing
+from app.db.session import async_session_factory
+from app.models import Run
+from app.services.workflow_executor import execute_workflow, heartbeat
+
+logger = logging.getLogger(__name__)
+
+# Strong references so running batch tasks are not garbage-collected
+_background: set[asyncio.Task] = set()
+
+
+async def execute_runs(batch_id: UUID, run_ids: Iterable[UUID], concurrency: int) -> None:
+    """Execute the batch's runs with at most `concurrency` in flight."""
+    pending = iter(run_ids)
+
+    async def worker() -> None:
+        for run_id in pending:
+            try:
+                # Each batched run is its own trace; the request that created the batch has long returned
+                with tracing.span("batch.run", new_trace=True, run_id=str(run_id)):
+                    async with async_session_factory() as db:
+                        await execute_workflow(run_id, db)
+            except Exception:
+                logger.exception("Batch run %s crashed", run_id)
+
+    beat = asyncio.create_task(heartbeat(Run.batch_id == batch_id, Run.status == "pending"))
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    finally:
+        beat.cancel()
+
+
+def start_batch(batch_id: UUID, run_ids: list[UUID], concurrency: int) -> None:
+    """Schedule execute_runs in the background and return immediately."""
+    task = asyncio.create_task(execute_runs(batch_id, run_ids, concurrency))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
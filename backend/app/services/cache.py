@@ -1,67 +1,78 @@
 """
-Upstash Redis workflow cache: key workflow:{id}, TTL 1h.
-Used to cache GET workflow by id; invalidated on update/delete.
-Uses Upstash REST API (serverless-friendly, easy to deploy).
+Workflow cache for GET workflow by id, in two tiers: a short-lived in-process LRU
+(WORKFLOW_CACHE_LOCAL_*) in front of Redis (key workflow:{id}, TTL 1h).
+Invalidated on update/delete; invalidate_workflow also NOTIFYs the workflow_cache channel so every
+other process drops its local copy.
+Redis is one of the REDIS_BACKEND implementations in services/redis_backends.py (Upstash REST by default).
+redis_get / redis_mget / redis_set / redis_set_many / redis_set_nx / redis_delete / redis_take_tokens are the
+shared fail-open primitives (also used by the step result and execution plan caches and the LLM rate limiter
+and call coalescing); each call is bounded by REDIS_TIMEOUT_SECONDS and traced as a redis.<op> span.
 """
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
-from typing import Any, Optional
+from typing import Any, Awaitable, Optional, Sequence, TypeVar
 from uuid import UUID
 
+from app.core import tracing
 from app.core.config import settings
+from app.services.local_cache import LocalCache
+from app.services.redis_backends import RedisBackend, backend_configured, create_backend
 
 logger = logging.getLogger(__name__)
 
 WORKFLOW_CACHE_PREFIX = "workflow:"
 WORKFLOW_CACHE_TTL = 3600  # 1 hour
+WORKFLOW_CACHE_CHANNEL = "workflow_cache"
 
 _redis_client: Optional[Any] = None
 
+_workflow_local = LocalCache(settings.workflow_cache_local_max_entries, settings.workflow_cache_local_ttl_seconds)
+_workflow_redis_hits = 0
+_workflow_redis_misses = 0
 
-def _get_client():
-    """Lazy Upstash Redis client (async). Returns None if not configured or connection fails."""
+T = TypeVar("T")
+
+
+def _get_client() -> Optional[RedisBackend]:
+    """Lazy Redis backend (REDIS_BACKEND). Returns None if not configured or the client fails to load."""
     global _redis_client
     if _redis_client is None:
-        url = (getattr(settings, "upstash_redis_rest_url", None) or "").strip()
-        token = (getattr(settings, "upstash_redis_rest_token", None) or "").strip()
-        if not url or not token:
-            _redis_client = False
-        else:
-            try:
-                from upstash_redis.asyncio import Redis
-                _redis_client = Redis(
-                    url=url,
-                    token=token,
-                    allow_telemetry=False,
-                    rest_retries=2,
-                    rest_retry_interval=1.0,
-                )
-            except Exception as e:
-                logger.warning("Redis client init failed: %s", e)
-                _redis_client = False
+        _redis_client = create_backend() or False
     return _redis_client if _redis_client else None
 
 
 def redis_configured() -> bool:
-    """Return True if Upstash URL and token are set."""
-    url = (getattr(settings, "upstash_redis_rest_url", None) or "").strip()
-    token = (getattr(settings, "upstash_redis_rest_token", None) or "").strip()
-    return bool(url and token)
+    """Return True if the selected Redis backend is configured."""
+    return backend_configured()
+
+
+async def _fail_open(op: str, call: Awaitable[T], default: T, timeout: Optional[float] = None) -> T:
+    """
+    Await a backend call within REDIS_TIMEOUT_SECONDS; on timeout or error return default.
+    Traced as a redis.<op> span.
+    """
+    with tracing.span(f"redis.{op}", tracing.KIND_CLIENT, **{"db.system": "redis"}) as span:
+        try:
+            return await asyncio.wait_for(call, timeout=timeout or settings.redis_timeout_seconds)
+        except Exception as e:  # includes asyncio.TimeoutError
+            logger.debug("Redis call failed open: %r", e)
+            span.record_error(f"{type(e).__name__}: {e}")
+            return default
 
 
 async def redis_ping() -> bool:
-    """Return True if Redis is reachable (Upstash REST)."""
+    """Return True if Redis is reachable."""
     client = _get_client()
     if not client:
         return False
-    try:
-        result = await client.ping()
-        return (result == "PONG") if isinstance(result, str) else bool(result)
-    except Exception as e:
-        logger.warning("Redis health check failed: %s", e)
-        return False
+    # Health checks get a longer budget than cache lookups: a new connection may need to be opened
+    ok = await _fail_open("ping", client.ping(), False, timeout=max(settings.redis_timeout_seconds, 2.0))
+    if not ok:
+        logger.warning("Redis health check failed (%s backend)", client.name)
+    return ok
 
 
 async def redis_status() -> str:
@@ -73,22 +84,84 @@ async def redis_status() -> str:
     return "disconnected"
 
 
-async def get_workflow_cached(workflow_id: UUID, browser_id: str) -> Optional[dict]:
-    """Return cached workflow dict if present and browser_id matches, else None."""
+async def redis_get(key: str) -> Optional[str]:
+    """GET key; None if Redis is not configured, the key is missing, or the call fails (cache fails open)."""
+    client = _get_client()
+    if not client:
+        return None
+    return await _fail_open("get", client.get(key), None)
+
+
+async def redis_mget(keys: list[str]) -> list[Optional[str]]:
+    """GET several keys in one round trip; all None if Redis is unavailable."""
+    client = _get_client()
+    if not client or not keys:
+        return [None] * len(keys)
+    return await _fail_open("mget", client.mget(keys), [None] * len(keys))
+
+
+async def redis_set(key: str, value: str, ttl: int) -> None:
+    """SET key with expiry in seconds; errors are ignored."""
+    client = _get_client()
+    if client:
+        await _fail_open("set", client.set(key, value, ttl), None)
+
+
+async def redis_set_many(items: dict[str, str], ttl: int) -> None:
+    """SET several keys with the same expiry in one pipelined round trip; errors are ignored."""
+    client = _get_client()
+    if client and items:
+        await _fail_open("set_many", client.set_many(items, ttl), None)
+
+
+async def redis_set_nx(key: str, value: str, ttl: int) -> Optional[bool]:
+    """SET key NX with expiry: True if set, False if the key exists, None if Redis is unavailable."""
+    client = _get_client()
+    if not client:
+        return None
+    return await _fail_open("set_nx", client.set_nx(key, value, ttl), None)
+
+
+async def redis_delete(*keys: str) -> None:
+    """DEL keys; errors are ignored."""
+    client = _get_client()
+    if client and keys:
+        await _fail_open("delete", client.delete(*keys), None)
+
+
+async def redis_take_tokens(
+    keys: list[str], now: float, buckets: Sequence[tuple[float, float, float]]
+) -> Optional[float]:
+    """Shared token bucket (RedisBackend.take_tokens): seconds to wait, 0.0 when taken; None if Redis is unavailable."""
     client = _get_client()
     if not client:
         return None
-    key = f"{WORKFLOW_CACHE_PREFIX}{workflow_id}"
-    try:
-        raw = await client.get(key)
-        if not raw:
-            return None
-        data = json.loads(raw)
-        if data.get("browser_id") != browser_id:
-            return None
-        return data
-    except Exception:
+    return await _fail_open("take_tokens", client.take_tokens(keys, now, buckets), None)
+
+
+async def get_workflow_cached(workflow_id: UUID, browser_id: str) -> Optional[dict]:
+    """Return cached workflow dict if present and browser_id matches, else None. Local tier first, then Redis."""
+    global _workflow_redis_hits, _workflow_redis_misses
+    with tracing.span("cache.workflow.get", workflow_id=str(workflow_id)) as span:
+        data = _workflow_local.get(str(workflow_id))
+        tier = "local" if data is not None else None
+        if data is None and redis_configured():
+            raw = await redis_get(f"{WORKFLOW_CACHE_PREFIX}{workflow_id}")
+            if raw:
+                try:
+                    data = json.loads(raw)
+                except ValueError:
+                    data = None
+            if data is None:
+                _workflow_redis_misses += 1
+            else:
+                _workflow_redis_hits += 1
+                tier = "redis"
+                _workflow_local.set(str(workflow_id), data)
+        span.set_attribute("hit_tier", tier or "miss")
+    if data is None or data.get("browser_id") != browser_id:
         return None
+    return data
 
 
 async def set_workflow_cached(
@@ -98,27 +171,43 @@ async def set_workflow_cached(
     ttl: int = WORKFLOW_CACHE_TTL,
 ) -> None:
     """Cache workflow read payload. data must include browser_id."""
-    client = _get_client()
-    if not client:
-        return
-    key = f"{WORKFLOW_CACHE_PREFIX}{workflow_id}"
-    try:
-        await client.set(
-            key,
-            json.dumps(data, default=str),
-            ex=ttl,
-        )
-    except Exception:
-        pass
+    _workflow_local.set(str(workflow_id), data)
+    await redis_set(f"{WORKFLOW_CACHE_PREFIX}{workflow_id}", json.dumps(data, default=str), ttl)
 
 
 async def invalidate_workflow(workflow_id: UUID) -> None:
-    """Remove workflow from cache (call after update/delete/add step/delete step/edge)."""
-    client = _get_client()
-    if not client:
+    """Remove workflow from cache (call after update/delete/add step/delete step/edge), in every process."""
+    _workflow_local.delete(str(workflow_id))
+    await redis_delete(f"{WORKFLOW_CACHE_PREFIX}{workflow_id}")
+    if _workflow_local.max_entries:
+        try:
+            from app.db.notify import notify
+
+            await notify(WORKFLOW_CACHE_CHANNEL, str(workflow_id))
+        except Exception as e:
+            # Other processes' local copies then expire after WORKFLOW_CACHE_LOCAL_TTL_SECONDS
+            logger.warning("Workflow cache invalidation broadcast failed: %s", e)
+
+
+def register_listener() -> None:
+    """Drop local copies when any process invalidates a workflow; start from empty after a LISTEN reconnect
+    (invalidations sent while disconnected are lost)."""
+    if not _workflow_local.max_entries:
         return
-    key = f"{WORKFLOW_CACHE_PREFIX}{workflow_id}"
-    try:
-        await client.delete(key)
-    except Exception:
-        pass
+    from app.db.notify import add_connect_hook, add_listener
+
+    add_listener(WORKFLOW_CACHE_CHANNEL, _workflow_local.delete)
+    add_connect_hook(_workflow_local.clear)
+
+
+def workflow_cache_stats() -> dict:
+    """Hit/miss counters per tier for /health."""
+    redis_lookups = _workflow_redis_hits + _workflow_redis_misses
+    return {
+        "local": _workflow_local.stats(),
+        "redis": {
+            "hits": _workflow_redis_hits,
+            "misses": _workflow_redis_misses,
+            "hit_ratio": round(_workflow_redis_hits / redis_lookups, 4) if redis_lookups else None,
+        },
+    }
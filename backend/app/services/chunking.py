@@ -0,0 +1,144 @@
+"""
+Map-reduce execution of a step over an input longer than LLM_CHUNK_MAX_CHARS. The input is split on paragraph
+boundaries (falling back to lines, then words, then a hard cut for a single oversized word), every chunk is
+sent through the step's prompt concurrently (LLM_CHUNK_CONCURRENCY per step, still within the process-wide
+LLM_MAX_CONCURRENCY) and the outputs are combined per step type: START and NORMAL steps are per-chunk
+transformations whose outputs are concatenated in order; an END step's partial outputs are merged by one
+reduce call (llm.reduce_prompt) when they fit in a chunk, else concatenated.
+Wall-clock time grows with chunk count / concurrency rather than with one ever longer generation.
+"""
+from __future__ import annotations
+
+import asyncio
+import re
+from typing import Awaitable, Callable, Optional
+
+from app.core.config import settings
+from app.services.execution_plan import PlanStep
+from app.services.llm import execute_prompt_async, reduce_prompt
+from app.services.llm_throttle import CallStats
+
+CHUNK_SEPARATOR = "\n\n"
+
+# Step types whose chunk outputs are combined by a reduce call rather than concatenated
+REDUCE_STEP_TYPES = frozenset({"END"})
+
+# Split levels, coarsest first: (joiner used when packing pieces back together, split pattern)
+_SPLIT_LEVELS = (
+    (CHUNK_SEPARATOR, re.compile(r"\n[ \t]*\n\s*")),
+    ("\n", re.compile(r"\n")),
+    (" ", re.compile(r"\s+")),
+)
+
+
+def _split(text: str, max_chars: int, level: int) -> list[str]:
+    if len(text) <= max_chars:
+        return [text]
+    if level == len(_SPLIT_LEVELS):
+        return [text[i : i + max_chars] for i in range(0, len(text), max_chars)]
+    joiner, pattern = _SPLIT_LEVELS[level]
+    chunks: list[str] = []
+    current = ""
+    for part in pattern.split(text):
+        if not part:
+            continue
+        if len(part) > max_chars:
+            # An oversized paragraph (line) becomes chunks of its own, split at the next finer level
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.extend(_split(part, max_chars, level + 1))
+        elif current and len(current) + len(joiner) + len(part) <= max_chars:
+            current += joiner + part
+        else:
+            if current:
+                chunks.append(current)
+            current = part
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_text(text: str, max_chars: int) -> list[str]:
+    """
+    Chunks of at most max_chars, each made of whole paragraphs where possible; a single chunk when the text
+    fits or max_chars is 0.
+    """
+    if max_chars <= 0 or len(text) <= max_chars:
+        return [text]
+    return _split(text, max_chars, 0)
+
+
+async def _reduce(
+    step: PlanStep,
+    outputs: list[str],
+    on_chunk: Optional[Callable[[str], Awaitable[None]]],
+    stats: Optional[CallStats],
+    coalesce: bool,
+) -> tuple[str, Optional[str]]:
+    combined = CHUNK_SEPARATOR.join(outputs)
+    if len(combined) > settings.llm_chunk_max_chars:
+        # Too long for one more call: the concatenated partial outputs are the result
+        if on_chunk is not None:
+            await on_chunk(combined)
+        return combined, None
+    prompt = reduce_prompt(step.name, step.description, step.step_type, outputs)
+    output_text, err = await execute_prompt_async(
+        prompt, on_chunk=on_chunk, stats=stats, coalesce=coalesce, provider=step.provider, step_type=step.step_type
+    )
+    if err:
+        return "", f"Combining {len(outputs)} chunk outputs: {err}"
+    return output_text, None
+
+
+async def execute_plan_step(
+    step: PlanStep,
+    input_text: str,
+    on_chunk: Optional[Callable[[str], Awaitable[None]]] = None,
+    stats: Optional[CallStats] = None,
+    coalesce: bool = True,
+) -> tuple[str, Optional[str]]:
+    """
+    Run a plan step on input_text: one LLM call when it fits in LLM_CHUNK_MAX_CHARS, map-reduce over its
+    chunks otherwise. Same (output_text, error_message) contract as llm.execute_prompt_async.
+    When chunked, on_chunk receives each chunk's output in input order as soon as it and every earlier
+    chunk are done (for END steps, the reduce call's stream instead). Retries and rate limit waits of every
+    call are added to stats; coalesce is passed on to llm.execute_prompt_async.
+    """
+    chunks = split_text(input_text, settings.llm_chunk_max_chars)
+    if len(chunks) == 1:
+        return await execute_prompt_async(
+            step.prompt(input_text),
+            on_chunk=on_chunk,
+            stats=stats,
+            coalesce=coalesce,
+            provider=step.provider,
+            step_type=step.step_type,
+        )
+
+    reduce = step.step_type in REDUCE_STEP_TYPES
+    semaphore = asyncio.Semaphore(max(1, settings.llm_chunk_concurrency))
+
+    async def run_chunk(chunk: str) -> tuple[str, Optional[str]]:
+        async with semaphore:
+            return await execute_prompt_async(
+                step.prompt(chunk), stats=stats, coalesce=coalesce, provider=step.provider, step_type=step.step_type
+            )
+
+    tasks = [asyncio.create_task(run_chunk(chunk)) for chunk in chunks]
+    outputs: list[str] = []
+    try:
+        for i, task in enumerate(tasks):
+            output_text, err = await task
+            if err:
+                return "", f"Chunk {i + 1}/{len(chunks)}: {err}"
+            outputs.append(output_text)
+            if on_chunk is not None and not reduce:
+                await on_chunk(output_text if i == 0 else CHUNK_SEPARATOR + output_text)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if reduce:
+        return await _reduce(step, outputs, on_chunk, stats, coalesce)
+    return CHUNK_SEPARATOR.join(outputs), None
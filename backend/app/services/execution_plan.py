@@ -0,0 +1,257 @@
+"""
+Compiled execution plans. A plan is the immutable, run-ready form of one workflow version: the graph
+validation result, steps in execution order with their parents, prebuilt prompt prefixes/suffixes and
+step fingerprints. Plans are keyed by (workflow id, Workflow.version), which every mutating route bumps,
+so a cached plan never needs invalidating; old versions just age out.
+Two tiers: an in-process LRU and, when configured, Redis via services/cache.py.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.core.config import settings
+from app.models import Edge, Step, Workflow
+from app.services.cache import redis_configured, redis_get, redis_set
+from app.services.llm import prompt_parts
+from app.services.llm_providers import get_provider
+from app.services.local_cache import LocalCache
+from app.services.step_cache import step_fingerprint
+from app.services.validation import validate_workflow_graph
+
+logger = logging.getLogger(__name__)
+
+PLAN_CACHE_PREFIX = "execution_plan:"
+
+_local = LocalCache(settings.execution_plan_cache_max_entries, settings.execution_plan_cache_ttl_seconds)
+_redis_hits = 0
+_redis_misses = 0
+
+
+def get_steps_in_execution_order(steps: List[Step], edges: List[Edge]) -> List[Step]:
+    """
+    Return steps in execution order: topological order from the START step (Kahn's algorithm, ties broken
+    by discovery order), so a join step always comes after all of its upstream steps.
+    Works for single-step (START only), linear (START → … → END) and branching valid workflows;
+    for a linear chain this is the plain chain order.
+    """
+    step_by_id = {s.id: s for s in steps}
+    out_edges: dict[UUID, list[UUID]] = {s.id: [] for s in steps}
+    in_degree: dict[UUID, int] = {s.id: 0 for s in steps}
+    for e in edges:
+        if e.source_step_id in out_edges and e.target_step_id in in_degree:
+            out_edges[e.source_step_id].append(e.target_step_id)
+            in_degree[e.target_step_id] += 1
+
+    start_step = next(s for s in steps if s.step_type == "START")
+    order: List[Step] = []
+    seen: set[UUID] = set()
+    queue: list[UUID] = [start_step.id]
+    while queue:
+        step_id = queue.pop(0)
+        if step_id in seen:
+            continue
+        seen.add(step_id)
+        order.append(step_by_id[step_id])
+        for next_id in out_edges.get(step_id, []):
+            in_degree[next_id] -= 1
+            if in_degree[next_id] == 0 and next_id not in seen:
+                queue.append(next_id)
+    return order
+
+
+def get_step_parents(steps_ordered: List[Step], edges: List[Edge]) -> dict[UUID, List[Step]]:
+    """Upstream steps of each step, in execution order (the order their outputs are merged in)."""
+    index_of = {s.id: i for i, s in enumerate(steps_ordered)}
+    parents: dict[UUID, List[Step]] = {s.id: [] for s in steps_ordered}
+    for e in edges:
+        if e.source_step_id in index_of and e.target_step_id in parents:
+            parents[e.target_step_id].append(steps_ordered[index_of[e.source_step_id]])
+    for step_id in parents:
+        parents[step_id].sort(key=lambda s: index_of[s.id])
+    return parents
+
+
+@dataclass(frozen=True)
+class PlanStep:
+    id: UUID
+    index: int  # position in execution order
+    name: str
+    description: str
+    step_type: str
+    parent_ids: tuple[UUID, ...]  # in execution order
+    prompt_prefix: str
+    prompt_suffix: str
+    fingerprint: str  # step_cache.step_fingerprint
+    provider: Optional[str] = None  # Step.llm_provider; None for LLM_PROVIDER
+    operation: Optional[str] = None  # Step.operation: run in process (services/local_steps.py), not by the LLM
+    operation_config: Optional[dict] = None
+
+    def prompt(self, input_text: str) -> str:
+        return f"{self.prompt_prefix}{input_text}{self.prompt_suffix}"
+
+
+@dataclass(frozen=True)
+class ExecutionPlan:
+    workflow_id: UUID
+    version: int
+    browser_id: str
+    cache_step_outputs: bool
+    errors: tuple[str, ...]  # validate_workflow_graph result; non-empty means the workflow cannot run
+    steps: tuple[PlanStep, ...]  # execution order; empty when errors is non-empty
+
+    @property
+    def valid(self) -> bool:
+        return not self.errors
+
+    def step_ids(self) -> set[UUID]:
+        return {s.id for s in self.steps}
+
+    def descendants(self, step_id: UUID) -> set[UUID]:
+        """step_id plus every step downstream of it."""
+        result = {step_id}
+        for s in self.steps:  # execution order: parents are visited before their children
+            if any(p in result for p in s.parent_ids):
+                result.add(s.id)
+        return result
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), default=str)
+
+    @classmethod
+    def from_json(cls, raw: str) -> "ExecutionPlan":
+        data = json.loads(raw)
+        steps = tuple(
+            PlanStep(**{**s, "id": UUID(s["id"]), "parent_ids": tuple(UUID(p) for p in s["parent_ids"])})
+            for s in data["steps"]
+        )
+        return cls(
+            workflow_id=UUID(data["workflow_id"]),
+            version=data["version"],
+            browser_id=data["browser_id"],
+            cache_step_outputs=data["cache_step_outputs"],
+            errors=tuple(data["errors"]),
+            steps=steps,
+        )
+
+
+def compile_plan(workflow: Workflow) -> ExecutionPlan:
+    """Validate and compile a workflow loaded with its steps and edges."""
+    step_ids = [s.id for s in workflow.steps]
+    step_types = {s.id: s.step_type for s in workflow.steps}
+    edge_list = [(e.source_step_id, e.target_step_id) for e in workflow.edges]
+    errors = validate_workflow_graph(step_ids, step_types, edge_list)
+
+    plan_steps: list[PlanStep] = []
+    if not errors:
+        steps_ordered = get_steps_in_execution_order(workflow.steps, workflow.edges)
+        parents = get_step_parents(steps_ordered, workflow.edges)
+        for index, step in enumerate(steps_ordered):
+            description = step.description or ""
+            prefix, suffix = prompt_parts(step.name, description, step.step_type)
+            plan_steps.append(
+                PlanStep(
+                    id=step.id,
+                    index=index,
+                    name=step.name,
+                    description=description,
+                    step_type=step.step_type,
+                    parent_ids=tuple(p.id for p in parents[step.id]),
+                    prompt_prefix=prefix,
+                    prompt_suffix=suffix,
+                    fingerprint=step_fingerprint(
+                        step.name,
+                        description,
+                        step.step_type,
+                        step.llm_provider,
+                        step.operation,
+                        step.operation_config,
+                    ),
+                    provider=step.llm_provider,
+                    operation=step.operation,
+                    operation_config=step.operation_config,
+                )
+            )
+    return ExecutionPlan(
+        workflow_id=workflow.id,
+        version=workflow.version,
+        browser_id=workflow.browser_id,
+        cache_step_outputs=workflow.cache_step_outputs,
+        errors=tuple(errors),
+        steps=tuple(plan_steps),
+    )
+
+
+def _redis_key(workflow_id: UUID, version: int) -> str:
+    # The default provider's model is part of step fingerprints, so plans are not shared across model changes
+    return f"{PLAN_CACHE_PREFIX}{get_provider().model}:{workflow_id}:{version}"
+
+
+async def get_plan(workflow_id: UUID, version: int, db: AsyncSession) -> Optional[ExecutionPlan]:
+    """
+    Plan for this workflow version: in-process tier, then Redis, then load and compile the workflow.
+    If the workflow changed since `version` was read, the plan of its current version is returned.
+    None if the workflow does not exist.
+    """
+    global _redis_hits, _redis_misses
+    local_key = (workflow_id, version)
+    plan = _local.get(local_key)
+    if plan is not None:
+        return plan
+
+    if redis_configured():
+        raw = await redis_get(_redis_key(workflow_id, version))
+        if raw:
+            try:
+                plan = ExecutionPlan.from_json(raw)
+            except (ValueError, KeyError, TypeError) as e:
+                logger.warning("Ignoring malformed cached execution plan: %s", e)
+            else:
+                _redis_hits += 1
+                _local.set(local_key, plan)
+                return plan
+        _redis_misses += 1
+
+    result = await db.execute(
+        select(Workflow)
+        .where(Workflow.id == workflow_id)
+        .options(selectinload(Workflow.steps), selectinload(Workflow.edges))
+    )
+    workflow = result.scalar_one_or_none()
+    if workflow is None:
+        return None
+    plan = compile_plan(workflow)
+    _local.set((plan.workflow_id, plan.version), plan)
+    await redis_set(_redis_key(plan.workflow_id, plan.version), plan.to_json(), settings.execution_plan_cache_ttl_seconds)
+    return plan
+
+
+async def get_current_plan(workflow_id: UUID, browser_id: str, db: AsyncSession) -> Optional[ExecutionPlan]:
+    """Plan for the browser's workflow at its current version (one primary-key lookup on a cache hit)."""
+    result = await db.execute(
+        select(Workflow.version).where(Workflow.id == workflow_id, Workflow.browser_id == browser_id)
+    )
+    version = result.scalar_one_or_none()
+    if version is None:
+        return None
+    return await get_plan(workflow_id, version, db)
+
+
+def execution_plan_cache_stats() -> dict:
+    """In-process tier counters for /health, plus Redis tier hits and misses."""
+    redis_lookups = _redis_hits + _redis_misses
+    return {
+        **_local.stats(),
+        "redis": {
+            "hits": _redis_hits,
+            "misses": _redis_misses,
+            "hit_ratio": round(_redis_hits / redis_lookups, 4) if redis_lookups else None,
+        },
+    }
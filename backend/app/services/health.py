@@ -0,0 +1,190 @@
+"""
+Dependency health snapshot for GET /api/health and /api/health/ready. A background task (started in the app
+lifespan) checks the database (SELECT 1 on a pooled connection) and Redis (PING) every
+HEALTH_CHECK_INTERVAL_SECONDS, so probes never touch a dependency themselves. Each dependency keeps its last
+HEALTH_HISTORY_SIZE check latencies and the time of its last successful check.
+Without the refresher (e.g. an app driven without lifespan), a probe that finds the snapshot older than one
+interval refreshes it inline, at most one probe at a time.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Optional
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db.session import async_session_factory, pool_stats
+from app.services.cache import redis_configured, redis_ping
+from app.services.llm import is_available as llm_available
+
+logger = logging.getLogger(__name__)
+
+
+class _Dependency:
+    """Check results of one dependency."""
+
+    def __init__(self, name: str, history_size: int):
+        self.name = name
+        self.history: deque[tuple[float, float, bool]] = deque(maxlen=max(1, history_size))  # (at, ms, ok)
+        self.ok: Optional[bool] = None
+        self.last_error: Optional[str] = None
+        self.last_success_at: Optional[float] = None
+
+    def record(self, at: float, latency_ms: float, ok: bool, error: Optional[str]) -> None:
+        self.history.append((at, latency_ms, ok))
+        self.ok = ok
+        self.last_error = error
+        if ok:
+            self.last_success_at = at
+
+    def to_dict(self) -> dict[str, Any]:
+        latencies = sorted(ms for _, ms, _ in self.history)
+        return {
+            "ok": self.ok,
+            "latency_ms": round(self.history[-1][1], 2) if self.history else None,
+            "latency_p50_ms": round(latencies[len(latencies) // 2], 2) if latencies else None,
+            "latency_max_ms": round(latencies[-1], 2) if latencies else None,
+            "last_success_at": _iso(self.last_success_at),
+            "last_error": self.last_error,
+            "history": [{"at": _iso(at), "latency_ms": round(ms, 2), "ok": ok} for at, ms, ok in self.history],
+        }
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts is not None else None
+
+
+_database = _Dependency("database", settings.health_history_size)
+_redis = _Dependency("redis", settings.health_history_size)
+_checked_at: Optional[float] = None
+_refresh_lock = asyncio.Lock()
+_refresher: Optional[asyncio.Task] = None
+_stop = asyncio.Event()
+
+
+async def _timed(check: Callable[[], Awaitable[bool]]) -> tuple[float, bool, Optional[str]]:
+    """(latency in ms, ok, error) of one check bounded by HEALTH_CHECK_TIMEOUT_SECONDS."""
+    start = time.perf_counter()
+    try:
+        ok = await asyncio.wait_for(check(), timeout=settings.health_check_timeout_seconds)
+        error = None if ok else "check failed"
+    except asyncio.TimeoutError:
+        ok, error = False, f"timed out after {settings.health_check_timeout_seconds:g}s"
+    except Exception as e:
+        ok, error = False, f"{type(e).__name__}: {e}"
+    return (time.perf_counter() - start) * 1000, ok, error
+
+
+async def _check_database() -> bool:
+    async with async_session_factory() as db:
+        await db.execute(text("SELECT 1"))
+    return True
+
+
+async def refresh() -> None:
+    """Check every dependency once (concurrently) and update the snapshot."""
+    global _checked_at
+    checks = [_timed(_check_database)]
+    if redis_configured():
+        checks.append(_timed(redis_ping))
+    results = await asyncio.gather(*checks)
+    now = time.time()
+    _database.record(now, *results[0])
+    if len(results) > 1:
+        _redis.record(now, *results[1])
+    _checked_at = now
+
+
+async def _run(stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        try:
+            await refresh()
+        except Exception as e:
+            logger.warning("Health check refresh failed: %s", e)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.health_check_interval_seconds)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_refresher() -> None:
+    """Start the background refresher (app lifespan)."""
+    global _refresher
+    if _refresher is None or _refresher.done():
+        _stop.clear()
+        _refresher = asyncio.create_task(_run(_stop))
+
+
+async def stop_refresher() -> None:
+    global _refresher
+    if _refresher is not None:
+        _stop.set()
+        await asyncio.gather(_refresher, return_exceptions=True)
+        _refresher = None
+
+
+async def _ensure_fresh() -> None:
+    """Refresh inline when there is no snapshot yet, or it is stale and no refresher is running."""
+    refresher_running = _refresher is not None and not _refresher.done()
+    stale = _checked_at is None or time.time() - _checked_at > settings.health_check_interval_seconds
+    if _checked_at is not None and (refresher_running or not stale):
+        return
+    async with _refresh_lock:
+        if _checked_at is None or time.time() - _checked_at > settings.health_check_interval_seconds:
+            await refresh()
+
+
+def _redis_status() -> str:
+    """Same values as cache.redis_status, from the last check."""
+    if not redis_configured():
+        return "not_configured"
+    if _redis.ok is None:
+        return "unknown"
+    return "connected" if _redis.ok else "disconnected"
+
+
+def _llm_status() -> str:
+    try:
+        provider = settings.llm_provider
+        return f"{provider}_configured" if llm_available() else f"{provider}_not_configured"
+    except Exception:
+        return "error"
+
+
+async def snapshot() -> dict[str, Any]:
+    """
+    Readiness view: ready when the last database check succeeded and the snapshot is no older than three
+    intervals (plus the check timeout), i.e. the refresher is alive. Redis is optional (the caches fail open).
+    """
+    await _ensure_fresh()
+    age = time.time() - _checked_at if _checked_at is not None else None
+    max_age = 3 * settings.health_check_interval_seconds + settings.health_check_timeout_seconds
+    fresh = age is not None and age <= max_age
+    return {
+        "ready": bool(_database.ok) and fresh,
+        "checked_at": _iso(_checked_at),
+        "age_seconds": round(age, 3) if age is not None else None,
+        "check_interval_seconds": settings.health_check_interval_seconds,
+        "database": _database.to_dict(),
+        "redis": {"status": _redis_status(), **_redis.to_dict()},
+        "llm": _llm_status(),
+        "db_pool": pool_stats(),
+    }
+
+
+async def legacy_status() -> dict[str, Any]:
+    """The fields GET /api/health has always returned, from the snapshot."""
+    await _ensure_fresh()
+    return {
+        "status": "ok" if _database.ok else "degraded",
+        "database": "connected" if _database.ok else "disconnected",
+        "database_latency_ms": round(_database.history[-1][1], 2) if _database.history else None,
+        "redis": _redis_status(),
+        "llm": _llm_status(),
+        "checked_at": _iso(_checked_at),
+    }
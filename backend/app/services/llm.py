@@ -1,33 +1,81 @@
 """
-Gemini LLM service for workflow step execution.
+LLM service for workflow step execution.
 Each step has a natural-language description; the LLM transforms the input text according to that description.
+Calls go to a provider from services/llm_providers.py: LLM_PROVIDER by default (Gemini), or the step's own.
+execute_step is blocking; async callers (routes, executor) must use execute_step_async, which waits for a
+concurrency slot (at most LLM_MAX_CONCURRENCY in flight) and enforces LLM_TIMEOUT_SECONDS.
+Async calls also go through services/llm_throttle.py (rate limit, retries with backoff, adaptive concurrency)
+and services/single_flight.py (identical concurrent prompts share one call).
+Each provider attempt is observed in core/metrics.py (latency and errors by step_type and model, prompt and
+response sizes) and traced (llm.call span per logical call, llm.attempt per attempt; core/tracing.py).
+Passing on_chunk streams the response and hands each partial chunk to it.
 """
-import warnings
-from typing import Optional
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
 
+from app.core import metrics, tracing
 from app.core.config import settings
+from app.services import llm_throttle, single_flight
+from app.services.llm_providers import LLMProvider, get_provider
+from app.services.llm_throttle import CallStats
 
-# Lazy init: only import and configure when API key is set and we actually call
-_gemini_model = None
 
+def is_available(provider: Optional[str] = None) -> bool:
+    """Return True if the provider (default: LLM_PROVIDER) is configured, e.g. Gemini has an API key."""
+    return get_provider(provider).is_configured()
 
-def _get_model():
-    """Return configured Gemini GenerativeModel, or None if no API key."""
-    global _gemini_model
-    if not settings.gemini_api_key:
-        return None
-    if _gemini_model is None:
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")  # genai + urllib3 deprecation/OpenSSL warnings
-            import google.generativeai as genai
-        genai.configure(api_key=settings.gemini_api_key)
-        _gemini_model = genai.GenerativeModel(settings.gemini_model)
-    return _gemini_model
 
+def _build_prompt(step_name: str, step_description: str, input_text: str, step_type: str) -> str:
+    prefix, suffix = prompt_parts(step_name, step_description, step_type)
+    return f"{prefix}{input_text}{suffix}"
 
-def is_available() -> bool:
-    """Return True if Gemini is configured (API key set)."""
-    return bool(settings.gemini_api_key)
+
+def _empty_response(provider: LLMProvider) -> tuple[str, Optional[str]]:
+    return "", f"{provider.name.capitalize()} returned empty response"
+
+
+class _StreamInterrupted(Exception):
+    """A stream failed after partial text was forwarded; not retried, since subscribers already saw it."""
+
+
+async def _stream(
+    provider: LLMProvider,
+    prompt: str,
+    on_chunk: Callable[[str], Awaitable[None]],
+) -> tuple[str, Optional[str]]:
+    """
+    Consume provider.astream within LLM_TIMEOUT_SECONDS, awaiting on_chunk for each piece; returns the
+    assembled text. A failure before the first piece raises the provider's exception, a later one
+    _StreamInterrupted.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.llm_timeout_seconds
+    stream = provider.astream(prompt)
+    parts: list[str] = []
+    try:
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            try:
+                piece = await asyncio.wait_for(stream.__anext__(), timeout=remaining)
+            except StopAsyncIteration:
+                break
+            except asyncio.TimeoutError:
+                raise
+            except Exception as e:
+                if parts:
+                    raise _StreamInterrupted(str(e)) from e
+                raise
+            parts.append(piece)
+            await on_chunk(piece)
+    finally:
+        await stream.aclose()
+    text = "".join(parts).strip()
+    if not text:
+        return _empty_response(provider)
+    return text, None
 
 
 def execute_step(
@@ -35,37 +83,170 @@ def execute_step(
     step_description: str,
     input_text: str,
     step_type: str = "NORMAL",
+    provider: Optional[str] = None,
 ) -> tuple[str, Optional[str]]:
     """
-    Run one workflow step: send input_text to Gemini with the step's description as instruction.
+    Run one workflow step: send input_text to the LLM with the step's description as instruction.
     Returns (output_text, error_message). error_message is None on success.
+    Blocks the calling thread; use execute_step_async from async code.
     """
-    model = _get_model()
-    if not model:
-        return "", "Gemini not configured: set GEMINI_API_KEY in .env"
-
-    if step_type == "START":
-        # START typically passes input through or does minimal processing
-        prompt = _start_prompt(step_name, step_description, input_text)
-    elif step_type == "END":
-        prompt = _end_prompt(step_name, step_description, input_text)
-    else:
-        prompt = _normal_prompt(step_name, step_description, input_text)
-
+    llm = get_provider(provider)
+    if not llm.is_configured():
+        return "", llm.not_configured_message()
     try:
-        response = model.generate_content(prompt)
-        if not response.text:
-            return "", "Gemini returned empty response"
-        return response.text.strip(), None
+        with tracing.span("llm.execute_step", provider=llm.name, model=llm.model, step_type=step_type):
+            text = llm.generate(_build_prompt(step_name, step_description, input_text, step_type))
     except Exception as e:
         return "", str(e)
+    if not text:
+        return _empty_response(llm)
+    return text.strip(), None
+
+
+async def execute_step_async(
+    step_name: str,
+    step_description: str,
+    input_text: str,
+    step_type: str = "NORMAL",
+    on_chunk: Optional[Callable[[str], Awaitable[None]]] = None,
+    provider: Optional[str] = None,
+) -> tuple[str, Optional[str]]:
+    """
+    Async variant of execute_step: waits for a concurrency slot, makes the call without blocking the event
+    loop and gives up after LLM_TIMEOUT_SECONDS. Same (output_text, error_message) contract.
+    With on_chunk, the response is streamed and on_chunk is awaited with each partial text as it arrives;
+    the returned output_text is still the full (stripped) text.
+    """
+    return await execute_prompt_async(
+        _build_prompt(step_name, step_description, input_text, step_type),
+        on_chunk=on_chunk,
+        provider=provider,
+        step_type=step_type,
+    )
+
+
+async def _call_once(
+    provider: LLMProvider,
+    prompt: str,
+    on_chunk: Optional[Callable[[str], Awaitable[None]]],
+) -> tuple[str, Optional[str]]:
+    """One attempt within the current concurrency slot; provider errors are raised for the retry loop."""
+    if on_chunk is not None:
+        return await _stream(provider, prompt, on_chunk)
+    text = await asyncio.wait_for(provider.agenerate(prompt), timeout=settings.llm_timeout_seconds)
+    if not text:
+        return _empty_response(provider)
+    return text.strip(), None
+
+
+def _observe_attempt(
+    span, step_type: str, model: str, started: float, reason: Optional[str], error: Optional[str] = None
+) -> None:
+    """Record one provider attempt; reason is None on success, else timeout / throttled / error / empty."""
+    metrics.llm_call_duration.labels(step_type, model, reason or "ok").observe(time.perf_counter() - started)
+    span.set_attribute("outcome", reason or "ok")
+    if reason:
+        metrics.llm_call_errors.labels(step_type, model, reason).inc()
+        span.record_error(error or reason)
 
 
-def _start_prompt(step_name: str, step_description: str, input_text: str) -> str:
-    return f"""You are executing the first step of a text-processing workflow.
+async def _execute_prompt(
+    provider: LLMProvider,
+    prompt: str,
+    on_chunk: Optional[Callable[[str], Awaitable[None]]],
+    stats: CallStats,
+    step_type: str,
+) -> tuple[str, Optional[str]]:
+    """One logical call: rate limit, concurrency slot and retries with backoff."""
+    model = provider.model
+    metrics.llm_prompt_bytes.labels(step_type, model).observe(len(prompt.encode("utf-8")))
+    tokens = llm_throttle.estimate_tokens(prompt)
+    attempt = 0
+    while True:
+        with tracing.span("llm.attempt", attempt=attempt) as span:
+            waited = await llm_throttle.wait_for_rate_limit(model, tokens)
+            stats.throttle_wait_ms += waited * 1000
+            span.set_attribute("rate_limit_wait_ms", round(waited * 1000, 3))
+            queued = time.perf_counter()
+            async with llm_throttle.concurrency.slot():
+                started = time.perf_counter()
+                span.set_attribute("slot_wait_ms", round((started - queued) * 1000, 3))
+                try:
+                    result = await _call_once(provider, prompt, on_chunk)
+                except asyncio.TimeoutError:
+                    message = f"{provider.name.capitalize()} call timed out after {settings.llm_timeout_seconds:g}s"
+                    _observe_attempt(span, step_type, model, started, "timeout", message)
+                    return "", message
+                except Exception as e:
+                    error = e
+                else:
+                    output_text, err = result
+                    _observe_attempt(span, step_type, model, started, "empty" if err else None, err)
+                    if not err:
+                        metrics.llm_response_bytes.labels(step_type, model).observe(len(output_text.encode("utf-8")))
+                    llm_throttle.concurrency.on_success()
+                    return result
+            throttled = llm_throttle.is_throttled(error)
+            _observe_attempt(span, step_type, model, started, "throttled" if throttled else "error", str(error))
+        if throttled:
+            llm_throttle.concurrency.on_throttle()
+        retryable = llm_throttle.is_retryable(error) and not isinstance(error, _StreamInterrupted)
+        if attempt >= settings.llm_max_retries or not retryable:
+            return "", str(error)
+        delay = llm_throttle.backoff_delay(attempt)
+        stats.retries += 1
+        stats.throttle_wait_ms += delay * 1000
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+async def execute_prompt_async(
+    prompt: str,
+    on_chunk: Optional[Callable[[str], Awaitable[None]]] = None,
+    stats: Optional[CallStats] = None,
+    coalesce: bool = True,
+    provider: Optional[str] = None,
+    step_type: str = "NORMAL",
+) -> tuple[str, Optional[str]]:
+    """
+    execute_step_async for a fully built prompt (e.g. from an execution plan's prebuilt prompt prefix).
+    provider: a name from llm_providers.PROVIDER_NAMES, None for LLM_PROVIDER. step_type only labels metrics.
+    Waits for the rate limit and an adaptive concurrency slot, and retries throttled or transient failures
+    with backoff; retries and time spent waiting are added to stats when given.
+    With coalesce (and LLM_COALESCE), identical prompts in flight at the same time share one call
+    (services/single_flight.py); a caller served that way gets the whole text as one on_chunk piece.
+    Pass coalesce=False where identical prompts are expected to give different outputs.
+    """
+    llm = get_provider(provider)
+    if not llm.is_configured():
+        return "", llm.not_configured_message()
+
+    stats = stats if stats is not None else CallStats()
+    with tracing.span("llm.call", provider=llm.name, model=llm.model, step_type=step_type) as span:
+        if not (coalesce and settings.llm_coalesce):
+            output_text, err = await _execute_prompt(llm, prompt, on_chunk, stats, step_type)
+            shared = False
+        else:
+            (output_text, err), shared = await single_flight.coalesce(
+                single_flight.flight_key(llm.model, prompt),
+                lambda: _execute_prompt(llm, prompt, on_chunk, stats, step_type),
+            )
+        span.set_attribute("prompt_chars", len(prompt))
+        span.set_attribute("output_chars", len(output_text))
+        span.set_attribute("coalesced", shared)
+        if err:
+            span.record_error(err)
+    if shared and on_chunk is not None and output_text:
+        await on_chunk(output_text)
+    return output_text, err
+
+
+# Prompt templates per step_type; also part of the step result cache key (services/step_cache.py)
+PROMPT_TEMPLATES = {
+    "START": """You are executing the first step of a text-processing workflow.
 
 Step name: {step_name}
-Step description: {step_description or "Pass the input through."}
+Step description: {step_description}
 
 Input text from the user:
 ---
@@ -73,11 +254,19 @@ Input text from the user:
 ---
 
 Apply only what the step description says. If the description is empty or just "start", return the input text unchanged.
-Reply with only the transformed text, no explanation or markdown."""
+Reply with only the transformed text, no explanation or markdown.""",
+    "NORMAL": """You are executing a step in a text-processing workflow.
+
+Step name: {step_name}
+Step description: {step_description}
 
+Current text (output from the previous step):
+---
+{input_text}
+---
 
-def _normal_prompt(step_name: str, step_description: str, input_text: str) -> str:
-    return f"""You are executing a step in a text-processing workflow.
+Do exactly what the step description says to this text. Reply with only the resulting text, no explanation or markdown.""",
+    "END": """You are executing the final step of a text-processing workflow.
 
 Step name: {step_name}
 Step description: {step_description}
@@ -87,18 +276,83 @@ Current text (output from the previous step):
 {input_text}
 ---
 
-Do exactly what the step description says to this text. Reply with only the resulting text, no explanation or markdown."""
+Apply the step description and produce the final output. Reply with only the final text, no explanation or markdown.""",
+}
 
 
-def _end_prompt(step_name: str, step_description: str, input_text: str) -> str:
-    return f"""You are executing the final step of a text-processing workflow.
+# Combines the per-chunk outputs of a step whose input was split (services/chunking.py)
+REDUCE_TEMPLATE = """You are executing the final step of a text-processing workflow. The input was too long for one request, so it was split into {part_count} consecutive parts and the step was applied to each part separately.
 
 Step name: {step_name}
-Step description: {step_description or "Output the final result."}
+Step description: {step_description}
 
-Current text (output from the previous step):
+Partial results, in order:
+---
+{partial_outputs}
+---
+
+Combine the partial results into the single final output the step description asks for, as if the step had been applied to the whole input at once. Reply with only the final text, no explanation or markdown."""
+
+
+def reduce_prompt(step_name: str, step_description: str, step_type: str, partial_outputs: list[str]) -> str:
+    """Prompt merging a chunked step's partial outputs into one result."""
+    parts = "\n\n".join(f"### Part {i}\n{text}" for i, text in enumerate(partial_outputs, 1))
+    return REDUCE_TEMPLATE.format(
+        part_count=len(partial_outputs),
+        step_name=step_name,
+        step_description=step_description or _DEFAULT_DESCRIPTIONS.get(step_type, ""),
+        partial_outputs=parts,
+    )
+
+
+# Several consecutive steps in one call (services/prompt_fusion.py); the response holds each step's output
+# after its FUSED_STEP_MARKER line
+FUSED_STEP_MARKER = "<<<STEP {index}>>>"
+FUSED_TEMPLATE = """You are executing {step_count} consecutive steps of a text-processing workflow. The first step transforms the input text below; every later step transforms the result of the step before it.
+
+{steps}
+
+Input text:
 ---
 {input_text}
 ---
 
-Apply the step description and produce the final output. Reply with only the final text, no explanation or markdown."""
+Apply the steps in order. Reply with the result of every step, in order: each result on the lines after its own marker line ({markers}). No explanation or markdown, nothing before the first marker."""
+
+
+def fused_prompt(steps: list[tuple[str, str]], input_text: str) -> str:
+    """Prompt running (step_name, step_description) NORMAL steps in sequence, one marked result per step."""
+    lines = []
+    for i, (name, description) in enumerate(steps, 1):
+        lines.append(f"Step {i}: {name}\nStep {i} description: {description}")
+    return FUSED_TEMPLATE.format(
+        step_count=len(steps),
+        steps="\n\n".join(lines),
+        input_text=input_text,
+        markers=", ".join(FUSED_STEP_MARKER.format(index=i) for i in range(1, len(steps) + 1)),
+    )
+
+
+def prompt_template(step_type: str) -> str:
+    """Template used for step_type (unknown types are treated as NORMAL)."""
+    return PROMPT_TEMPLATES.get(step_type, PROMPT_TEMPLATES["NORMAL"])
+
+
+# Used in place of an empty step description
+_DEFAULT_DESCRIPTIONS = {
+    "START": "Pass the input through.",
+    "END": "Output the final result.",
+}
+
+
+def prompt_parts(step_name: str, step_description: str, step_type: str) -> tuple[str, str]:
+    """
+    The step's prompt split around the input text: (prefix, suffix), so prompt = prefix + input_text + suffix.
+    Depends only on the step definition, so execution plans build it once per workflow version.
+    """
+    before, after = prompt_template(step_type).split("{input_text}", 1)
+    prefix = before.format(
+        step_name=step_name,
+        step_description=step_description or _DEFAULT_DESCRIPTIONS.get(step_type, ""),
+    )
+    return prefix, after
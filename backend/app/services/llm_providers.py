@@ -0,0 +1,307 @@
+"""
+LLM providers behind services/llm.py, selected with LLM_PROVIDER (default for all steps) or per step
+(Step.llm_provider):
+- gemini: Google Gemini via google.generativeai (GEMINI_API_KEY, GEMINI_MODEL)
+- local: deterministic in-process simulator for offline development and load tests; configurable latency
+  distribution, error rate and text transform (LOCAL_LLM_*), no network or API key
+Every provider offers blocking (generate, generate_stream) and async (agenerate, astream) calls. Blocking
+providers get the async ones by running on a dedicated thread pool sized by LLM_MAX_CONCURRENCY; a call whose
+caller stopped waiting (timeout) keeps its concurrency slot until its thread returns, so the pool never has
+fewer free threads than llm_throttle believes. The local provider implements them natively, so simulated
+latency holds no thread.
+Errors are raised; services/llm.py turns them into (output_text, error_message), with timeouts and retries.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import random
+import re
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+from app.core.config import settings
+from app.services import llm_throttle
+
+PROVIDER_NAMES = ("gemini", "local")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_providers: dict[str, "LLMProvider"] = {}
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Dedicated pool for blocking SDK calls, so they never occupy the default executor or the event loop."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=max(1, settings.llm_max_concurrency),
+            thread_name_prefix="llm",
+        )
+    return _executor
+
+
+_STREAM_DONE = object()
+
+
+class LLMProvider:
+    """Interface shared by the providers. model identifies the outputs (part of step fingerprints and cache keys)."""
+
+    name = "base"
+
+    @property
+    def model(self) -> str:
+        raise NotImplementedError
+
+    def is_configured(self) -> bool:
+        return True
+
+    def not_configured_message(self) -> str:
+        return f"LLM provider '{self.name}' is not configured"
+
+    def generate(self, prompt: str) -> str:
+        """Blocking call returning the raw response text."""
+        raise NotImplementedError
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        """Blocking call yielding the response text in pieces."""
+        yield self.generate(prompt)
+
+    async def agenerate(self, prompt: str) -> str:
+        future = _get_executor().submit(self.generate, prompt)
+        llm_throttle.hold_slot_for(future)
+        return await asyncio.wrap_future(future)
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        """generate_stream on the LLM pool, handing pieces to the event loop as they arrive."""
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        emit: Callable[[object], None] = lambda item: loop.call_soon_threadsafe(queue.put_nowait, item)  # noqa: E731
+        stop = threading.Event()
+
+        def pump() -> None:
+            try:
+                for piece in self.generate_stream(prompt):
+                    if stop.is_set():  # consumer gone (timeout): free the thread at the next piece
+                        return
+                    emit(piece)
+                emit(_STREAM_DONE)
+            except Exception as e:
+                emit(e)
+
+        llm_throttle.hold_slot_for(_get_executor().submit(pump))
+        try:
+            while True:
+                item = await queue.get()
+                if item is _STREAM_DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self) -> None:
+        self._model = None  # lazy: only import and configure the SDK when a call is made
+
+    @property
+    def model(self) -> str:
+        return settings.gemini_model
+
+    def is_configured(self) -> bool:
+        return bool(settings.gemini_api_key)
+
+    def not_configured_message(self) -> str:
+        return "Gemini not configured: set GEMINI_API_KEY in .env"
+
+    def _get_model(self):
+        if self._model is None:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")  # genai + urllib3 deprecation/OpenSSL warnings
+                import google.generativeai as genai
+            genai.configure(api_key=settings.gemini_api_key)
+            self._model = genai.GenerativeModel(settings.gemini_model)
+        return self._model
+
+    def generate(self, prompt: str) -> str:
+        response = self._get_model().generate_content(
+            prompt,
+            request_options={"timeout": settings.llm_timeout_seconds},
+        )
+        return response.text
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        response = self._get_model().generate_content(
+            prompt,
+            stream=True,
+            request_options={"timeout": settings.llm_timeout_seconds},
+        )
+        for chunk in response:
+            try:
+                piece = chunk.text
+            except ValueError:  # chunk without text parts (e.g. safety metadata only)
+                continue
+            if piece:
+                yield piece
+
+
+class SimulatedLLMError(Exception):
+    """Injected failure of the local provider; code is the HTTP status it stands for (retryable by default)."""
+
+    def __init__(self, code: int):
+        super().__init__(f"{code} Simulated LLM error")
+        self.code = code
+
+
+def _prompt_input(prompt: str) -> str:
+    """The text a prompt asks to transform: between the template's --- delimiters, without Part headings."""
+    start, end = prompt.find("---\n"), prompt.rfind("\n---")
+    text = prompt[start + 4 : end] if start != -1 and end > start else prompt
+    return re.sub(r"(?m)^### Part \d+\n", "", text)
+
+
+def _step_description(prompt: str) -> str:
+    match = re.search(r"(?m)^Step description: (.*)$", prompt)
+    return match.group(1).lower() if match else ""
+
+
+# Fused prompts (llm.FUSED_TEMPLATE) number their steps; the reply marks each step's result like
+# llm.FUSED_STEP_MARKER (not imported: llm imports this module)
+_FUSED_STEP_DESCRIPTION = re.compile(r"(?m)^Step (\d+) description: (.*)$")
+_FUSED_STEP_MARKER = "<<<STEP {index}>>>"
+
+
+def _summarize(text: str) -> str:
+    """First sentence of every paragraph."""
+    return "\n\n".join(re.split(r"(?<=[.!?])\s", p.strip(), maxsplit=1)[0] for p in text.split("\n\n") if p.strip())
+
+
+_TRANSFORMS: dict[str, Callable[[str], str]] = {
+    "echo": lambda text: text,
+    "upper": str.upper,
+    "lower": str.lower,
+    "title": str.title,
+    "reverse": lambda text: text[::-1],
+    "summarize": _summarize,
+}
+
+# transform "auto": picked from keywords in the step description, echo when none matches
+_AUTO_KEYWORDS = (
+    ("upper", "upper"),
+    ("lower", "lower"),
+    ("title", "title"),
+    ("revers", "reverse"),
+    ("summar", "summarize"),
+)
+
+
+class LocalProvider(LLMProvider):
+    """
+    Deterministic simulator. The output is a pure function of the prompt (LOCAL_LLM_TRANSFORM applied to the
+    prompt's input text); latency and injected errors come from a generator seeded with LOCAL_LLM_SEED, so a
+    given sequence of calls is reproducible.
+    """
+
+    name = "local"
+    stream_piece_chars = 16
+
+    def __init__(self) -> None:
+        self._rng = random.Random(settings.local_llm_seed)
+        self._lock = threading.Lock()  # the blocking variants draw from the generator on pool threads
+
+    @property
+    def model(self) -> str:
+        return f"local-{settings.local_llm_transform}"
+
+    def transform(self, prompt: str) -> str:
+        text = _prompt_input(prompt)
+        fused = _FUSED_STEP_DESCRIPTION.findall(prompt)
+        if fused:  # each step transforms the previous one's result; every result after its marker
+            results = []
+            for index, description in fused:
+                text = self._apply(text, description.lower())
+                results.append(f"{_FUSED_STEP_MARKER.format(index=index)}\n{text}")
+            return "\n".join(results)
+        return self._apply(text, _step_description(prompt))
+
+    @staticmethod
+    def _apply(text: str, description: str) -> str:
+        kind = settings.local_llm_transform
+        if kind == "auto":
+            kind = next((t for keyword, t in _AUTO_KEYWORDS if keyword in description), "echo")
+        return _TRANSFORMS.get(kind, _TRANSFORMS["echo"])(text)
+
+    def _sample(self) -> tuple[float, bool]:
+        """(latency in seconds, whether this call fails)."""
+        mean = max(0.0, settings.local_llm_latency_ms)
+        spread = max(0.0, settings.local_llm_latency_spread_ms)
+        distribution = settings.local_llm_latency_distribution
+        with self._lock:
+            if distribution == "uniform":
+                latency = self._rng.uniform(mean - spread, mean + spread)
+            elif distribution == "normal":
+                latency = self._rng.gauss(mean, spread)
+            elif distribution == "lognormal" and mean > 0:
+                # Median `mean`, right-skewed like real LLM latencies; sigma capped so a spread larger than
+                # the mean cannot produce tails of several hundred times the median
+                latency = mean * math.exp(self._rng.gauss(0.0, min(1.0, spread / mean)))
+            else:
+                latency = mean
+            failed = self._rng.random() < settings.local_llm_error_rate
+        return max(0.0, latency) / 1000, failed
+
+    def _pieces(self, text: str) -> list[str]:
+        size = self.stream_piece_chars
+        return [text[i : i + size] for i in range(0, len(text), size)] or [""]
+
+    def generate(self, prompt: str) -> str:
+        latency, failed = self._sample()
+        time.sleep(latency)
+        if failed:
+            raise SimulatedLLMError(settings.local_llm_error_status)
+        return self.transform(prompt)
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        latency, failed = self._sample()
+        if failed:
+            time.sleep(latency)
+            raise SimulatedLLMError(settings.local_llm_error_status)
+        pieces = self._pieces(self.transform(prompt))
+        for piece in pieces:
+            time.sleep(latency / len(pieces))
+            yield piece
+
+    async def agenerate(self, prompt: str) -> str:
+        latency, failed = self._sample()
+        await asyncio.sleep(latency)
+        if failed:
+            raise SimulatedLLMError(settings.local_llm_error_status)
+        return self.transform(prompt)
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        latency, failed = self._sample()
+        if failed:
+            await asyncio.sleep(latency)
+            raise SimulatedLLMError(settings.local_llm_error_status)
+        pieces = self._pieces(self.transform(prompt))
+        for piece in pieces:
+            await asyncio.sleep(latency / len(pieces))
+            yield piece
+
+
+def get_provider(name: Optional[str] = None) -> LLMProvider:
+    """Provider by name (None: LLM_PROVIDER). Unknown names fall back to gemini."""
+    name = name or settings.llm_provider
+    if name not in PROVIDER_NAMES:
+        name = "gemini"
+    provider = _providers.get(name)
+    if provider is None:
+        provider = LocalProvider() if name == "local" else GeminiProvider()
+        _providers[name] = provider
+    return provider
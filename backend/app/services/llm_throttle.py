@@ -0,0 +1,236 @@
+"""
+Client-side flow control for LLM calls (used by services/llm.py):
+- rate limit: token buckets for requests/min (LLM_RATE_LIMIT_RPM) and estimated tokens/min
+  (LLM_RATE_LIMIT_TPM), shared by every process through Redis when configured, else per process;
+- retries: throttled or transiently failing calls (429, 5xx) are retried up to LLM_MAX_RETRIES times with
+  exponential backoff and full jitter;
+- adaptive concurrency (AIMD): a throttled call halves the per-process limit on in-flight calls, each success
+  raises it by 1/limit, back up to LLM_MAX_CONCURRENCY. A slot whose blocking call is still running on the
+  LLM thread pool after its caller gave up (timeout) stays taken until that thread returns.
+Time spent waiting for the rate limit or in backoff, and the retry count, are collected in CallStats and
+stored on each StepOutput.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Optional
+
+from app.core.config import settings
+from app.services.cache import redis_take_tokens
+from app.services.redis_backends import MemoryBackend
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_PREFIX = "llm_rate:"
+
+# HTTP statuses worth retrying, and the google.api_core exception names for them
+_RETRYABLE_CODES = {429, 500, 502, 503, 504}
+_THROTTLE_CODES = {429, 503}
+_RETRYABLE_NAMES = {
+    "ResourceExhausted",
+    "TooManyRequests",
+    "ServiceUnavailable",
+    "InternalServerError",
+    "BadGateway",
+    "GatewayTimeout",
+}
+_THROTTLE_NAMES = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable"}
+
+# Throttling reported by several in-flight calls at once counts as one congestion signal
+_DECREASE_COOLDOWN_SECONDS = 2.0
+
+# Per-process buckets when Redis is not configured or unreachable (same algorithm as the shared ones)
+_local_buckets = MemoryBackend(max_entries=16)
+
+
+@dataclass
+class CallStats:
+    """Accumulated over the LLM calls of one step (several with chunking)."""
+
+    retries: int = 0
+    throttle_wait_ms: float = 0.0
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for the tokens/min budget (about 4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    code = getattr(exc, "code", None)
+    if isinstance(code, int):
+        return code
+    code = getattr(exc, "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_throttled(exc: BaseException) -> bool:
+    """The provider asked us to slow down (429 / resource exhausted / overloaded)."""
+    code = _status_code(exc)
+    if code is not None:
+        return code in _THROTTLE_CODES
+    return type(exc).__name__ in _THROTTLE_NAMES or "429" in str(exc)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Throttling or a transient server-side failure; client errors (bad request, auth, safety) are not."""
+    code = _status_code(exc)
+    if code is not None:
+        return code in _RETRYABLE_CODES
+    return type(exc).__name__ in _RETRYABLE_NAMES or is_throttled(exc)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for retry number attempt (0-based)."""
+    cap = min(settings.llm_retry_max_delay, settings.llm_retry_base_delay * (2**attempt))
+    return random.uniform(0, cap)
+
+
+def _rate_buckets(model: str, tokens: int) -> tuple[list[str], list[tuple[float, float, float]]]:
+    """Bucket keys and (capacity, refill per second, cost) for the configured limits."""
+    keys: list[str] = []
+    buckets: list[tuple[float, float, float]] = []
+    prefix = f"{RATE_LIMIT_PREFIX}{model}"
+    if settings.llm_rate_limit_rpm > 0:
+        rpm = float(settings.llm_rate_limit_rpm)
+        keys.append(f"{prefix}:requests")
+        buckets.append((rpm, rpm / 60, 1.0))
+    if settings.llm_rate_limit_tpm > 0:
+        tpm = float(settings.llm_rate_limit_tpm)
+        keys.append(f"{prefix}:tokens")
+        buckets.append((tpm, tpm / 60, float(min(tokens, tpm))))  # a prompt above the budget waits for a full one
+    return keys, buckets
+
+
+async def wait_for_rate_limit(model: str, tokens: int) -> float:
+    """
+    Block until the rate limits of `model` (LLMProvider.model) allow one more call of about `tokens` tokens;
+    returns seconds waited.
+    """
+    keys, buckets = _rate_buckets(model, tokens)
+    if not keys:
+        return 0.0
+    waited = 0.0
+    while True:
+        now = time.time()
+        wait = await redis_take_tokens(keys, now, buckets)
+        if wait is None:
+            wait = await _local_buckets.take_tokens(keys, now, buckets)
+        if wait <= 0:
+            return waited
+        # Jitter so processes woken by the same refill do not all retry in the same instant
+        delay = wait * random.uniform(1.0, 1.1)
+        await asyncio.sleep(delay)
+        waited += delay
+
+
+@dataclass
+class _HeldSlot:
+    threads: list[Future] = field(default_factory=list)  # blocking calls started under the slot
+
+
+_held_slot: ContextVar[Optional[_HeldSlot]] = ContextVar("llm_held_slot", default=None)
+
+
+def hold_slot_for(future: Future) -> None:
+    """Keep the caller's concurrency slot (if any) taken until future, a call on the LLM thread pool, is done."""
+    held = _held_slot.get()
+    if held is not None:
+        held.threads.append(future)
+
+
+class AdaptiveConcurrency:
+    """Per-process cap on in-flight LLM calls, adjusted AIMD-style between 1 and max_limit."""
+
+    def __init__(self, max_limit: int):
+        self.max_limit = max(1, max_limit)
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self.throttled = 0
+        self._last_decrease = 0.0
+        self._condition: Optional[asyncio.Condition] = None
+        self._deferred_releases: set[asyncio.Task] = set()
+
+    def _get_condition(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Hold one in-flight slot; callers beyond the current limit queue without holding a thread. Pool threads
+        registered with hold_slot_for that are still running on exit keep the slot until they return.
+        """
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        held = _HeldSlot()
+        token = _held_slot.set(held)
+        try:
+            yield
+        finally:
+            _held_slot.reset(token)
+            running = [f for f in held.threads if not f.done()]
+            if running:
+                task = asyncio.ensure_future(self._release_after(running))
+                self._deferred_releases.add(task)
+                task.add_done_callback(self._deferred_releases.discard)
+            else:
+                await self._release()
+
+    async def _release(self) -> None:
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            condition.notify_all()
+
+    async def _release_after(self, threads: list[Future]) -> None:
+        try:
+            await asyncio.gather(*(asyncio.wrap_future(f) for f in threads), return_exceptions=True)
+        finally:
+            await self._release()
+
+    def on_success(self) -> None:
+        # Additive increase: about +1 per limit's worth of successful calls
+        self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+
+    def on_throttle(self) -> None:
+        self.throttled += 1
+        if not settings.llm_adaptive_concurrency:
+            return
+        now = time.monotonic()
+        if now - self._last_decrease < _DECREASE_COOLDOWN_SECONDS:
+            return
+        self._last_decrease = now
+        self.limit = max(1.0, self.limit / 2)
+        logger.info("LLM throttled; concurrency limit lowered to %d", int(self.limit))
+
+    def stats(self) -> dict:
+        return {
+            "concurrency_limit": int(self.limit),
+            "max_concurrency": self.max_limit,
+            "in_flight": self.in_flight,
+            "abandoned_in_flight": len(self._deferred_releases),  # slots kept by calls that timed out
+            "throttled": self.throttled,
+        }
+
+
+concurrency = AdaptiveConcurrency(settings.llm_max_concurrency)
+
+
+def llm_throttle_stats() -> dict:
+    """Adaptive concurrency state for /health."""
+    return {
+        **concurrency.stats(),
+        "rate_limit_rpm": settings.llm_rate_limit_rpm,
+        "rate_limit_tpm": settings.llm_rate_limit_tpm,
+    }
@@ -0,0 +1,411 @@
+"""
+Local step operations: deterministic text transforms that run in process instead of calling an LLM.
+A step with Step.operation set (one of OPERATIONS) ignores its name and description for execution and applies
+the operation to its input with Step.operation_config (JSONB):
+
+  regex_replace         pattern, replacement="", ignore_case, multiline, dotall, count=0 (all matches)
+  strip_pii             kinds (email, phone, credit_card, ssn, ip_address, url), replacement="[{kind}]"
+  normalize_whitespace  preserve_newlines=True (else everything becomes single spaces)
+  change_case           case: upper | lower | title | sentence
+  truncate              max_chars, suffix="…" (counted in max_chars), word_boundary=False
+  split_join            separator="\\n", regex=False, join_with="\\n", strip=True, drop_empty=True, unique, sort,
+                        prefix="" (prepended to every item)
+  template_fill         template with {input} and {name} placeholders from values ({{ and }} for braces)
+
+validate_config() checks a config and fills in defaults (schemas/step.py stores the result); execute() applies
+an operation. Built-in operations take microseconds on typical inputs and run on the event loop (inputs longer
+than THREAD_MIN_CHARS on a worker thread). User-supplied regexes (regex_replace, split_join with regex) run in
+child processes (services/regex_worker.py): re cannot be interrupted and holds the GIL, so a catastrophically
+backtracking pattern is contained by killing its process after LOCAL_STEP_REGEX_TIMEOUT_SECONDS.
+"""
+from __future__ import annotations
+
+import asyncio
+import queue
+import re
+import socket
+import subprocess
+import sys
+from functools import lru_cache
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import Any, Callable, NamedTuple, Optional
+
+from app.core.config import settings
+
+MAX_PATTERN_CHARS = 1000
+THREAD_MIN_CHARS = 200_000
+
+_REQUIRED = object()
+
+
+class _Operation(NamedTuple):
+    fields: dict[str, tuple[type, Any]]  # key -> (type, default or _REQUIRED); list and dict items are strings
+    check: Optional[Callable[[dict], None]]  # extra checks on the filled-in config; raises ValueError
+    apply: Callable[[str, dict], str]
+
+
+@lru_cache(maxsize=256)
+def _compile(pattern: str, flags: int = 0) -> re.Pattern:
+    return re.compile(pattern, flags)
+
+
+class _RegexSandbox:
+    """
+    Pool of LOCAL_STEP_REGEX_WORKERS child processes, started on first use. run() blocks the calling thread
+    (execute() calls it via asyncio.to_thread) until a process is free and has answered, or kills the process
+    when it takes longer than the timeout; a fresh one replaces it on the next call. Waiting for a free
+    process is bounded by the same timeout, so busy workers cannot pile up threads of the default executor.
+    """
+
+    WORKER = str(Path(__file__).with_name("regex_worker.py"))
+
+    def __init__(self, size: int):
+        self._slots: queue.Queue = queue.Queue()
+        for _ in range(max(1, size)):
+            self._slots.put(None)  # no process yet
+
+    def _start(self) -> tuple[Connection, subprocess.Popen]:
+        parent, child = socket.socketpair()
+        with child:
+            process = subprocess.Popen(
+                [sys.executable, "-I", self.WORKER, str(child.fileno())],
+                pass_fds=(child.fileno(),),
+                stdin=subprocess.DEVNULL,
+            )
+        return Connection(parent.detach()), process
+
+    @staticmethod
+    def _stop(slot: tuple[Connection, subprocess.Popen]) -> None:
+        conn, process = slot
+        process.kill()
+        process.wait()
+        conn.close()
+
+    def run(self, request: tuple, timeout: float) -> Any:
+        try:
+            slot = self._slots.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"regex sandbox busy: no worker free within {timeout:g}s") from None
+        try:
+            if slot is None:
+                slot = self._start()
+            conn = slot[0]
+            try:
+                conn.send(request)
+                reply = conn.recv() if conn.poll(timeout) else None
+                crashed = False
+            except (EOFError, OSError):
+                reply, crashed = None, True
+            if reply is None:
+                self._stop(slot)
+                slot = None
+                if crashed:
+                    raise RuntimeError("regular expression worker exited")
+                raise TimeoutError(f"regular expression took longer than {timeout:g}s")
+            status, result = reply
+            if status != "ok":
+                raise ValueError(result)
+            return result
+        finally:
+            self._slots.put(slot)
+
+
+_sandbox = _RegexSandbox(settings.local_step_regex_workers)
+
+
+def _run_user_regex(op: str, pattern: str, flags: int, args: tuple, text: str) -> Any:
+    return _sandbox.run((op, pattern, flags, args, text), settings.local_step_regex_timeout_seconds)
+
+
+def _check_pattern(pattern: str, flags: int = 0) -> None:
+    if not pattern:
+        raise ValueError("pattern must not be empty")
+    if len(pattern) > MAX_PATTERN_CHARS:
+        raise ValueError(f"pattern is longer than {MAX_PATTERN_CHARS} characters")
+    try:
+        _compile(pattern, flags)
+    except re.error as e:
+        raise ValueError(f"invalid regular expression: {e}") from None
+
+
+# regex_replace
+
+
+def _regex_flags(config: dict) -> int:
+    flags = 0
+    if config["ignore_case"]:
+        flags |= re.IGNORECASE
+    if config["multiline"]:
+        flags |= re.MULTILINE
+    if config["dotall"]:
+        flags |= re.DOTALL
+    return flags
+
+
+def _check_regex_replace(config: dict) -> None:
+    flags = _regex_flags(config)
+    _check_pattern(config["pattern"], flags)
+    try:  # parses the replacement template (group references) even though nothing matches
+        _compile(config["pattern"], flags).sub(config["replacement"], "")
+    except (re.error, IndexError) as e:
+        raise ValueError(f"invalid replacement: {e}") from None
+    if config["count"] < 0:
+        raise ValueError("count must be >= 0")
+
+
+def _regex_replace(text: str, config: dict) -> str:
+    args = (config["replacement"], config["count"])
+    return _run_user_regex("sub", config["pattern"], _regex_flags(config), args, text)
+
+
+# strip_pii
+
+# Applied in this order, so e.g. the digits of an IP address are not taken for a phone number
+PII_PATTERNS: dict[str, str] = {
+    "url": r"\bhttps?://[^\s<>\"']+",
+    # Starts only where a local part starts, at most 64 long: a long run without "@" stays linear
+    "email": r"(?<![A-Za-z0-9._%+-])[A-Za-z0-9._%+-]{1,64}@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}",
+    "ip_address": r"\b(?:(?:25[0-5]|2[0-4]\d|1?\d?\d)\.){3}(?:25[0-5]|2[0-4]\d|1?\d?\d)\b",
+    "credit_card": r"\b\d(?:[ -]?\d){12,18}\b",
+    "ssn": r"\b\d{3}-\d{2}-\d{4}\b",
+    "phone": r"(?<![\w+])(?:\+\d{1,3}[ .-]?)?(?:\(\d{2,4}\)[ .-]?|\d{2,4}[ .-])\d{3,4}[ .-]?\d{3,4}\b",
+}
+DEFAULT_PII_KINDS = ["email", "phone", "credit_card", "ssn", "ip_address"]
+
+
+def _luhn_valid(digits: str) -> bool:
+    total = 0
+    for i, ch in enumerate(reversed(digits)):
+        n = int(ch)
+        if i % 2:
+            n = n * 2 - 9 if n > 4 else n * 2
+        total += n
+    return total % 10 == 0
+
+
+def _check_strip_pii(config: dict) -> None:
+    unknown = [k for k in config["kinds"] if k not in PII_PATTERNS]
+    if unknown or not config["kinds"]:
+        raise ValueError(f"kinds must be a non-empty list of {', '.join(PII_PATTERNS)}")
+
+
+def _strip_pii(text: str, config: dict) -> str:
+    kinds = set(config["kinds"])
+    for kind, pattern in PII_PATTERNS.items():
+        if kind not in kinds:
+            continue
+        replacement = config["replacement"].replace("{kind}", kind.upper())
+        if kind == "credit_card":  # only digit runs that pass the Luhn check, not every long number
+
+            def mask(m: re.Match, replacement: str = replacement) -> str:
+                return replacement if _luhn_valid(re.sub(r"\D", "", m.group())) else m.group()
+
+            text = _compile(pattern).sub(mask, text)
+        else:
+            text = _compile(pattern).sub(lambda m, r=replacement: r, text)
+    return text
+
+
+# normalize_whitespace
+
+
+def _normalize_whitespace(text: str, config: dict) -> str:
+    if not config["preserve_newlines"]:
+        return " ".join(text.split())
+    lines = [" ".join(line.split()) for line in text.splitlines()]
+    return _compile(r"\n{3,}").sub("\n\n", "\n".join(lines)).strip()
+
+
+# change_case
+
+CASES = ("upper", "lower", "title", "sentence")
+
+
+def _check_change_case(config: dict) -> None:
+    if config["case"] not in CASES:
+        raise ValueError(f"case must be one of {', '.join(CASES)}")
+
+
+def _change_case(text: str, config: dict) -> str:
+    case = config["case"]
+    if case == "upper":
+        return text.upper()
+    if case == "lower":
+        return text.lower()
+    if case == "title":
+        return text.title()
+    # sentence: lower case, then capitalize the first letter of the text and after . ! ? and blank lines
+    return _compile(r"(^\s*|[.!?]\s+|\n\s*\n\s*)([a-z])").sub(lambda m: m.group(1) + m.group(2).upper(), text.lower())
+
+
+# truncate
+
+
+def _check_truncate(config: dict) -> None:
+    if config["max_chars"] < 1:
+        raise ValueError("max_chars must be >= 1")
+    if len(config["suffix"]) >= config["max_chars"]:
+        raise ValueError("suffix must be shorter than max_chars")
+
+
+def _truncate(text: str, config: dict) -> str:
+    max_chars, suffix = config["max_chars"], config["suffix"]
+    if len(text) <= max_chars:
+        return text
+    cut = text[: max_chars - len(suffix)]
+    if config["word_boundary"] and not text[len(cut)].isspace():
+        last_break = _compile(r"\s\S*$").search(cut)  # drop the partial last word, unless it is the only one
+        if last_break and last_break.start() > 0:
+            cut = cut[: last_break.start()]
+    return cut.rstrip() + suffix
+
+
+# split_join
+
+
+def _check_split_join(config: dict) -> None:
+    if not config["separator"]:
+        raise ValueError("separator must not be empty")
+    if config["regex"]:
+        _check_pattern(config["separator"])
+
+
+def _split_join(text: str, config: dict) -> str:
+    if config["regex"]:
+        items = _run_user_regex("split", config["separator"], 0, (), text)
+    else:
+        items = text.split(config["separator"])
+    if config["strip"]:
+        items = [item.strip() for item in items]
+    if config["drop_empty"]:
+        items = [item for item in items if item]
+    if config["unique"]:
+        items = list(dict.fromkeys(items))
+    if config["sort"]:
+        items.sort()
+    return config["join_with"].join(config["prefix"] + item for item in items)
+
+
+# template_fill
+
+_PLACEHOLDER = re.compile(r"\{\{|\}\}|\{(\w+)\}")
+
+
+def _check_template_fill(config: dict) -> None:
+    values = config["values"]
+    missing = {
+        m.group(1) for m in _PLACEHOLDER.finditer(config["template"]) if m.group(1) and m.group(1) != "input"
+    } - values.keys()
+    if missing:
+        raise ValueError(f"template placeholders without values: {', '.join(sorted(missing))}")
+
+
+def _template_fill(text: str, config: dict) -> str:
+    values = {**config["values"], "input": text}
+
+    def fill(m: re.Match) -> str:
+        if m.group(1) is None:
+            return m.group()[0]  # {{ -> {, }} -> }
+        return values[m.group(1)]
+
+    return _PLACEHOLDER.sub(fill, config["template"])
+
+
+OPERATIONS: dict[str, _Operation] = {
+    "regex_replace": _Operation(
+        {
+            "pattern": (str, _REQUIRED),
+            "replacement": (str, ""),
+            "ignore_case": (bool, False),
+            "multiline": (bool, False),
+            "dotall": (bool, False),
+            "count": (int, 0),
+        },
+        _check_regex_replace,
+        _regex_replace,
+    ),
+    "strip_pii": _Operation(
+        {"kinds": (list, DEFAULT_PII_KINDS), "replacement": (str, "[{kind}]")},
+        _check_strip_pii,
+        _strip_pii,
+    ),
+    "normalize_whitespace": _Operation({"preserve_newlines": (bool, True)}, None, _normalize_whitespace),
+    "change_case": _Operation({"case": (str, _REQUIRED)}, _check_change_case, _change_case),
+    "truncate": _Operation(
+        {"max_chars": (int, _REQUIRED), "suffix": (str, "…"), "word_boundary": (bool, False)},
+        _check_truncate,
+        _truncate,
+    ),
+    "split_join": _Operation(
+        {
+            "separator": (str, "\n"),
+            "regex": (bool, False),
+            "join_with": (str, "\n"),
+            "strip": (bool, True),
+            "drop_empty": (bool, True),
+            "unique": (bool, False),
+            "sort": (bool, False),
+            "prefix": (str, ""),
+        },
+        _check_split_join,
+        _split_join,
+    ),
+    "template_fill": _Operation(
+        {"template": (str, _REQUIRED), "values": (dict, {})},
+        _check_template_fill,
+        _template_fill,
+    ),
+}
+
+
+def validate_config(operation: str, config: Optional[dict]) -> dict:
+    """The config with defaults filled in; ValueError naming the problem if it is not valid for operation."""
+    op = OPERATIONS.get(operation)
+    if op is None:
+        raise ValueError(f"Unknown operation {operation!r}")
+    config = config or {}
+    unknown = sorted(set(config) - op.fields.keys())
+    if unknown:
+        raise ValueError(f"{operation}: unknown config keys: {', '.join(unknown)}")
+    filled: dict[str, Any] = {}
+    for key, (kind, default) in op.fields.items():
+        if key not in config:
+            if default is _REQUIRED:
+                raise ValueError(f"{operation}: {key} is required")
+            filled[key] = list(default) if isinstance(default, list) else default
+            continue
+        value = config[key]
+        # bool is an int subclass; do not accept true/false for counts or 0/1 for flags
+        if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+            raise ValueError(f"{operation}: {key} must be of type {kind.__name__}")
+        if kind is list and not all(isinstance(item, str) for item in value):
+            raise ValueError(f"{operation}: {key} must be a list of strings")
+        if kind is dict and not all(isinstance(k, str) and isinstance(v, str) for k, v in value.items()):
+            raise ValueError(f"{operation}: {key} must map names to strings")
+        filled[key] = value
+    if op.check is not None:
+        try:
+            op.check(filled)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{operation}: {e}") from None
+    return filled
+
+
+def apply(operation: str, config: Optional[dict], text: str) -> str:
+    """Run an operation synchronously (config as stored; defaults are filled in for older rows)."""
+    return OPERATIONS[operation].apply(text, validate_config(operation, config))
+
+
+def _uses_user_regex(operation: str, config: Optional[dict]) -> bool:
+    return operation == "regex_replace" or (operation == "split_join" and bool((config or {}).get("regex")))
+
+
+async def execute(operation: str, config: Optional[dict], text: str) -> tuple[str, Optional[str]]:
+    """(output, None) or ("", error message), like llm.execute_prompt_async."""
+    try:
+        if len(text) >= THREAD_MIN_CHARS or _uses_user_regex(operation, config):
+            return await asyncio.to_thread(apply, operation, config, text), None
+        return apply(operation, config, text), None
+    except Exception as e:
+        return "", f"Operation {operation} failed: {e}"
@@ -0,0 +1,91 @@
+"""
+Prompt fusion (LLM_PROMPT_FUSION): an optimizer pass over a plan's steps in execution order that finds runs of
+adjacent NORMAL LLM steps forming a linear chain (each the only child of the one before it, on the same
+provider) and executes each run as one LLM call. The fused prompt (llm.fused_prompt) asks for every step's
+result after its own marker line, so the response is split back into one output per step; each step still
+gets its own StepOutput. A response that cannot be split is reported as an error, and the caller
+(services/workflow_executor.py) then runs the steps one by one.
+"""
+from __future__ import annotations
+
+import re
+from typing import Optional
+from uuid import UUID
+
+from app.core.config import settings
+from app.services.execution_plan import ExecutionPlan, PlanStep
+from app.services.llm import execute_prompt_async, fused_prompt
+from app.services.llm_throttle import CallStats
+
+_MARKER_LINE = re.compile(r"(?m)^[ \t]*<<<STEP (\d+)>>>[ \t]*$")  # llm.FUSED_STEP_MARKER
+
+
+def _fusable(step: PlanStep) -> bool:
+    return step.step_type == "NORMAL" and step.operation is None
+
+
+def fusion_groups(plan: ExecutionPlan, max_steps: Optional[int] = None) -> dict[UUID, tuple[PlanStep, ...]]:
+    """
+    Chains of at least two fusable steps, keyed by their first step's id, each at most max_steps
+    (LLM_PROMPT_FUSION_MAX_STEPS) long. A step joins the chain when its only parent is the chain's last step,
+    that step has no other child, and both use the same provider.
+    """
+    max_steps = max_steps if max_steps is not None else settings.llm_prompt_fusion_max_steps
+    children: dict[UUID, list[UUID]] = {s.id: [] for s in plan.steps}
+    for s in plan.steps:
+        for p in s.parent_ids:
+            children[p].append(s.id)
+    steps_by_id = {s.id: s for s in plan.steps}
+
+    groups: dict[UUID, tuple[PlanStep, ...]] = {}
+    grouped: set[UUID] = set()
+    for step in plan.steps:  # execution order: a chain is always found from its first step
+        if step.id in grouped or not _fusable(step):
+            continue
+        chain = [step]
+        while len(chain) < max_steps:
+            last = chain[-1]
+            if len(children[last.id]) != 1:
+                break
+            nxt = steps_by_id[children[last.id][0]]
+            if not _fusable(nxt) or nxt.parent_ids != (last.id,) or nxt.provider != last.provider:
+                break
+            chain.append(nxt)
+        if len(chain) >= 2:
+            groups[step.id] = tuple(chain)
+            grouped.update(s.id for s in chain)
+    return groups
+
+
+def parse_fused_output(text: str, step_count: int) -> Optional[list[str]]:
+    """
+    The per-step results of a fused response, or None unless it holds exactly the markers 1..step_count in
+    order, nothing but whitespace before the first, and a non-empty result after each.
+    """
+    markers = list(_MARKER_LINE.finditer(text))
+    if [int(m.group(1)) for m in markers] != list(range(1, step_count + 1)):
+        return None
+    if text[: markers[0].start()].strip():
+        return None
+    ends = [m.start() for m in markers[1:]] + [len(text)]
+    outputs = [text[m.end() : end].strip() for m, end in zip(markers, ends)]
+    return outputs if all(outputs) else None
+
+
+async def execute_fused(
+    steps: tuple[PlanStep, ...],
+    input_text: str,
+    stats: Optional[CallStats] = None,
+    coalesce: bool = True,
+) -> tuple[Optional[list[str]], Optional[str]]:
+    """(one output per step, None) or (None, error) when the call failed or its response could not be split."""
+    prompt = fused_prompt([(s.name, s.description) for s in steps], input_text)
+    text, err = await execute_prompt_async(
+        prompt, stats=stats, coalesce=coalesce, provider=steps[0].provider, step_type="FUSED"
+    )
+    if err:
+        return None, err
+    outputs = parse_fused_output(text, len(steps))
+    if outputs is None:
+        return None, f"Response could not be split into {len(steps)} step outputs"
+    return outputs, None
@@ -0,0 +1,275 @@
+"""
+Redis backends behind services/cache.py, selected with REDIS_BACKEND:
+- upstash: Upstash REST API (HTTPS per command; serverless-friendly, no connection to keep open)
+- native: redis-py asyncio client over a pooled TCP connection (REDIS_URL; self-hosted or managed Redis)
+- memory: per-process dict, for tests and single-process development
+All backends expose the same small async API, including batched mget / set_many (one round trip each) and an
+atomic multi-bucket token bucket (take_tokens) for the shared LLM rate limiter.
+Errors propagate; services/cache.py applies REDIS_TIMEOUT_SECONDS and fails open.
+"""
+from __future__ import annotations
+
+import logging
+import math
+from typing import Optional, Sequence
+
+from app.core.config import settings
+from app.services.local_cache import LocalCache
+
+logger = logging.getLogger(__name__)
+
+# One bucket per key, stored as a hash {t: tokens, ts: last refill (unix seconds)}.
+# ARGV: now, then capacity, refill rate (tokens/s), cost per key. Takes cost from every bucket only if all
+# have enough; returns "0" then, else the seconds until they will (as a string: Lua numbers reply as integers).
+TOKEN_BUCKET_SCRIPT = """
+local now = tonumber(ARGV[1])
+local levels = {}
+local wait = 0
+for i = 1, #KEYS do
+  local cap = tonumber(ARGV[i * 3 - 1])
+  local rate = tonumber(ARGV[i * 3])
+  local cost = tonumber(ARGV[i * 3 + 1])
+  local state = redis.call('HMGET', KEYS[i], 't', 'ts')
+  local tokens = tonumber(state[1]) or cap
+  local ts = tonumber(state[2]) or now
+  tokens = math.min(cap, tokens + math.max(0, now - ts) * rate)
+  levels[i] = tokens
+  if tokens < cost then wait = math.max(wait, (cost - tokens) / rate) end
+end
+if wait > 0 then return tostring(wait) end
+for i = 1, #KEYS do
+  local cap = tonumber(ARGV[i * 3 - 1])
+  local rate = tonumber(ARGV[i * 3])
+  local cost = tonumber(ARGV[i * 3 + 1])
+  redis.call('HSET', KEYS[i], 't', tostring(levels[i] - cost), 'ts', tostring(now))
+  redis.call('EXPIRE', KEYS[i], math.ceil(cap / rate) + 1)
+end
+return '0'
+"""
+
+
+def _token_bucket_args(now: float, buckets: Sequence[tuple[float, float, float]]) -> list[str]:
+    args = [repr(now)]
+    for capacity, rate, cost in buckets:
+        args += [repr(capacity), repr(rate), repr(cost)]
+    return args
+
+
+class RedisBackend:
+    """Interface shared by the backends. Values are strings; ttl is in seconds."""
+
+    name = "base"
+
+    async def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    async def mget(self, keys: list[str]) -> list[Optional[str]]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        raise NotImplementedError
+
+    async def set_many(self, items: dict[str, str], ttl: int) -> None:
+        raise NotImplementedError
+
+    async def set_nx(self, key: str, value: str, ttl: int) -> bool:
+        """SET key only if it does not exist (a lock); True if it was set."""
+        raise NotImplementedError
+
+    async def delete(self, *keys: str) -> None:
+        raise NotImplementedError
+
+    async def take_tokens(self, keys: list[str], now: float, buckets: Sequence[tuple[float, float, float]]) -> float:
+        """
+        Atomically take cost from each key's token bucket ((capacity, refill per second, cost) per key) if all
+        have enough; returns 0.0 on success, else the seconds to wait before trying again (nothing is taken).
+        """
+        raise NotImplementedError
+
+    async def ping(self) -> bool:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class UpstashBackend(RedisBackend):
+    name = "upstash"
+
+    def __init__(self, url: str, token: str):
+        from upstash_redis.asyncio import Redis
+
+        self._client = Redis(
+            url=url,
+            token=token,
+            allow_telemetry=False,
+            rest_retries=settings.upstash_redis_rest_retries,
+            rest_retry_interval=settings.upstash_redis_rest_retry_interval,
+        )
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client.get(key)
+
+    async def mget(self, keys: list[str]) -> list[Optional[str]]:
+        return list(await self._client.mget(*keys)) if keys else []
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        await self._client.set(key, value, ex=ttl)
+
+    async def set_many(self, items: dict[str, str], ttl: int) -> None:
+        if not items:
+            return
+        pipe = self._client.pipeline()
+        for key, value in items.items():
+            pipe.set(key, value, ex=ttl)
+        await pipe.exec()
+
+    async def set_nx(self, key: str, value: str, ttl: int) -> bool:
+        return bool(await self._client.set(key, value, ex=ttl, nx=True))
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self._client.delete(*keys)
+
+    async def take_tokens(self, keys: list[str], now: float, buckets: Sequence[tuple[float, float, float]]) -> float:
+        return float(await self._client.eval(TOKEN_BUCKET_SCRIPT, keys, _token_bucket_args(now, buckets)))
+
+    async def ping(self) -> bool:
+        result = await self._client.ping()
+        return (result == "PONG") if isinstance(result, str) else bool(result)
+
+    async def close(self) -> None:
+        await self._client.close()
+
+
+class NativeBackend(RedisBackend):
+    name = "native"
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        timeout = settings.redis_timeout_seconds
+        self._client = redis.Redis.from_url(
+            url,
+            max_connections=settings.redis_max_connections,
+            socket_timeout=timeout,
+            socket_connect_timeout=max(timeout, 1.0),  # a new TCP (+TLS) connection needs more than one command
+            decode_responses=True,
+        )
+        self._token_bucket = None
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client.get(key)
+
+    async def mget(self, keys: list[str]) -> list[Optional[str]]:
+        return await self._client.mget(keys) if keys else []
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        await self._client.set(key, value, ex=ttl)
+
+    async def set_many(self, items: dict[str, str], ttl: int) -> None:
+        if not items:
+            return
+        async with self._client.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.set(key, value, ex=ttl)
+            await pipe.execute()
+
+    async def set_nx(self, key: str, value: str, ttl: int) -> bool:
+        return bool(await self._client.set(key, value, ex=ttl, nx=True))
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self._client.delete(*keys)
+
+    async def take_tokens(self, keys: list[str], now: float, buckets: Sequence[tuple[float, float, float]]) -> float:
+        if self._token_bucket is None:
+            self._token_bucket = self._client.register_script(TOKEN_BUCKET_SCRIPT)  # EVALSHA, EVAL on NOSCRIPT
+        return float(await self._token_bucket(keys=keys, args=_token_bucket_args(now, buckets)))
+
+    async def ping(self) -> bool:
+        return bool(await self._client.ping())
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+class MemoryBackend(RedisBackend):
+    """Process-local stand-in with Redis semantics (per-key expiry); nothing is shared between processes."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 100_000):
+        self._data = LocalCache(max_entries, ttl=0)
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._data.get(key)
+
+    async def mget(self, keys: list[str]) -> list[Optional[str]]:
+        return [self._data.get(k) for k in keys]
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        self._data.set(key, value, ttl=ttl)
+
+    async def set_many(self, items: dict[str, str], ttl: int) -> None:
+        for key, value in items.items():
+            self._data.set(key, value, ttl=ttl)
+
+    async def set_nx(self, key: str, value: str, ttl: int) -> bool:
+        if self._data.get(key) is not None:
+            return False
+        self._data.set(key, value, ttl=ttl)
+        return True
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._data.delete(key)
+
+    async def take_tokens(self, keys: list[str], now: float, buckets: Sequence[tuple[float, float, float]]) -> float:
+        # Same algorithm as TOKEN_BUCKET_SCRIPT; atomic because it never awaits
+        levels = []
+        wait = 0.0
+        for key, (capacity, rate, cost) in zip(keys, buckets):
+            tokens, ts = self._data.get(key) or (capacity, now)
+            tokens = min(capacity, tokens + max(0.0, now - ts) * rate)
+            levels.append(tokens)
+            if tokens < cost:
+                wait = max(wait, (cost - tokens) / rate)
+        if wait > 0:
+            return wait
+        for key, (capacity, rate, cost), tokens in zip(keys, buckets, levels):
+            self._data.set(key, (tokens - cost, now), ttl=math.ceil(capacity / rate) + 1)
+        return 0.0
+
+    async def ping(self) -> bool:
+        return True
+
+
+def backend_configured() -> bool:
+    """True if the selected REDIS_BACKEND has the settings it needs."""
+    kind = settings.redis_backend
+    if kind == "memory":
+        return True
+    if kind == "native":
+        return bool(settings.redis_url.strip())
+    if kind == "upstash":
+        url = (settings.upstash_redis_rest_url or "").strip()
+        token = (settings.upstash_redis_rest_token or "").strip()
+        return bool(url and token)
+    return False
+
+
+def create_backend() -> Optional[RedisBackend]:
+    """Build the backend selected by REDIS_BACKEND; None if it is not configured or its client fails to load."""
+    if not backend_configured():
+        return None
+    kind = settings.redis_backend
+    try:
+        if kind == "native":
+            return NativeBackend(settings.redis_url.strip())
+        if kind == "memory":
+            return MemoryBackend()
+        return UpstashBackend(settings.upstash_redis_rest_url.strip(), settings.upstash_redis_rest_token.strip())
+    except Exception as e:
+        logger.warning("Redis client init failed (%s backend): %s", kind, e)
+        return None
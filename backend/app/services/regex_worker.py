@@ -0,0 +1,27 @@
+"""
+Child process running user-supplied regular expressions for services/local_steps.py. Started as a script with
+the file descriptor of a connected socket; serves (op, pattern, flags, args, text) requests ("sub" with
+(replacement, count), or "split") until the socket closes. Imports only the stdlib, so it starts quickly and
+the parent can kill it at any point.
+"""
+import re
+import sys
+from multiprocessing.connection import Connection
+
+
+def serve(conn: Connection) -> None:
+    while True:
+        try:
+            op, pattern, flags, args, text = conn.recv()
+        except EOFError:
+            return
+        try:
+            compiled = re.compile(pattern, flags)
+            result = compiled.sub(args[0], text, count=args[1]) if op == "sub" else compiled.split(text)
+            conn.send(("ok", result))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+if __name__ == "__main__":
+    serve(Connection(int(sys.argv[1])))
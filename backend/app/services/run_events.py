@@ -0,0 +1,166 @@
+"""
+Run progress events for GET /runs/{id}/stream (SSE).
+The executor publishes run_started, step_started, step_completed and run_finished events, and with
+LLM_STREAMING step_output_delta events, which DeltaBuffer batches instead of sending one per streamed chunk.
+With RUN_EVENTS_BACKEND=memory they go straight to subscribers in this process; with postgres they are sent
+through NOTIFY so subscribers in any API worker receive events from runs executed anywhere
+(other uvicorn workers, queue workers).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+from uuid import UUID
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+RUN_EVENTS_CHANNEL = "run_events"
+# Text fields in events are cut to this many UTF-8 bytes so a payload fits a NOTIFY; full text is in GET /runs/{id}
+EVENT_TEXT_LIMIT = 2000
+# Text limit for an event that still does not fit (e.g. text of escaped control characters); lists are dropped
+SLIM_EVENT_TEXT_LIMIT = 256
+# Kept when an event has to be cut down to its identifiers (event_truncated: fetch the rest from GET /runs/{id})
+EVENT_ID_FIELDS = ("run_id", "type", "status", "step_id", "step_output_id", "index")
+SUBSCRIBER_QUEUE_SIZE = 1024
+# Longest delta per step_output_delta event: fits a NOTIFY whole even as escaped control characters
+DELTA_MAX_CHARS = 1000
+
+TERMINAL_EVENT = "run_finished"
+
+_subscribers: dict[str, set[asyncio.Queue]] = {}
+
+
+def _deliver(event: dict) -> None:
+    queues = _subscribers.get(event.get("run_id", ""))
+    if not queues:
+        return
+    for q in list(queues):
+        if q.full():
+            # Slow consumer: drop its oldest event rather than block the publisher
+            try:
+                q.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+        q.put_nowait(event)
+
+
+def _on_notify(payload: str) -> None:
+    try:
+        _deliver(json.loads(payload))
+    except ValueError:
+        logger.warning("Ignoring malformed run event payload")
+
+
+def truncate_text(value: str, limit: int = EVENT_TEXT_LIMIT) -> tuple[str, bool]:
+    """Return (text, truncated) with text cut to at most limit bytes of UTF-8, on a character boundary."""
+    encoded = value.encode("utf-8")
+    if len(encoded) <= limit:
+        return value, False
+    return encoded[:limit].decode("utf-8", "ignore"), True
+
+
+def _encode(event: dict) -> str:
+    return json.dumps(event, default=str, ensure_ascii=False)
+
+
+def fit_payload(event: dict, max_bytes: int) -> str:
+    """
+    The event as JSON of under max_bytes UTF-8 bytes: as is if it fits, else with every text cut to
+    EVENT_TEXT_LIMIT, then to SLIM_EVENT_TEXT_LIMIT without list fields, and finally only EVENT_ID_FIELDS.
+    Cut-down events carry event_truncated: true. The terminal event always fits, so streams always end.
+    """
+    payload = _encode(event)
+    if len(payload.encode("utf-8")) < max_bytes:
+        return payload
+    for limit, keep_lists in ((EVENT_TEXT_LIMIT, True), (SLIM_EVENT_TEXT_LIMIT, False)):
+        smaller: dict[str, Any] = {}
+        for key, value in event.items():
+            if isinstance(value, str):
+                smaller[key] = truncate_text(value, limit)[0]
+            elif keep_lists or not isinstance(value, (list, dict)):
+                smaller[key] = value
+        payload = _encode({**smaller, "event_truncated": True})
+        if len(payload.encode("utf-8")) < max_bytes:
+            return payload
+    return _encode({**{k: event[k] for k in EVENT_ID_FIELDS if k in event}, "event_truncated": True})
+
+
+async def publish(run_id: UUID, event_type: str, **data: Any) -> None:
+    """Publish one event for run_id. Never raises: progress events must not fail a run."""
+    event = {"run_id": str(run_id), "type": event_type, **data}
+    if settings.run_events_backend != "postgres":
+        _deliver(event)
+        return
+    try:
+        from app.db.notify import MAX_PAYLOAD_BYTES, notify
+
+        await notify(RUN_EVENTS_CHANNEL, fit_payload(event, MAX_PAYLOAD_BYTES))
+    except Exception as e:
+        logger.warning("Publishing run event %s failed: %s", event_type, e)
+
+
+class DeltaBuffer:
+    """
+    Streamed output of one step, published as step_output_delta events once RUN_EVENTS_DELTA_FLUSH_MS have
+    passed since the last one or RUN_EVENTS_DELTA_FLUSH_CHARS characters are waiting, rather than one event
+    (with postgres, one NOTIFY and pool connection) per chunk. Call flush() when the stream ends.
+    """
+
+    def __init__(self, run_id: UUID, step_id: UUID, index: int):
+        self.run_id, self.step_id, self.index = run_id, step_id, index
+        self._parts: list[str] = []
+        self._chars = 0
+        self._last_flush = time.monotonic()
+
+    async def add(self, delta: str) -> None:
+        self._parts.append(delta)
+        self._chars += len(delta)
+        elapsed_ms = (time.monotonic() - self._last_flush) * 1000
+        if self._chars >= settings.run_events_delta_flush_chars or elapsed_ms >= settings.run_events_delta_flush_ms:
+            await self.flush()
+
+    async def flush(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._parts:
+            return
+        text = "".join(self._parts)
+        self._parts.clear()
+        self._chars = 0
+        for start in range(0, len(text), DELTA_MAX_CHARS):
+            await publish(
+                self.run_id,
+                "step_output_delta",
+                step_id=str(self.step_id),
+                index=self.index,
+                delta=text[start : start + DELTA_MAX_CHARS],
+            )
+
+
+@asynccontextmanager
+async def subscribe(run_id: UUID) -> AsyncIterator[asyncio.Queue]:
+    """Yield a queue receiving this run's events (dicts) until the context exits."""
+    key = str(run_id)
+    q: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    _subscribers.setdefault(key, set()).add(q)
+    try:
+        yield q
+    finally:
+        queues = _subscribers.get(key)
+        if queues is not None:
+            queues.discard(q)
+            if not queues:
+                _subscribers.pop(key, None)
+
+
+def register_listener() -> None:
+    """Hook the run events channel into the process LISTEN connection (postgres backend only)."""
+    if settings.run_events_backend == "postgres":
+        from app.db.notify import add_listener
+
+        add_listener(RUN_EVENTS_CHANNEL, _on_notify)
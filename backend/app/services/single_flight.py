@@ -0,0 +1,93 @@
+"""
+Single-flight coalescing of identical LLM calls (same model + prompt) that are in flight at the same time,
+e.g. a burst of runs or batch items with the same input. Within a process, callers share one task. Across
+processes, the task first takes a short Redis lock (SET NX, LLM_COALESCE_LOCK_SECONDS); a process that finds
+the lock taken polls for the result the lock holder publishes, and makes the call itself if the lock goes away
+without one (failed call, crashed holder) or Redis is unavailable. Only successful results are shared across
+processes; complements the step result cache, which only helps once a call has finished.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import uuid
+from typing import Awaitable, Callable, Optional
+
+from app.core.config import settings
+from app.services.cache import redis_delete, redis_mget, redis_set, redis_set_nx
+
+logger = logging.getLogger(__name__)
+
+LOCK_PREFIX = "llm_flight:"
+RESULT_PREFIX = "llm_flight_result:"
+
+CallResult = tuple[str, Optional[str]]  # (output_text, error_message), as returned by llm.execute_prompt_async
+
+_in_flight: dict[str, asyncio.Task] = {}
+_stats = {"calls": 0, "coalesced_local": 0, "coalesced_remote": 0}
+
+
+def flight_key(model: str, prompt: str) -> str:
+    return hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+async def _await_remote_result(key: str) -> Optional[str]:
+    """Poll for the lock holder's result; None once the lock is gone (or expired) without one."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.llm_coalesce_lock_seconds
+    while loop.time() < deadline:
+        await asyncio.sleep(settings.llm_coalesce_poll_interval)
+        result, lock = await redis_mget([f"{RESULT_PREFIX}{key}", f"{LOCK_PREFIX}{key}"])
+        if result is not None:
+            return result
+        if lock is None:
+            return None
+    return None
+
+
+async def _lead(key: str, call: Callable[[], Awaitable[CallResult]]) -> tuple[CallResult, bool]:
+    """Make the call under the cluster-wide lock, or take over another process's result. Returns (result, shared)."""
+    lock_key = f"{LOCK_PREFIX}{key}"
+    ttl = settings.llm_coalesce_lock_seconds
+    acquired = await redis_set_nx(lock_key, uuid.uuid4().hex, ttl)
+    if acquired is False:
+        shared = await _await_remote_result(key)
+        if shared is not None:
+            _stats["coalesced_remote"] += 1
+            return (shared, None), True
+        acquired = await redis_set_nx(lock_key, uuid.uuid4().hex, ttl)
+    _stats["calls"] += 1
+    try:
+        result = await call()
+        if acquired and not result[1]:
+            await redis_set(f"{RESULT_PREFIX}{key}", result[0], ttl)
+        return result, False
+    finally:
+        if acquired:
+            # Plain DEL: if our lock already expired and another process holds it now, the worst case is
+            # one duplicate call by a waiter, not a wrong result
+            await redis_delete(lock_key)
+
+
+async def coalesce(key: str, call: Callable[[], Awaitable[CallResult]]) -> tuple[CallResult, bool]:
+    """
+    Result of call(), shared by all concurrent callers with the same key. Returns (result, shared): shared is
+    False for the caller whose call() ran. The call runs in its own task, so a cancelled caller does not
+    cancel it for the others.
+    """
+    task = _in_flight.get(key)
+    if task is not None:
+        _stats["coalesced_local"] += 1
+        result, _ = await asyncio.shield(task)
+        return result, True
+
+    task = asyncio.create_task(_lead(key, call))
+    _in_flight[key] = task
+    task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    return await asyncio.shield(task)
+
+
+def single_flight_stats() -> dict:
+    """Counters for /health: calls made, and callers served by a local or remote in-flight call."""
+    return {"enabled": settings.llm_coalesce, "in_flight": len(_in_flight), **_stats}
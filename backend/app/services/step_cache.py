@@ -0,0 +1,95 @@
+"""
+Content-addressed cache of LLM step results.
+Key: sha256 over (provider model, prompt template for the step_type, step name, step description, input text),
+so any change to the provider or model, prompt, step or input is a different entry. Two tiers: a bounded in-process
+LRU (STEP_CACHE_MAX_ENTRIES) and, when configured, Redis via services/cache.py (STEP_CACHE_REDIS).
+Workflows with cache_step_outputs=false (non-deterministic steps) bypass the cache entirely.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Optional, Sequence
+
+from app.core.config import settings
+from app.services.cache import redis_configured, redis_get, redis_set
+from app.services.llm import FUSED_STEP_MARKER, FUSED_TEMPLATE, prompt_template
+from app.services.llm_providers import get_provider
+from app.services.local_cache import LocalCache
+
+STEP_CACHE_PREFIX = "step_result:"
+
+_local = LocalCache(settings.step_cache_max_entries, settings.step_cache_ttl_seconds)
+_redis_hits = 0
+_redis_misses = 0
+
+
+def step_fingerprint(
+    step_name: str,
+    step_description: str,
+    step_type: str,
+    provider: Optional[str] = None,
+    operation: Optional[str] = None,
+    operation_config: Optional[dict] = None,
+) -> str:
+    """Hash of everything that defines a step's behaviour except its input (model, template, name, description).
+    provider is the step's LLM provider (None: LLM_PROVIDER); its model id stands for the model. For a local
+    operation step (services/local_steps.py) the operation and its config define it instead.
+    Stored on StepOutput so resumed runs can tell whether a step changed since it last ran."""
+    if operation is not None:
+        material = json.dumps(["operation", operation, operation_config or {}], ensure_ascii=False, sort_keys=True)
+    else:
+        material = json.dumps(
+            [get_provider(provider).model, prompt_template(step_type), step_name, step_description],
+            ensure_ascii=False,
+        )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def fused_fingerprint(fingerprints: Sequence[str]) -> str:
+    """Fingerprint of a fused chain (services/prompt_fusion.py): the fused prompt template and its steps'
+    fingerprints in chain order. A fused call's outputs are cached under this, never under the steps' own
+    fingerprints, so switching LLM_PROMPT_FUSION or splitting a chain differently does not mix the two."""
+    material = json.dumps(["fused", FUSED_TEMPLATE, FUSED_STEP_MARKER, list(fingerprints)], ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def step_cache_key(fingerprint: str, input_text: str) -> str:
+    return hashlib.sha256(f"{fingerprint}\n{input_text}".encode("utf-8")).hexdigest()
+
+
+async def get_cached_output(key: str) -> Optional[str]:
+    """Return the cached output for key (local tier first, then Redis), or None."""
+    global _redis_hits, _redis_misses
+    value = _local.get(key)
+    if value is not None:
+        return value
+    if not settings.step_cache_redis or not redis_configured():
+        return None
+    value = await redis_get(f"{STEP_CACHE_PREFIX}{key}")
+    if value is None:
+        _redis_misses += 1
+        return None
+    _redis_hits += 1
+    _local.set(key, value)
+    return value
+
+
+async def set_cached_output(key: str, output_text: str) -> None:
+    _local.set(key, output_text)
+    if settings.step_cache_redis:
+        await redis_set(f"{STEP_CACHE_PREFIX}{key}", output_text, settings.step_cache_ttl_seconds)
+
+
+def step_cache_stats() -> dict:
+    """Hit/miss counters per tier for /health."""
+    redis_lookups = _redis_hits + _redis_misses
+    return {
+        "enabled": settings.step_cache_enabled,
+        "local": _local.stats(),
+        "redis": {
+            "hits": _redis_hits,
+            "misses": _redis_misses,
+            "hit_ratio": round(_redis_hits / redis_lookups, 4) if redis_lookups else None,
+        },
+    }
@@ -0,0 +1,80 @@
+"""
+Content-addressed storage for run inputs and step texts (text_blobs table).
+A text is stored once under the sha256 of its UTF-8 bytes, zlib-compressed when that makes it smaller.
+Runs and step outputs reference blobs by hash, so a step's output and the next step's input (the same
+text) share one row, as do identical inputs across runs. Reading is transparent: Run.input_text and
+StepOutput.input_text / output_text decode the eagerly loaded blob, so API schemas are unchanged.
+"""
+from __future__ import annotations
+
+import hashlib
+import zlib
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, exists, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Run, StepOutput, TextBlob
+from app.models.text_blob import CODEC_RAW, CODEC_ZLIB
+
+# Below this many bytes zlib's header and dictionary overhead rarely pays off
+COMPRESS_MIN_BYTES = 256
+ZLIB_LEVEL = 6
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _blob_row(text: str, digest: str) -> dict:
+    raw = text.encode("utf-8")
+    codec, data = CODEC_RAW, raw
+    if len(raw) >= COMPRESS_MIN_BYTES:
+        compressed = zlib.compress(raw, ZLIB_LEVEL)
+        if len(compressed) < len(raw):
+            codec, data = CODEC_ZLIB, compressed
+    return {"hash": digest, "codec": codec, "data": data, "size": len(raw)}
+
+
+async def store_texts(texts: Iterable[str], db: AsyncSession, known: Optional[set[str]] = None) -> list[str]:
+    """
+    Make sure every text has a blob (INSERT ... ON CONFLICT DO NOTHING, one executemany) and return their
+    hashes in input order. Hashes in `known` are assumed stored already and skipped; new ones are added to it.
+    Runs in the caller's transaction.
+    """
+    hashes: list[str] = []
+    rows: dict[str, dict] = {}
+    for text in texts:
+        digest = text_hash(text)
+        hashes.append(digest)
+        if digest not in rows and (known is None or digest not in known):
+            rows[digest] = _blob_row(text, digest)
+    if rows:
+        # Sorted so concurrent transactions inserting overlapping texts take row locks in the same order
+        await db.execute(
+            pg_insert(TextBlob).on_conflict_do_nothing(index_elements=["hash"]),
+            [rows[digest] for digest in sorted(rows)],
+        )
+        if known is not None:
+            known.update(rows)
+    return hashes
+
+
+async def store_text(text: str, db: AsyncSession) -> str:
+    return (await store_texts([text], db))[0]
+
+
+async def prune_unreferenced_blobs(db: AsyncSession) -> int:
+    """Delete blobs no run or step output references any more (e.g. after workflows were deleted)."""
+    result = await db.execute(
+        delete(TextBlob)
+        .where(
+            ~exists(select(Run.id).where(Run.input_hash == TextBlob.hash)),
+            ~exists(select(StepOutput.id).where(StepOutput.input_hash == TextBlob.hash)),
+            ~exists(select(StepOutput.id).where(StepOutput.output_hash == TextBlob.hash)),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount or 0
@@ -2,6 +2,8 @@
 Validate workflow graph.
 - One step: that step must be START (no END required).
 - Two or more steps: exactly one START, one END, no cycles (DAG), all steps connected.
+  Steps may branch (several outgoing edges) and join (several incoming edges); START has no incoming and
+  END no outgoing edges.
 Returns list of error strings; empty list means valid.
 """
 from uuid import UUID
@@ -37,27 +39,14 @@ def validate_workflow_graph(
         if src in adj and tgt in step_set:
             adj[src].append(tgt)
 
-    # Each step must have at most one incoming and one outgoing edge (linear chain).
-    valid_edges_for_degree = [(src, tgt) for src, tgt in edges if src in step_set and tgt in step_set]
-    out_degree: dict[UUID, int] = {s: 0 for s in step_ids}
-    in_degree: dict[UUID, int] = {s: 0 for s in step_ids}
-    for src, tgt in valid_edges_for_degree:
-        out_degree[src] = out_degree.get(src, 0) + 1
-        in_degree[tgt] = in_degree.get(tgt, 0) + 1
-    for sid in step_ids:
-        if out_degree.get(sid, 0) > 1:
-            errors.append(
-                "Each step may have only one outgoing connection (one edge from its output). "
-                "Remove extra edges from the same step."
-            )
-            break
-    for sid in step_ids:
-        if in_degree.get(sid, 0) > 1:
-            errors.append(
-                "Each step may have only one incoming connection (one edge to its input). "
-                "Remove extra edges to the same step."
-            )
-            break
+    # Branches and joins are allowed; only START's inputs and END's outputs are restricted.
+    has_incoming = {tgt for src, tgt in edges if src in step_set and tgt in step_set}
+    has_outgoing = {src for src, tgt in edges if src in step_set and tgt in step_set}
+    if len(step_ids) > 1:
+        if any(sid in has_incoming for sid in starts):
+            errors.append("The START step must not have incoming connections.")
+        if any(sid in has_outgoing for sid in ends):
+            errors.append("The END step must not have outgoing connections.")
 
     # Cycle detection via DFS
     WHITE, GRAY, BLACK = 0, 1, 2
@@ -1,109 +1,405 @@
 """
-Execute a workflow run: order steps (BFS from START), run each step through the LLM, persist StepOutput.
+Execute a workflow run from its compiled execution plan (services/execution_plan.py): run each step through
+the LLM (map-reduce over chunks for long inputs, services/chunking.py) or, for local operation steps, in
+process (services/local_steps.py), persist StepOutput. Steps whose
+upstream steps have all finished run concurrently, so independent branches overlap; a join step receives
+merge_upstream_outputs() of its parents. Each StepOutput is committed as soon as its step finishes and
+progress is published to run_events (SSE). With LLM_PROMPT_FUSION, chains of NORMAL LLM steps run as one
+LLM call (services/prompt_fusion.py) and are split back into one StepOutput per step.
 """
 from __future__ import annotations
 
+import asyncio
+import json
+import logging
 import time
+import uuid
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import List
+from typing import Optional, Sequence
 from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
-from app.models import Edge, Run, Step, StepOutput, Workflow
-from app.services.llm import execute_step as llm_execute_step
+from app.core import metrics, tracing
+from app.core.config import settings
+from app.db.session import async_session_factory
+from app.models import Run, StepOutput, Workflow
+from app.services import local_steps, prompt_fusion, run_events, step_cache
+from app.services.chunking import execute_plan_step
+from app.services.execution_plan import PlanStep, get_plan
+from app.services.llm_throttle import CallStats
+from app.services.text_store import store_texts, text_hash
 
+logger = logging.getLogger(__name__)
 
-def get_steps_in_execution_order(steps: List[Step], edges: List[Edge]) -> List[Step]:
+
+def merge_upstream_outputs(parents: Sequence[PlanStep], outputs: dict[UUID, str]) -> str:
     """
-    Return steps in execution order: BFS from the START step following edges.
-    Works for single-step (START only) or multi-step (START → … → END) valid workflows.
+    Input of a step: its single parent's output, or for a join step each parent's output under a
+    "### <step name>" heading, in execution order, separated by blank lines.
     """
-    step_by_id = {s.id: s for s in steps}
-    out_edges: dict[UUID, list[UUID]] = {s.id: [] for s in steps}
-    for e in edges:
-        if e.source_step_id in out_edges:
-            out_edges[e.source_step_id].append(e.target_step_id)
-
-    start_step = next(s for s in steps if s.step_type == "START")
-    order: List[Step] = []
-    seen: set[UUID] = set()
-    queue: list[UUID] = [start_step.id]
-    while queue:
-        step_id = queue.pop(0)
-        if step_id in seen:
-            continue
-        seen.add(step_id)
-        order.append(step_by_id[step_id])
-        for next_id in out_edges.get(step_id, []):
-            if next_id not in seen:
-                queue.append(next_id)
-    return order
-
-
-async def execute_workflow(
+    if len(parents) == 1:
+        return outputs[parents[0].id]
+    return "\n\n".join(f"### {p.name}\n{outputs[p.id]}" for p in parents)
+
+
+async def _load_reusable_outputs(run: Run, db: AsyncSession) -> dict[UUID, StepOutput]:
+    """Successful StepOutputs of the run being resumed, by step_id (empty for a fresh run)."""
+    if not run.resumed_from_run_id:
+        return {}
+    result = await db.execute(
+        select(StepOutput).where(
+            StepOutput.run_id == run.resumed_from_run_id,
+            StepOutput.error_message.is_(None),
+        )
+    )
+    return {so.step_id: so for so in result.scalars().all()}
+
+
+@dataclass
+class _StepResult:
+    step: PlanStep
+    index: int
+    input_text: str
+    output_text: str
+    error: Optional[str]
+    duration_ms: float
+    fingerprint: str
+    cached: bool = False
+    reused: bool = False
+    retries: int = 0
+    throttle_wait_ms: float = 0.0
+
+
+async def _run_step(
     run_id: UUID,
-    input_text: str,
-    db: AsyncSession,
-) -> None:
+    step: PlanStep,
+    step_input: str,
+    previous: Optional[StepOutput],
+    use_cache: bool,
+    coalesce: bool,
+) -> _StepResult:
+    """_produce_step in a "step" span carrying step_id, so the LLM, cache and DB spans below it do too."""
+    attributes = {"step_id": str(step.id), "step_name": step.name, "step_type": step.step_type, "index": step.index}
+    if step.operation is not None:
+        attributes["operation"] = step.operation
+    with tracing.span("step", **attributes) as span:
+        res = await _produce_step(run_id, step, step_input, previous, use_cache, coalesce)
+        span.set_attribute("cached", res.cached)
+        span.set_attribute("reused", res.reused)
+        span.set_attribute("retries", res.retries)
+        if res.error:
+            span.record_error(res.error)
+    return res
+
+
+async def _produce_step(
+    run_id: UUID,
+    step: PlanStep,
+    step_input: str,
+    previous: Optional[StepOutput],
+    use_cache: bool,
+    coalesce: bool,
+) -> _StepResult:
     """
-    Load run and workflow, set status to running, execute steps in order via LLM,
-    persist each StepOutput, then set status to completed or failed.
+    Produce one step's output: copy `previous` (resumed run) if it is still valid, else apply the step's
+    local operation, else serve it from the step cache, else call the LLM (sharing identical in-flight calls
+    when coalesce is set). Touches no DB session, so several steps can run at once.
     """
+    t0 = time.perf_counter()
+    index, fingerprint = step.index, step.fingerprint
+    if _reusable(previous, step, step_input):
+        return _StepResult(step, index, step_input, previous.output_text, None, 0.0, fingerprint, reused=True)
+
+    if step.operation is not None:  # cheaper than a step cache lookup, so never cached
+        output_text, err = await local_steps.execute(step.operation, step.operation_config, step_input)
+        duration_ms = (time.perf_counter() - t0) * 1000
+        return _StepResult(step, index, step_input, output_text, err, duration_ms, fingerprint)
+
+    cache_key = step_cache.step_cache_key(fingerprint, step_input) if use_cache else None
+    cached_output = await step_cache.get_cached_output(cache_key) if cache_key else None
+    stats = CallStats()
+    if cached_output is not None:
+        output_text, err = cached_output, None
+    else:
+        # Streamed LLM text goes to run stream subscribers in batches
+        deltas = run_events.DeltaBuffer(run_id, step.id, index) if settings.llm_streaming else None
+        output_text, err = await execute_plan_step(
+            step,
+            step_input,
+            on_chunk=deltas.add if deltas else None,
+            stats=stats,
+            coalesce=coalesce,
+        )
+        if deltas:
+            await deltas.flush()
+        if cache_key and not err:
+            await step_cache.set_cached_output(cache_key, output_text)
+    duration_ms = (time.perf_counter() - t0) * 1000
+    return _StepResult(
+        step,
+        index,
+        step_input,
+        output_text,
+        err,
+        duration_ms,
+        fingerprint,
+        cached=cached_output is not None,
+        retries=stats.retries,
+        throttle_wait_ms=stats.throttle_wait_ms,
+    )
+
+
+def _reusable(previous: Optional[StepOutput], step: PlanStep, step_input: str) -> bool:
+    """True if the resumed run's output of step is still valid: same step definition and same input."""
+    return (
+        previous is not None
+        and previous.fingerprint == step.fingerprint
+        and previous.input_hash == text_hash(step_input)
+    )
+
+
+async def _run_fused(
+    run_id: UUID,
+    group: tuple[PlanStep, ...],
+    step_input: str,
+    previous: Optional[StepOutput],
+    use_cache: bool,
+    coalesce: bool,
+) -> list[_StepResult]:
+    """
+    Produce a fusion group's outputs with one LLM call. The first step runs on its own when it would not
+    call the LLM anyway (valid previous output, step cache hit) or its input needs chunking, and also when
+    the fused call fails or its response cannot be split; its children are then scheduled as usual.
+    Fused outputs are cached as one entry under the chain's step_cache.fused_fingerprint, not per step.
+    Each step gets an equal share of the call's duration; retries and throttle wait go to the first.
+    """
+    head = group[0]
+    solo = _reusable(previous, head, step_input) or 0 < settings.llm_chunk_max_chars < len(step_input)
+    if not solo and use_cache:
+        solo = await step_cache.get_cached_output(step_cache.step_cache_key(head.fingerprint, step_input)) is not None
+    if solo:
+        return [await _run_step(run_id, head, step_input, previous, use_cache, coalesce)]
+
+    t0 = time.perf_counter()
+    stats = CallStats()
+    cache_key = None
+    if use_cache:
+        fingerprint = step_cache.fused_fingerprint([s.fingerprint for s in group])
+        cache_key = step_cache.step_cache_key(fingerprint, step_input)
+    cached_output = await step_cache.get_cached_output(cache_key) if cache_key else None
+    outputs, err = (json.loads(cached_output), None) if cached_output is not None else (None, None)
+    if outputs is None:
+        attributes = {"steps": len(group), "step_ids": ",".join(str(s.id) for s in group)}
+        with tracing.span("steps.fused", **attributes) as span:
+            outputs, err = await prompt_fusion.execute_fused(group, step_input, stats=stats, coalesce=coalesce)
+            span.set_attribute("outcome", "fallback" if err else "fused")
+        if cache_key and not err:
+            await step_cache.set_cached_output(cache_key, json.dumps(outputs, ensure_ascii=False))
+    if err:
+        metrics.llm_fused_steps.labels("fallback").inc(len(group))
+        logger.warning(
+            "Fused call for %d steps from %r failed, running them one by one: %s", len(group), head.name, err
+        )
+        return [await _run_step(run_id, head, step_input, previous, use_cache, coalesce)]
+
+    metrics.llm_fused_steps.labels("fused").inc(len(group))
+    share_ms = (time.perf_counter() - t0) * 1000 / len(group)
+    inputs = [step_input] + outputs[:-1]
+    results = []
+    for i, (step, step_in, output_text) in enumerate(zip(group, inputs, outputs)):
+        if i:
+            await run_events.publish(
+                run_id, "step_started", step_id=str(step.id), step_name=step.name, index=step.index
+            )
+        results.append(
+            _StepResult(
+                step,
+                step.index,
+                step_in,
+                output_text,
+                None,
+                share_ms,
+                step.fingerprint,
+                cached=cached_output is not None,
+                retries=stats.retries if i == 0 else 0,
+                throttle_wait_ms=stats.throttle_wait_ms if i == 0 else 0.0,
+            )
+        )
+    return results
+
+
+async def _persist_result(run_id: UUID, res: _StepResult, db: AsyncSession, stored: set[str]) -> None:
+    """Commit the StepOutput for a finished step and publish step_completed. `stored`: text hashes already saved."""
+    output_text = res.output_text or (res.error or "")
+    input_hash, output_hash = await store_texts([res.input_text, output_text], db, known=stored)
+    step_output = StepOutput(
+        id=uuid.uuid4(),
+        run_id=run_id,
+        step_id=res.step.id,
+        input_hash=input_hash,
+        output_hash=output_hash,
+        duration_ms=round(res.duration_ms, 2),
+        cached=res.cached,
+        reused=res.reused,
+        retries=res.retries,
+        throttle_wait_ms=round(res.throttle_wait_ms, 2),
+        error_message=res.error,
+        fingerprint=res.fingerprint,
+    )
+    db.add(step_output)
+    await db.commit()
+    preview, truncated = run_events.truncate_text(output_text)
+    await run_events.publish(
+        run_id,
+        "step_completed",
+        step_id=str(res.step.id),
+        step_output_id=str(step_output.id),
+        index=res.index,
+        duration_ms=step_output.duration_ms,
+        output_text=preview,
+        output_truncated=truncated,
+        cached=res.cached,
+        reused=res.reused,
+        error=res.error,
+    )
+
+
+async def heartbeat(*criteria) -> None:
+    """
+    Refresh heartbeat_at of the runs matching criteria every RUN_QUEUE_HEARTBEAT_SECONDS until cancelled, so
+    the stale run sweep (tasks/workflow_executor.py fail_stale_runs) leaves them alone.
+    """
+    while True:
+        await asyncio.sleep(settings.run_queue_heartbeat_seconds)
+        try:
+            async with async_session_factory() as db:
+                await db.execute(
+                    update(Run)
+                    .where(*criteria)
+                    .values(heartbeat_at=datetime.now(timezone.utc))
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+        except Exception as e:
+            logger.warning("Run heartbeat failed: %s", e)
+
+
+async def execute_workflow(run_id: UUID, db: AsyncSession) -> None:
+    """
+    Load the run and its workflow's execution plan, set status to running, execute steps via LLM as soon as
+    all their upstream steps have finished (independent branches run concurrently), persist each StepOutput,
+    then set status to completed or failed. After a failed step no new steps start; steps already running
+    are finished and saved.
+    For a resumed run, a step copies the earlier run's output when every upstream step was copied too and it
+    is unchanged (same fingerprint, same input, succeeded before, not at or after rerun_from_step_id); the LLM
+    is called from the first divergent step on.
+    While the run executes, its heartbeat_at is refreshed (heartbeat).
+    """
+    metrics.runs_in_flight.inc()
+    beat = asyncio.create_task(heartbeat(Run.id == run_id, Run.status == "running"))
+    try:
+        with tracing.span("run.execute", run_id=str(run_id)):
+            await _execute_workflow(run_id, db)
+    finally:
+        beat.cancel()
+        metrics.runs_in_flight.dec()
+
+
+async def _execute_workflow(run_id: UUID, db: AsyncSession) -> None:
     result = await db.execute(
-        select(Run)
-        .where(Run.id == run_id)
-        .options(selectinload(Run.workflow).selectinload(Workflow.steps), selectinload(Run.workflow).selectinload(Workflow.edges))
+        select(Run, Workflow.version).join(Workflow, Run.workflow_id == Workflow.id).where(Run.id == run_id)
     )
-    run = result.scalar_one_or_none()
-    if not run or not run.workflow:
+    row = result.first()
+    if row is None:
+        return
+    run, version = row
+    input_text = run.input_text
+    plan = await get_plan(run.workflow_id, version, db)
+    if plan is None:
+        return
+    if not plan.valid:
+        # The workflow was edited into an invalid graph after this run was queued
+        run.status = "failed"
+        run.error_message = "Workflow is invalid: " + " ".join(plan.errors)
+        run.completed_at = datetime.now(timezone.utc)
+        await db.commit()
+        await run_events.publish(run_id, run_events.TERMINAL_EVENT, status=run.status, error_message=run.error_message)
         return
 
-    workflow = run.workflow
-    steps_ordered = get_steps_in_execution_order(workflow.steps, workflow.edges)
+    steps_by_id = {s.id: s for s in plan.steps}
+    fusion = prompt_fusion.fusion_groups(plan) if settings.llm_prompt_fusion else {}
+    use_cache = settings.step_cache_enabled and plan.cache_step_outputs
+    coalesce = plan.cache_step_outputs  # non-deterministic workflows want a fresh call per run
+    stored_texts = {run.input_hash}
+    previous_outputs = await _load_reusable_outputs(run, db)
+    forced = plan.descendants(run.rerun_from_step_id) if run.rerun_from_step_id else set()
 
     run.status = "running"
     await db.commit()
+    await run_events.publish(run_id, "run_started", step_ids=[str(s.id) for s in plan.steps])
 
-    current_text = input_text
+    results: dict[UUID, _StepResult] = {}
+    running: dict[asyncio.Task, UUID] = {}
+    failed: Optional[_StepResult] = None
     try:
-        for step in steps_ordered:
-            step_input = current_text
-            t0 = time.perf_counter()
-            output_text, err = llm_execute_step(
-                step.name,
-                step.description or "",
-                step_input,
-                step.step_type,
-            )
-            duration_ms = (time.perf_counter() - t0) * 1000
-
-            if err:
-                run.status = "failed"
-                run.error_message = f"Step '{step.name}': {err}"
-                output_text = output_text or err
-            else:
-                current_text = output_text
-
-            step_output = StepOutput(
-                run_id=run_id,
-                step_id=step.id,
-                input_text=step_input,
-                output_text=output_text,
-                duration_ms=round(duration_ms, 2),
-            )
-            db.add(step_output)
-
-            if err:
+        while True:
+            if failed is None:
+                for step in plan.steps:
+                    if step.id in results or step.id in running.values():
+                        continue
+                    if any(p not in results for p in step.parent_ids):
+                        continue
+                    step_parents = [steps_by_id[p] for p in step.parent_ids]
+                    if step_parents:
+                        step_input = merge_upstream_outputs(
+                            step_parents, {p.id: results[p.id].output_text for p in step_parents}
+                        )
+                    else:
+                        step_input = input_text
+                    can_reuse = step.id not in forced and all(results[p].reused for p in step.parent_ids)
+                    previous = previous_outputs.get(step.id) if can_reuse else None
+                    await run_events.publish(
+                        run_id, "step_started", step_id=str(step.id), step_name=step.name, index=step.index
+                    )
+                    if step.id in fusion:
+                        work = _run_fused(run_id, fusion[step.id], step_input, previous, use_cache, coalesce)
+                    else:
+                        work = _run_step(run_id, step, step_input, previous, use_cache, coalesce)
+                    running[asyncio.create_task(work)] = step.id
+            if not running:
                 break
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=lambda t: steps_by_id[running[t]].index):
+                running.pop(task)
+                outcome = task.result()
+                for res in outcome if isinstance(outcome, list) else [outcome]:
+                    results[res.step.id] = res
+                    await _persist_result(run_id, res, db, stored_texts)
+                    if res.error and failed is None:
+                        failed = res
+
+        if failed is not None:
+            status, error_message = "failed", f"Step '{failed.step.name}': {failed.error}"
         else:
-            run.status = "completed"
+            status, error_message = "completed", None
     except Exception as e:
-        run.status = "failed"
-        run.error_message = str(e)
+        for task in running:
+            task.cancel()
+        status, error_message = "failed", str(e)
 
-    run.completed_at = datetime.now(timezone.utc)
+    # Only a run still marked running is finished here: one that fail_stale_runs (tasks/workflow_executor.py)
+    # already marked failed keeps that status
+    result = await db.execute(
+        update(Run)
+        .where(Run.id == run_id, Run.status == "running")
+        .values(status=status, error_message=error_message, completed_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    )
     await db.commit()
+    if not result.rowcount:
+        logger.warning("Run %s was no longer running when it finished; kept its status", run_id)
     await db.refresh(run)
+    await run_events.publish(run_id, run_events.TERMINAL_EVENT, status=run.status, error_message=run.error_message)
@@ -0,0 +1,187 @@
+"""
+Postgres-backed run queue. POST .../run (queue mode) inserts a pending Run; workers claim runs with
+UPDATE ... WHERE id = (SELECT ... FOR UPDATE SKIP LOCKED) so any number of workers, on any number of
+nodes, can share the runs table without a broker and without claiming the same run twice. While a run
+executes, runs.heartbeat_at is refreshed (services/workflow_executor.py heartbeat); workers, and the API in
+inline mode, periodically mark runs whose heartbeat stopped as failed (fail_stale_runs).
+
+Start standalone workers with:
+    python -m app.tasks.workflow_executor --processes 4 --concurrency 4
+or set RUN_QUEUE_EMBEDDED_WORKERS to run worker loops inside the API process.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import signal
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import func, select, update
+
+from app.core import tracing
+from app.core.config import settings
+from app.db.session import async_session_factory
+from app.models import Run
+from app.services.workflow_executor import execute_workflow
+
+logger = logging.getLogger(__name__)
+
+STALE_RUN_ERROR = "Run was abandoned (the process executing it stopped before the run finished)."
+
+
+async def claim_next_run() -> Optional[UUID]:
+    """Atomically move the oldest pending run to running. Returns its id, or None if the queue is empty."""
+    next_pending = (
+        select(Run.id)
+        .where(Run.status == "pending")
+        .order_by(Run.started_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    now = datetime.now(timezone.utc)
+    async with async_session_factory() as db:
+        result = await db.execute(
+            update(Run)
+            .where(Run.id == next_pending)
+            .values(status="running", claimed_at=now, heartbeat_at=now)
+            .returning(Run.id)
+            .execution_options(synchronize_session=False)
+        )
+        run_id = result.scalar_one_or_none()
+        await db.commit()
+    return run_id
+
+
+async def fail_stale_runs() -> int:
+    """
+    Mark runs whose executing process died (no heartbeat for RUN_QUEUE_STALE_AFTER_SECONDS) as failed:
+    running runs, and in inline mode also pending ones (batch runs an API process had not started yet; no
+    queue worker will claim them). Returns how many were updated.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.run_queue_stale_after_seconds)
+    last_seen = func.coalesce(Run.heartbeat_at, Run.claimed_at, Run.started_at)
+    stale = Run.status == "running"
+    if settings.run_execution_mode != "queue":
+        stale = Run.status.in_(("pending", "running"))
+    async with async_session_factory() as db:
+        result = await db.execute(
+            update(Run)
+            .where(stale, last_seen < cutoff)
+            .values(status="failed", error_message=STALE_RUN_ERROR, completed_at=datetime.now(timezone.utc))
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+    return result.rowcount or 0
+
+
+async def sweep_stale_runs(stop: asyncio.Event) -> None:
+    """Run fail_stale_runs now and every RUN_QUEUE_STALE_CHECK_INTERVAL until stop is set."""
+    while not stop.is_set():
+        try:
+            stale = await fail_stale_runs()
+            if stale:
+                logger.warning("Marked %d stale run(s) as failed", stale)
+        except Exception as e:
+            logger.warning("Stale run check failed: %s", e)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.run_queue_stale_check_interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _execute_claimed(run_id: UUID) -> None:
+    try:
+        async with async_session_factory() as db:
+            await execute_workflow(run_id, db)
+    except Exception:
+        logger.exception("Queued run %s crashed", run_id)
+
+
+async def run_worker(concurrency: int, stop: asyncio.Event) -> None:
+    """
+    Claim and execute runs until stop is set, keeping up to `concurrency` runs in flight.
+    Sleeps RUN_QUEUE_POLL_INTERVAL when the queue is empty; in-flight runs are awaited on shutdown.
+    """
+    concurrency = max(1, concurrency)
+    in_flight: set[asyncio.Task] = set()
+    sweeper = asyncio.create_task(sweep_stale_runs(stop))
+
+    while not stop.is_set():
+        claimed = None
+        if len(in_flight) < concurrency:
+            try:
+                claimed = await claim_next_run()
+            except Exception as e:
+                logger.warning("Run queue claim failed: %s", e)
+        if claimed:
+            task = asyncio.create_task(_execute_claimed(claimed))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+            continue  # more work may be waiting; claim again without sleeping
+        if len(in_flight) >= concurrency:
+            await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            continue
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.run_queue_poll_interval)
+        except asyncio.TimeoutError:
+            pass
+
+    if in_flight:
+        await asyncio.gather(*in_flight, return_exceptions=True)
+    await sweeper
+
+
+async def _serve(concurrency: int) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # pragma: no cover - Windows
+            pass
+    try:
+        await run_worker(concurrency, stop)
+    finally:
+        tracing.shutdown()
+
+
+def _process_main(concurrency: int) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s [%(processName)s] %(message)s")
+    asyncio.run(_serve(concurrency))
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run queue workers for Workflow Builder Lite.")
+    parser.add_argument("--processes", type=int, default=multiprocessing.cpu_count(), help="worker processes")
+    parser.add_argument(
+        "--concurrency", type=int, default=settings.run_queue_concurrency, help="runs in flight per process"
+    )
+    args = parser.parse_args(argv)
+
+    if args.processes <= 1:
+        _process_main(args.concurrency)
+        return
+    ctx = multiprocessing.get_context("spawn")
+    procs = [
+        ctx.Process(target=_process_main, args=(args.concurrency,), name=f"run-worker-{i}")
+        for i in range(args.processes)
+    ]
+    for p in procs:
+        p.start()
+    # Forward SIGTERM so each worker finishes its in-flight runs before exiting
+    signal.signal(signal.SIGTERM, lambda *_: [p.terminate() for p in procs if p.is_alive()])
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        for p in procs:
+            p.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+"""
+End-to-end benchmarks: drive the FastAPI app in-process (httpx ASGITransport) against the configured Postgres
+with the local simulated LLM provider, and write a JSON report. Run from backend/: python -m benchmarks.run
+"""
@@ -0,0 +1,90 @@
+"""Timing helpers and the JSON report shared by the benchmark scenarios."""
+from __future__ import annotations
+
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+
+def summarize(samples_ms: list[float]) -> dict:
+    """Latency distribution of samples in milliseconds."""
+    if not samples_ms:
+        return {"count": 0}
+    ordered = sorted(samples_ms)
+
+    def pct(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))], 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "min_ms": round(ordered[0], 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+async def measure(
+    call: Callable[[int], Awaitable[Any]],
+    iterations: int,
+    warmup: int = 0,
+    before: Optional[Callable[[int], Awaitable[Any]]] = None,
+) -> dict:
+    """
+    Await call(i) iterations times, one at a time, and summarize the latencies. `before(i)` runs untimed ahead
+    of each call (e.g. to evict a cache entry); warmup calls are not recorded.
+    """
+    samples: list[float] = []
+    for i in range(warmup + iterations):
+        if before is not None:
+            await before(i)
+        t0 = time.perf_counter()
+        await call(i)
+        if i >= warmup:
+            samples.append((time.perf_counter() - t0) * 1000)
+    total_s = sum(samples) / 1000
+    return {**summarize(samples), "ops_per_sec": round(len(samples) / total_s, 2) if total_s else None}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            timeout=5,
+            cwd=Path(__file__).resolve().parent,
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+class Report:
+    """Benchmark results keyed by scenario, plus the environment they were measured in."""
+
+    def __init__(self, config: dict):
+        self.meta = {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "config": config,
+        }
+        self.results: dict[str, Any] = {}
+
+    def add(self, scenario: str, result: Any) -> None:
+        self.results[scenario] = result
+
+    def write(self, path: Path) -> None:
+        self.meta["finished_at"] = datetime.now(timezone.utc).isoformat()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"meta": self.meta, "results": self.results}, indent=2) + "\n")
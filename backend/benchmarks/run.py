@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Run the benchmark suite and write a JSON report.
+
+  From backend dir:   python -m benchmarks.run [--scenarios workflow_crud,run_throughput] [--output report.json]
+
+Uses DATABASE_URL (apply migrations first) and, unless overridden in the environment, the local simulated LLM
+(LLM_PROVIDER=local, LOCAL_LLM_LATENCY_MS=20, spread a quarter of that). Rows created by the benchmark are
+deleted at the end (--keep to leave them). The Redis backend is whatever REDIS_BACKEND configures (memory is
+handy locally).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+SCENARIOS = ("workflow_crud", "workflow_get", "run_throughput", "list_runs")
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of " + ", ".join(SCENARIOS)
+    )
+    parser.add_argument("--output", type=Path, default=Path("benchmark-report.json"))
+    parser.add_argument("--iterations", type=int, default=200, help="requests per latency measurement")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4, 16, 64], help="run_throughput levels")
+    parser.add_argument("--runs-per-level", type=int, default=200)
+    parser.add_argument("--list-rows", type=_int_list, default=[10_000, 100_000], help="list_runs history sizes")
+    parser.add_argument("--llm-latency-ms", type=float, default=20.0, help="local LLM latency unless set in env")
+    parser.add_argument("--keep", action="store_true", help="do not delete benchmark data afterwards")
+    return parser.parse_args()
+
+
+def _configure_env(args: argparse.Namespace) -> None:
+    """Benchmark defaults; must run before app modules read Settings."""
+    os.environ.setdefault("LLM_PROVIDER", "local")
+    os.environ.setdefault("LOCAL_LLM_LATENCY_MS", str(args.llm_latency_ms))
+    os.environ.setdefault("LOCAL_LLM_LATENCY_SPREAD_MS", str(args.llm_latency_ms / 4))
+    os.environ.setdefault("LOCAL_LLM_ERROR_RATE", "0")
+    os.environ.setdefault("RUN_EXECUTION_MODE", "inline")
+    os.environ.setdefault("LLM_STREAMING", "false")
+
+
+async def _cleanup(browser_ids: list[str]) -> None:
+    from sqlalchemy import delete
+
+    from app.db.session import async_session_factory
+    from app.models import Workflow
+    from app.services.text_store import prune_unreferenced_blobs
+
+    async with async_session_factory() as db:
+        await db.execute(delete(Workflow).where(Workflow.browser_id.in_(browser_ids)))
+        await db.commit()
+        await prune_unreferenced_blobs(db)
+
+
+async def _main(args: argparse.Namespace) -> int:
+    import httpx
+
+    from app.core.config import settings
+    from app.db.session import engine
+    from app.main import app
+    from benchmarks import scenarios
+    from benchmarks.harness import Report
+
+    selected = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in selected if s not in SCENARIOS]
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    report = Report(
+        {
+            "scenarios": selected,
+            "iterations": args.iterations,
+            "llm_provider": settings.llm_provider,
+            "local_llm_latency_ms": settings.local_llm_latency_ms,
+            "local_llm_latency_spread_ms": settings.local_llm_latency_spread_ms,
+            "local_llm_latency_distribution": settings.local_llm_latency_distribution,
+            "llm_max_concurrency": settings.llm_max_concurrency,
+            "redis_backend": settings.redis_backend,
+            "step_cache_enabled": settings.step_cache_enabled,
+            "workflow_cache_local_max_entries": settings.workflow_cache_local_max_entries,
+            "db_pool_size": engine.pool.size(),
+        }
+    )
+    browser_ids: list[str] = []
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for name in selected:
+                print(f"{name} ...", flush=True)
+                t0 = time.perf_counter()
+                if name == "workflow_crud":
+                    result = await scenarios.workflow_crud(client, args.iterations, browser_ids)
+                elif name == "workflow_get":
+                    result = await scenarios.workflow_get(client, args.iterations, browser_ids)
+                elif name == "run_throughput":
+                    result = await scenarios.run_throughput(client, args.runs_per_level, args.concurrency, browser_ids)
+                else:
+                    result = await scenarios.list_runs(client, args.list_rows, args.iterations, browser_ids)
+                report.add(name, result)
+                print(f"{name} done in {time.perf_counter() - t0:.1f}s", flush=True)
+    finally:
+        if browser_ids and not args.keep:
+            await _cleanup(browser_ids)
+        report.write(args.output)
+        await engine.dispose()
+    print(f"Report written to {args.output}")
+    return 0
+
+
+def main() -> int:
+    args = _parse_args()
+    _configure_env(args)
+    # So "app" and "benchmarks" resolve when run as benchmarks/run.py from backend/
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    return asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
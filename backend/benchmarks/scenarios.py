@@ -0,0 +1,235 @@
+"""
+Benchmark scenarios. Each takes an httpx client bound to the app and returns a JSON-serializable result.
+Every scenario uses its own browser ID, so their workflows and runs never mix; run.py deletes them afterwards.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import httpx
+from sqlalchemy import insert
+
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.db.session import async_session_factory
+from app.models import Run
+from app.services.cache import invalidate_workflow
+from app.services.text_store import store_text
+
+from benchmarks.harness import measure, summarize
+
+API = "/api"
+SEED_BATCH_ROWS = 5000
+
+
+def new_browser_id() -> str:
+    return str(uuid.uuid4())
+
+
+def workflow_body(n_steps: int = 3, name: str = "bench") -> dict:
+    """A linear START → NORMAL… → END workflow of n_steps steps."""
+    steps = [
+        {
+            "name": f"step {i}",
+            "description": "Convert to uppercase" if 0 < i < n_steps - 1 else "",
+            "step_type": "START" if i == 0 else ("END" if i == n_steps - 1 else "NORMAL"),
+            "position": {"x": 200 * i, "y": 0},
+        }
+        for i in range(n_steps)
+    ]
+    edges = [{"source_index": i, "target_index": i + 1} for i in range(n_steps - 1)]
+    return {"name": name, "description": "benchmark", "steps": steps, "edges": edges}
+
+
+async def _create_workflow(client: httpx.AsyncClient, browser_id: str, n_steps: int = 3) -> dict:
+    r = await client.post(f"{API}/workflows", json=workflow_body(n_steps), headers={"X-Browser-ID": browser_id})
+    r.raise_for_status()
+    return r.json()
+
+
+def _check(r: httpx.Response) -> None:
+    if r.status_code >= 400:
+        raise RuntimeError(f"{r.request.method} {r.request.url.path} -> {r.status_code}: {r.text[:200]}")
+
+
+async def workflow_crud(client: httpx.AsyncClient, iterations: int, browser_ids: list[str]) -> dict:
+    """POST /workflows, PATCH name only and PATCH with a full graph replace."""
+    browser_id = new_browser_id()
+    browser_ids.append(browser_id)
+    headers = {"X-Browser-ID": browser_id}
+    created: list[str] = []
+
+    async def create(i: int) -> None:
+        r = await client.post(f"{API}/workflows", json=workflow_body(5, f"bench {i}"), headers=headers)
+        _check(r)
+        created.append(r.json()["id"])
+
+    result = {"create_5_steps": await measure(create, iterations, warmup=min(5, iterations))}
+    workflow_id = created[0]
+
+    async def rename(i: int) -> None:
+        _check(await client.patch(f"{API}/workflows/{workflow_id}", json={"name": f"renamed {i}"}, headers=headers))
+
+    async def replace_graph(i: int) -> None:
+        body = workflow_body(5 + i % 3)
+        r = await client.patch(
+            f"{API}/workflows/{workflow_id}", json={"steps": body["steps"], "edges": body["edges"]}, headers=headers
+        )
+        _check(r)
+
+    result["update_name"] = await measure(rename, iterations, warmup=min(5, iterations))
+    result["update_graph"] = await measure(replace_graph, iterations, warmup=min(5, iterations))
+    return result
+
+
+async def workflow_get(client: httpx.AsyncClient, iterations: int, browser_ids: list[str]) -> dict:
+    """GET /workflows/{id} served from the workflow cache, after an eviction, and as a 304 revalidation."""
+    browser_id = new_browser_id()
+    browser_ids.append(browser_id)
+    headers = {"X-Browser-ID": browser_id}
+    workflow = await _create_workflow(client, browser_id, n_steps=10)
+    url = f"{API}/workflows/{workflow['id']}"
+    etag: Optional[str] = None
+
+    async def get(i: int) -> None:
+        nonlocal etag
+        r = await client.get(url, headers=headers)
+        _check(r)
+        etag = r.headers.get("ETag")
+
+    async def evict(i: int) -> None:
+        await invalidate_workflow(uuid.UUID(workflow["id"]))
+
+    async def revalidate(i: int) -> None:
+        r = await client.get(url, headers={**headers, "If-None-Match": etag or ""})
+        if r.status_code != 304:
+            raise RuntimeError(f"expected 304, got {r.status_code}")
+
+    result = {"cache_hit": await measure(get, iterations, warmup=1)}
+    result["cache_miss"] = await measure(get, iterations, before=evict)
+    await get(0)
+    result["not_modified"] = await measure(revalidate, iterations)
+    return result
+
+
+async def run_throughput(
+    client: httpx.AsyncClient,
+    runs_per_level: int,
+    concurrency_levels: list[int],
+    browser_ids: list[str],
+) -> dict:
+    """
+    Inline runs of a 3-step workflow (POST .../run returns when the run has finished) with `concurrency`
+    requests in flight. Inputs are unique, so neither the step cache nor call coalescing short-cuts the LLM.
+    """
+    browser_id = new_browser_id()
+    browser_ids.append(browser_id)
+    headers = {"X-Browser-ID": browser_id}
+    workflow = await _create_workflow(client, browser_id, n_steps=3)
+    url = f"{API}/runs/workflows/{workflow['id']}/run"
+    levels = []
+    for concurrency in concurrency_levels:
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies: list[float] = []
+        failed = 0
+
+        async def one(i: int) -> None:
+            nonlocal failed
+            async with semaphore:
+                t0 = time.perf_counter()
+                body = {"input_text": f"benchmark input {concurrency}-{i} {uuid.uuid4()}"}
+                r = await client.post(url, json=body, headers=headers)
+                latencies.append((time.perf_counter() - t0) * 1000)
+                if r.status_code >= 400 or r.json().get("status") != "completed":
+                    failed += 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(runs_per_level)))
+        elapsed = time.perf_counter() - t0
+        levels.append(
+            {
+                "concurrency": concurrency,
+                "runs": runs_per_level,
+                "failed": failed,
+                "elapsed_s": round(elapsed, 3),
+                "runs_per_sec": round(runs_per_level / elapsed, 2),
+                "latency": summarize(latencies),
+            }
+        )
+    return {"steps_per_run": 3, "levels": levels}
+
+
+async def _seed_runs(workflow_id: uuid.UUID, browser_id: str, count: int, offset: int) -> None:
+    """Insert `count` completed runs directly (one shared input blob), one second apart, older than `offset` runs."""
+    now = datetime.now(timezone.utc)
+    async with async_session_factory() as db:
+        input_hash = await store_text("benchmark seeded run input", db)
+        for start in range(0, count, SEED_BATCH_ROWS):
+            rows = [
+                {
+                    "id": uuid.uuid4(),
+                    "workflow_id": workflow_id,
+                    "browser_id": browser_id,
+                    "input_hash": input_hash,
+                    "status": "completed",
+                    "started_at": now - timedelta(seconds=offset + i),
+                    "completed_at": now - timedelta(seconds=offset + i) + timedelta(milliseconds=500),
+                }
+                for i in range(start, min(count, start + SEED_BATCH_ROWS))
+            ]
+            await db.execute(insert(Run), rows)
+        await db.commit()
+
+
+async def list_runs(
+    client: httpx.AsyncClient,
+    row_counts: list[int],
+    iterations: int,
+    browser_ids: list[str],
+    deep_pages: int = 50,
+) -> dict:
+    """
+    GET /runs (per browser) and /runs/workflows/{id}/runs with the history grown to each row count: the first
+    page, and pages reached by following X-Next-Cursor deep_pages times.
+    """
+    browser_id = new_browser_id()
+    browser_ids.append(browser_id)
+    headers = {"X-Browser-ID": browser_id}
+    workflow = await _create_workflow(client, browser_id, n_steps=3)
+    workflow_id = uuid.UUID(workflow["id"])
+    seeded = 0
+    levels = []
+    for rows in sorted(row_counts):
+        t0 = time.perf_counter()
+        await _seed_runs(workflow_id, browser_id, rows - seeded, seeded)
+        seed_s = time.perf_counter() - t0
+        seeded = rows
+
+        async def first_page(i: int) -> None:
+            _check(await client.get(f"{API}/runs", params={"limit": 50}, headers=headers))
+
+        async def workflow_first_page(i: int) -> None:
+            _check(await client.get(f"{API}/runs/workflows/{workflow_id}/runs", params={"limit": 50}, headers=headers))
+
+        cursor: Optional[str] = None
+
+        async def next_page(i: int) -> None:
+            nonlocal cursor
+            params = {"limit": 50, **({"cursor": cursor} if cursor else {})}
+            r = await client.get(f"{API}/runs", params=params, headers=headers)
+            _check(r)
+            cursor = r.headers.get(NEXT_CURSOR_HEADER)
+
+        levels.append(
+            {
+                "rows": rows,
+                "seed_s": round(seed_s, 2),
+                "first_page": await measure(first_page, iterations, warmup=3),
+                "workflow_first_page": await measure(workflow_first_page, iterations, warmup=3),
+                "cursor_pages": await measure(next_page, min(deep_pages, rows // 50)),
+            }
+        )
+    return {"page_size": 50, "levels": levels}
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Delete stored texts (text_blobs) that no run or step output references any more, e.g. after workflows
+or runs were deleted. Run it periodically (e.g. a nightly cron job), preferably at a quiet time: a run created
+at the same instant as its input text is pruned fails and has to be retried.
+
+  From backend dir:   python scripts/prune_text_blobs.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# Ensure backend is on path when run from project root
+backend = Path(__file__).resolve().parent.parent
+if str(backend) not in sys.path:
+    sys.path.insert(0, str(backend))
+
+
+async def main():
+    from app.db.session import async_session_factory
+    from app.services.text_store import prune_unreferenced_blobs
+
+    async with async_session_factory() as db:
+        deleted = await prune_unreferenced_blobs(db)
+    print(f"Deleted {deleted} unreferenced text blob(s)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,25 @@
+"""Local step operations (app/services/local_steps.py). Run from backend/: python -m pytest tests"""
+import asyncio
+import time
+
+from app.services import local_steps
+
+
+def _strip_pii(text: str) -> tuple[str, object]:
+    config = local_steps.validate_config("strip_pii", None)
+    return asyncio.run(local_steps.execute("strip_pii", config, text))
+
+
+def test_strip_pii_masks_email():
+    output, err = _strip_pii("Write to john.doe+x@example.co.uk today")
+    assert err is None
+    assert "example.co.uk" not in output
+
+
+def test_strip_pii_long_token_without_at_is_fast():
+    # The email pattern used to backtrack quadratically here (~1s for 20k characters)
+    for text in ("a" * 50_000, "a." * 25_000, "x@" + "a" * 50_000):
+        started = time.perf_counter()
+        output, err = _strip_pii(text)
+        assert err is None and output == text
+        assert time.perf_counter() - started < 0.5
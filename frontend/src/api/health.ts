@@ -6,6 +6,8 @@ export interface HealthResponse {
   backend_response_time_ms: number;
   redis?: string;
   llm?: string;
+  database_latency_ms?: number | null;
+  checked_at?: string | null;
 }
 
 export async function fetchHealth(): Promise<HealthResponse> {
@@ -1,4 +1,4 @@
-import { apiFetch } from "./client";
+import { apiFetch, apiUrl } from "./client";
 import type { Run, RunCreated, RunListItem } from "@/types/run";
 
 export async function createRun(
@@ -18,6 +18,24 @@ export async function createRun(
   return res.json();
 }
 
+/** Re-run with the same input, reusing unchanged step outputs; fromStepId forces re-execution from that step. */
+export async function resumeRun(
+  runId: string,
+  browserId: string,
+  fromStepId?: string
+): Promise<RunCreated> {
+  const res = await apiFetch(`/runs/${runId}/resume`, {
+    method: "POST",
+    body: JSON.stringify({ from_step_id: fromStepId ?? null }),
+  }, browserId);
+  if (!res.ok) {
+    const err = await res.json().catch(() => ({}));
+    const msg = Array.isArray(err.detail) ? err.detail.join(" ") : err.detail ?? "Failed to resume run";
+    throw new Error(msg);
+  }
+  return res.json();
+}
+
 export async function fetchRuns(
   browserId: string,
   limit = 20
@@ -36,3 +54,26 @@ export async function fetchRun(
   if (!res.ok) throw new Error("Failed to fetch run");
   return res.json();
 }
+
+export const TERMINAL_STATUSES = ["completed", "failed"];
+
+/** SSE URL for run progress; browser ID goes in the query because EventSource cannot send headers. */
+export function runStreamUrl(runId: string, browserId: string): string {
+  return apiUrl(`/runs/${runId}/stream?browser_id=${encodeURIComponent(browserId)}`);
+}
+
+/**
+ * Poll until a run completes or fails (queue mode returns it as pending). While useRunStream is open for the
+ * run, call this once the stream reports run_finished (or fails) rather than polling alongside it.
+ */
+export async function waitForRun(
+  runId: string,
+  browserId: string,
+  intervalMs = 1000
+): Promise<Run | null> {
+  for (;;) {
+    const run = await fetchRun(runId, browserId);
+    if (!run || TERMINAL_STATUSES.includes(run.status)) return run;
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+}
@@ -17,6 +17,8 @@ export interface AddStepBody {
   name: string;
   description?: string;
   step_type: "START" | "NORMAL" | "END";
+  operation?: string | null;
+  operation_config?: Record<string, unknown> | null;
   position?: { x: number; y: number };
   insert_after_step_id?: string;
   insert_before_step_id?: string;
@@ -35,6 +37,9 @@ export interface StepRead {
   name: string;
   description: string;
   step_type: string;
+  llm_provider: string | null;
+  operation: string | null;
+  operation_config: Record<string, unknown> | null;
   position: { x: number; y: number } | null;
 }
 
@@ -63,10 +68,9 @@ export async function fetchWorkflows(
   browserId: string,
   limit = 5
 ): Promise<WorkflowListItem[]> {
-  const res = await apiFetch(`/workflows`, {}, browserId);
+  const res = await apiFetch(`/workflows?limit=${limit}`, {}, browserId);
   if (!res.ok) throw new Error("Failed to fetch workflows");
-  const list: WorkflowListItem[] = await res.json();
-  return list.slice(0, limit);
+  return res.json();
 }
 
 export async function fetchWorkflow(
@@ -85,7 +89,16 @@ export async function updateWorkflow(
   data: {
     name?: string;
     description?: string;
-    steps?: Array<{ name: string; description: string; step_type: string; position?: { x: number; y: number } }>;
+    steps?: Array<{
+      id?: string;
+      name: string;
+      description: string;
+      step_type: string;
+      llm_provider?: string | null;
+      operation?: string | null;
+      operation_config?: Record<string, unknown> | null;
+      position?: { x: number; y: number };
+    }>;
     edges?: Array<{ source_index: number; target_index: number }>;
   }
 ): Promise<Workflow> {
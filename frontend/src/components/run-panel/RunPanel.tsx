@@ -1,8 +1,9 @@
-import { useState } from "react";
+import { useEffect, useState } from "react";
 import toast from "react-hot-toast";
 import { validateWorkflow } from "@/api/workflows";
-import { createRun, fetchRun } from "@/api/runs";
+import { createRun, TERMINAL_STATUSES, waitForRun } from "@/api/runs";
 import { useBrowserId } from "@/hooks/use-browser-id";
+import { useRunStream } from "@/hooks/use-run-stream";
 import { StepOutputList } from "./StepOutputList";
 import type { Run } from "@/types/run";
 import type { Workflow } from "@/types/workflow";
@@ -18,6 +19,47 @@ export function RunPanel({ workflowId, workflow }: RunPanelProps) {
   const [running, setRunning] = useState(false);
   const [runError, setRunError] = useState<string | null>(null);
   const [lastRun, setLastRun] = useState<Run | null>(null);
+  const [activeRunId, setActiveRunId] = useState<string | null>(null);
+  const progress = useRunStream(activeRunId);
+
+  function finishRun(run: Run | null) {
+    setLastRun(run);
+    if (run?.status === "failed" && run.error_message) {
+      toast.error(run.error_message, { duration: 8000 });
+      setRunError(run.error_message);
+    } else if (run?.status === "completed") {
+      toast.success("Run completed");
+    }
+    setActiveRunId(null);
+    setRunning(false);
+  }
+
+  function failRun(e: unknown) {
+    const msg = e instanceof Error ? e.message : "Run failed";
+    toast.error(msg);
+    setRunError(msg);
+    setActiveRunId(null);
+    setRunning(false);
+  }
+
+  // Fetch the result once the progress stream reports the run finished; poll if the stream failed
+  useEffect(() => {
+    if (!activeRunId) return;
+    const finished = progress.status !== null && TERMINAL_STATUSES.includes(progress.status);
+    if (!finished && !progress.streamFailed) return;
+    let cancelled = false;
+    waitForRun(activeRunId, browserId).then(
+      (run) => {
+        if (!cancelled) finishRun(run);
+      },
+      (e) => {
+        if (!cancelled) failRun(e);
+      }
+    );
+    return () => {
+      cancelled = true;
+    };
+  }, [activeRunId, browserId, progress.status, progress.streamFailed]);
 
   const stepNames = workflow
     ? Object.fromEntries(workflow.steps.map((s) => [s.id, s.name]))
@@ -50,20 +92,14 @@ export function RunPanel({ workflowId, workflow }: RunPanelProps) {
     setRunning(true);
     try {
       const created = await createRun(workflowId, inputText.trim(), browserId);
-      const run = await fetchRun(created.run_id, browserId);
-      setLastRun(run ?? null);
-      if (run?.status === "failed" && run.error_message) {
-        toast.error(run.error_message, { duration: 8000 });
-        setRunError(run.error_message);
-      } else if (run?.status === "completed") {
-        toast.success("Run completed");
+      if (TERMINAL_STATUSES.includes(created.status)) {
+        // Inline mode: the run already finished, no progress stream needed
+        finishRun(await waitForRun(created.run_id, browserId));
+      } else {
+        setActiveRunId(created.run_id); // the effect above fetches the result when it finishes
       }
     } catch (e) {
-      const msg = e instanceof Error ? e.message : "Run failed";
-      toast.error(msg);
-      setRunError(msg);
-    } finally {
-      setRunning(false);
+      failRun(e);
     }
   }
 
@@ -89,9 +125,16 @@ export function RunPanel({ workflowId, workflow }: RunPanelProps) {
       </div>
       {running && (
         <p className="mt-2 text-xs text-zinc-400">
-          Processing workflow... This may take 10–30 seconds.
+          {progress.currentStepName
+            ? `Running step "${progress.currentStepName}" (${progress.completedStepIds.length} done)...`
+            : "Processing workflow... This may take 10–30 seconds."}
         </p>
       )}
+      {running && progress.currentStepId && progress.partialOutputs[progress.currentStepId] && (
+        <pre className="mt-2 max-h-40 overflow-auto whitespace-pre-wrap rounded-lg bg-zinc-800 p-2 text-xs text-zinc-300">
+          {progress.partialOutputs[progress.currentStepId]}
+        </pre>
+      )}
       {runError && !running && (
         <p className="mt-2 text-sm text-red-400">{runError}</p>
       )}
@@ -37,6 +37,17 @@ export function StepOutputList({ stepOutputs, stepNames = {} }: StepOutputListPr
                 {name}
               </span>
               <span className="flex items-center gap-2 shrink-0">
+                {so.cached && (
+                  <span className="rounded bg-zinc-700 px-1.5 py-0.5 text-xs text-zinc-300">cached</span>
+                )}
+                {so.retries > 0 && (
+                  <span
+                    className="rounded bg-amber-900/50 px-1.5 py-0.5 text-xs text-amber-300"
+                    title={`Waited ${(so.throttle_wait_ms / 1000).toFixed(1)}s for rate limits and backoff`}
+                  >
+                    {so.retries} {so.retries === 1 ? "retry" : "retries"}
+                  </span>
+                )}
                 {so.duration_ms != null && (
                   <span className="text-xs text-zinc-500">
                     {(so.duration_ms / 1000).toFixed(1)}s
@@ -1,7 +1,7 @@
-import { PREDEFINED_STEPS } from "@/constants/predefinedSteps";
+import { PREDEFINED_STEPS, type PredefinedStep } from "@/constants/predefinedSteps";
 
 interface PredefinedStepsSidebarProps {
-  onAddStep: (name: string, description: string) => void;
+  onAddStep: (step: PredefinedStep) => void;
   collapsed?: boolean;
   onToggle?: () => void;
 }
@@ -54,7 +54,7 @@ export function PredefinedStepsSidebar({
             <p className="mt-1 text-xs text-zinc-400 line-clamp-2">{step.description}</p>
             <button
               type="button"
-              onClick={() => onAddStep(step.name, step.description)}
+              onClick={() => onAddStep(step)}
               className="mt-2 w-full rounded border border-zinc-600 py-1 text-xs font-medium text-zinc-300 hover:bg-zinc-700"
             >
               Add
@@ -6,6 +6,9 @@ export type StepNodeData = {
   name: string;
   description: string;
   step_type: "START" | "NORMAL" | "END";
+  llm_provider?: string | null;
+  operation?: string | null;
+  operation_config?: Record<string, unknown> | null;
   onEdit?: (stepId: string) => void;
   onDelete?: (stepId: string) => void;
 };
@@ -19,7 +22,7 @@ const typeStyles: Record<StepNodeData["step_type"], string> = {
 };
 
 function StepNodeComponent({ data, selected }: NodeProps<StepNodeType>) {
-  const { id, name, description, step_type, onEdit, onDelete } = data;
+  const { id, name, description, step_type, operation, onEdit, onDelete } = data;
   const style = typeStyles[step_type] ?? typeStyles.NORMAL;
 
   return (
@@ -43,6 +46,11 @@ function StepNodeComponent({ data, selected }: NodeProps<StepNodeType>) {
         >
           {step_type}
         </span>
+        {operation ? (
+          <span className="rounded bg-zinc-700/60 px-2 py-0.5 text-xs text-zinc-300" title="Runs locally, without the LLM">
+            {operation}
+          </span>
+        ) : null}
       </div>
       <h3 className="mt-1 font-semibold text-white truncate" title={name}>
         {name}
@@ -3,6 +3,9 @@ export interface PredefinedStep {
   description: string;
   icon?: string;
   category?: string;
+  /** Local operation run in the backend instead of the LLM (no quota, ~0 ms). */
+  operation?: string;
+  operation_config?: Record<string, unknown>;
 }
 
 export const PREDEFINED_STEPS: PredefinedStep[] = [
@@ -12,6 +15,20 @@ export const PREDEFINED_STEPS: PredefinedStep[] = [
     icon: "🧹",
     category: "Text Cleaning",
   },
+  {
+    name: "Normalize Whitespace",
+    description: "Collapse repeated spaces and blank lines (no LLM)",
+    icon: "📏",
+    category: "Text Cleaning",
+    operation: "normalize_whitespace",
+  },
+  {
+    name: "Remove Personal Data",
+    description: "Mask emails, phone numbers, card numbers and IP addresses (no LLM)",
+    icon: "🛡️",
+    category: "Text Cleaning",
+    operation: "strip_pii",
+  },
   {
     name: "Summarize",
     description: "Create a concise summary of the text",
@@ -0,0 +1,103 @@
+import { useEffect, useState } from "react";
+import { runStreamUrl } from "@/api/runs";
+import { useBrowserId } from "@/hooks/use-browser-id";
+import type { RunStreamEvent } from "@/types/run";
+
+const EVENT_TYPES: RunStreamEvent["type"][] = [
+  "snapshot",
+  "run_started",
+  "step_started",
+  "step_output_delta",
+  "step_completed",
+  "run_finished",
+];
+
+export interface RunStreamState {
+  status: string | null;
+  currentStepName: string | null;
+  currentStepId: string | null;
+  completedStepIds: string[];
+  /** Text streamed so far per step ID (only with LLM_STREAMING on the backend). */
+  partialOutputs: Record<string, string>;
+  events: RunStreamEvent[];
+  /** The stream closed (or SSE is unavailable) before run_finished; poll the run instead. */
+  streamFailed: boolean;
+}
+
+const INITIAL_STATE: RunStreamState = {
+  status: null,
+  currentStepName: null,
+  currentStepId: null,
+  completedStepIds: [],
+  partialOutputs: {},
+  events: [],
+  streamFailed: false,
+};
+
+function reduce(state: RunStreamState, event: RunStreamEvent): RunStreamState {
+  if (event.type === "step_output_delta") {
+    // Not kept in events: one per streamed chunk
+    if (!event.step_id) return state;
+    const previous = state.partialOutputs[event.step_id] ?? "";
+    return {
+      ...state,
+      partialOutputs: { ...state.partialOutputs, [event.step_id]: previous + (event.delta ?? "") },
+    };
+  }
+  const events = [...state.events, event];
+  switch (event.type) {
+    case "snapshot":
+      return { ...state, events, status: event.status ?? state.status, completedStepIds: event.completed_step_ids ?? [] };
+    case "run_started":
+      return { ...state, events, status: "running" };
+    case "step_started":
+      return {
+        ...state,
+        events,
+        currentStepName: event.step_name ?? null,
+        currentStepId: event.step_id ?? null,
+      };
+    case "step_completed":
+      return {
+        ...state,
+        events,
+        completedStepIds: event.step_id ? [...state.completedStepIds, event.step_id] : state.completedStepIds,
+      };
+    case "run_finished":
+      return { ...state, events, status: event.status ?? state.status, currentStepName: null, currentStepId: null };
+    default:
+      return state;
+  }
+}
+
+/**
+ * Live run progress from GET /runs/{id}/stream (Server-Sent Events). Pass null to stay idle.
+ * The only stream a run panel should open: each one holds a server connection until the run finishes.
+ */
+export function useRunStream(runId: string | null): RunStreamState {
+  const browserId = useBrowserId();
+  const [state, setState] = useState<RunStreamState>(INITIAL_STATE);
+
+  useEffect(() => {
+    setState(INITIAL_STATE);
+    if (!runId) return;
+    if (typeof EventSource === "undefined") {
+      setState({ ...INITIAL_STATE, streamFailed: true });
+      return;
+    }
+    const source = new EventSource(runStreamUrl(runId, browserId));
+    const onEvent = (e: MessageEvent) => {
+      const event = JSON.parse(e.data) as RunStreamEvent;
+      setState((s) => reduce(s, event));
+      if (event.type === "run_finished") source.close();
+    };
+    EVENT_TYPES.forEach((t) => source.addEventListener(t, onEvent as EventListener));
+    source.onerror = () => {
+      source.close();
+      setState((s) => ({ ...s, streamFailed: true }));
+    };
+    return () => source.close();
+  }, [runId, browserId]);
+
+  return state;
+}
@@ -31,6 +31,7 @@ import { ConfirmDialog } from "@/components/workflow/ConfirmDialog";
 import { RunPanel } from "@/components/run-panel/RunPanel";
 import { RunHistory } from "@/components/history/RunHistory";
 import type { Workflow } from "@/types/workflow";
+import type { PredefinedStep } from "@/constants/predefinedSteps";
 
 const nodeTypes = { stepNode: StepNode };
 
@@ -52,6 +53,9 @@ function workflowToFlow(
       name: s.name,
       description: s.description,
       step_type: s.step_type as StepNodeData["step_type"],
+      llm_provider: s.llm_provider,
+      operation: s.operation,
+      operation_config: s.operation_config,
       onEdit,
       onDelete,
     },
@@ -114,15 +118,13 @@ export function WorkflowEditorPage() {
     [setEdges]
   );
 
-  // At most one outgoing edge per step, one incoming per step (linear chain).
+  // Branches and joins are allowed; reject self-loops and duplicate edges (the backend validates the rest).
   const isValidConnection = useCallback(
     (params: Connection | Edge) => {
       const source = "source" in params ? params.source : null;
       const target = "target" in params ? params.target : null;
-      if (source == null || target == null) return false;
-      const sourceHasOut = edges.some((e) => e.source === source);
-      const targetHasIn = edges.some((e) => e.target === target);
-      return !sourceHasOut && !targetHasIn;
+      if (source == null || target == null || source === target) return false;
+      return !edges.some((e) => e.source === source && e.target === target);
     },
     [edges]
   );
@@ -161,10 +163,15 @@ export function WorkflowEditorPage() {
     if (!workflowId || !workflow) return;
     setSaving(true);
     try {
+      // Node IDs are the steps' IDs; sending them keeps the steps (and their outputs for resume)
       const steps = nodes.map((n) => ({
+        id: n.id,
         name: n.data.name,
         description: n.data.description,
         step_type: n.data.step_type,
+        llm_provider: n.data.llm_provider ?? null,
+        operation: n.data.operation ?? null,
+        operation_config: n.data.operation_config ?? null,
         position: n.position,
       }));
       const edgesByIndex = edges
@@ -270,12 +277,14 @@ export function WorkflowEditorPage() {
   );
 
   const handlePredefinedAdd = useCallback(
-    (name: string, description: string) => {
+    ({ name, description, operation, operation_config }: PredefinedStep) => {
       const pos = nodes.length > 0 ? { x: 250 * nodes.length, y: 100 } : { x: 100, y: 100 };
       apiAddStep(workflowId!, getBrowserId(), {
         name,
         description,
         step_type: "NORMAL",
+        operation: operation ?? null,
+        operation_config: operation_config ?? null,
         position: pos,
       })
         .then((created) => {
@@ -288,6 +297,8 @@ export function WorkflowEditorPage() {
               name: created.name,
               description: created.description,
               step_type: "NORMAL",
+              operation: created.operation,
+              operation_config: created.operation_config,
               onEdit: onEditStep,
               onDelete: onDeleteStep,
             },
@@ -16,3 +16,7 @@ export async function executeWorkflow(
 ): Promise<RunCreated> {
   return api.createRun(workflowId, inputText, getBrowserId());
 }
+
+export async function resumeRun(runId: string, fromStepId?: string): Promise<RunCreated> {
+  return api.resumeRun(runId, getBrowserId(), fromStepId);
+}
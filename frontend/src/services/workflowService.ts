@@ -30,9 +30,13 @@ export async function updateWorkflow(
     name?: string;
     description?: string;
     steps?: Array<{
+      id?: string;
       name: string;
       description: string;
       step_type: string;
+      llm_provider?: string | null;
+      operation?: string | null;
+      operation_config?: Record<string, unknown> | null;
       position?: { x: number; y: number };
     }>;
     edges?: Array<{ source_index: number; target_index: number }>;
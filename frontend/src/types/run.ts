@@ -5,6 +5,11 @@ export interface StepOutputRead {
   input_text: string;
   output_text: string;
   duration_ms: number | null;
+  cached: boolean;
+  reused: boolean;
+  retries: number;
+  throttle_wait_ms: number;
+  error_message: string | null;
 }
 
 export interface Run {
@@ -16,6 +21,7 @@ export interface Run {
   started_at: string;
   completed_at: string | null;
   error_message: string | null;
+  resumed_from_run_id: string | null;
   step_outputs: StepOutputRead[];
 }
 
@@ -33,3 +39,26 @@ export interface RunCreated {
   workflow_id: string;
   status: string;
 }
+
+/** Server-Sent Event from GET /runs/{id}/stream. */
+export interface RunStreamEvent {
+  run_id: string;
+  type: "snapshot" | "run_started" | "step_started" | "step_output_delta" | "step_completed" | "run_finished";
+  status?: string;
+  error_message?: string | null;
+  completed_step_ids?: string[];
+  step_ids?: string[];
+  step_id?: string;
+  step_name?: string;
+  index?: number;
+  step_output_id?: string;
+  duration_ms?: number | null;
+  output_text?: string;
+  output_truncated?: boolean;
+  cached?: boolean;
+  reused?: boolean;
+  error?: string | null;
+  delta?: string;
+  /** The event was cut down to fit a Postgres NOTIFY; fetch the run for the full data. */
+  event_truncated?: boolean;
+}
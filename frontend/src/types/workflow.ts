@@ -4,6 +4,11 @@ export interface Step {
   name: string;
   description: string;
   step_type: "START" | "NORMAL" | "END";
+  /** LLM provider override ("gemini" | "local"); null = server default (LLM_PROVIDER). */
+  llm_provider: string | null;
+  /** Local operation run instead of the LLM (e.g. "strip_pii"); null = LLM step. */
+  operation: string | null;
+  operation_config: Record<string, unknown> | null;
   position: { x: number; y: number };
 }
 
@@ -20,6 +25,9 @@ export interface Workflow {
   description: string;
   browser_id: string;
   created_at: string;
+  cache_step_outputs: boolean;
+  /** Bumped on every change; sent as ETag and accepted as If-Match on update. */
+  version: number;
   steps: Step[];
   edges: Edge[];
 }